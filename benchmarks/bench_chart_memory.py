@@ -0,0 +1,54 @@
+"""Регрессионная проверка утечек памяти при построении графиков.
+
+    python benchmarks/bench_chart_memory.py [--requests 1000] [--max-growth-mb 30]
+
+Прогоняет обработчик calculate_enhanced_ltv на requests разных входах
+(кэш результатов отключен), растеризуя графики так же, как их отдает
+Gradio, и сравнивает RSS после прогрева с RSS в конце. Завершается с
+кодом 1, если рост превысил порог или в pyplot остались открытые фигуры.
+"""
+import argparse
+import io
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ['LTV_CACHE_SIZE'] = '0'
+
+def rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_request(app, i):
+    result = app.calculate_enhanced_ltv(20000 + i, 2.5, 50, 15000, 8, 12, 36, 'SaaS')
+    for chart in result[1:4]:
+        if hasattr(chart, 'savefig'):
+            with io.BytesIO() as buffer:
+                chart.savefig(buffer, format='webp')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--warmup', type=int, default=50)
+    parser.add_argument('--max-growth-mb', type=float, default=30.0)
+    args = parser.parse_args(argv)
+    import streamlit_app as app
+    for i in range(args.warmup):
+        run_request(app, i)
+    baseline = rss_mb()
+    for i in range(args.requests):
+        run_request(app, args.warmup + i)
+        if (i + 1) % 100 == 0:
+            print(f"{i + 1:5d} запросов: RSS {rss_mb():8.1f} MB")
+    growth = rss_mb() - baseline
+    open_figures = len(sys.modules['matplotlib.pyplot'].get_fignums()) if 'matplotlib.pyplot' in sys.modules else 0
+    print(f"Рост RSS: {growth:+.1f} MB (порог {args.max_growth_mb} MB), открытых фигур pyplot: {open_figures}")
+    return 1 if growth > args.max_growth_mb or open_figures else 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
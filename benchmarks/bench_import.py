@@ -0,0 +1,58 @@
+"""Время холодного импорта headless-модели.
+
+    python benchmarks/bench_import.py [--runs 10]
+
+Каждый замер — отдельный интерпретатор. Печатает медиану времени импорта
+numpy и ltv (с numpy) и проверяет, что импорт ltv не тянет pandas,
+matplotlib и gradio.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('pandas', 'matplotlib', 'gradio')
+
+PROBE = """
+import sys, time, json
+t0 = time.perf_counter()
+import numpy
+t1 = time.perf_counter()
+import ltv
+ltv.EnhancedLTVModel().compute_enhanced_ltv_analytic({
+    'avg_check': 20000, 'purchases_per_year': 2.5, 'margin_pct': 50, 'cac': 15000,
+    'monthly_churn_pct': 8, 'discount_rate_pct': 12, 'horizon_months': 36})
+t2 = time.perf_counter()
+print(json.dumps({'numpy': t1 - t0, 'ltv': t2 - t1,
+                  'heavy': [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+def measure(runs):
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, check=True,
+                             capture_output=True, text=True).stdout
+        samples.append(json.loads(out))
+    return samples
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args(argv)
+    samples = measure(args.runs)
+    numpy_ms = statistics.median(s['numpy'] for s in samples) * 1000
+    ltv_ms = statistics.median(s['ltv'] for s in samples) * 1000
+    heavy = sorted({m for s in samples for m in s['heavy']})
+    print(f"numpy:              {numpy_ms:7.1f} ms")
+    print(f"ltv (поверх numpy): {ltv_ms:7.1f} ms")
+    print(f"итого:              {numpy_ms + ltv_ms:7.1f} ms")
+    if heavy:
+        print(f"ОШИБКА: импорт ltv загрузил {', '.join(heavy)}")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
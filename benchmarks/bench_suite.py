@@ -0,0 +1,168 @@
+"""Набор бенчмарков горячих путей с JSON-базой и проверкой регрессий.
+
+    python benchmarks/bench_suite.py run [--output results.json] [--quick] [--repeat 5] [--filter ltv_batch]
+    python benchmarks/bench_suite.py compare baseline.json results.json [--threshold 10]
+
+run замеряет медианное время и пиковую память (tracemalloc, отдельный
+прогон) для модели (горизонты 12–600, батчи 1–10^6), построителей графиков,
+таблицы и обработчика calculate_enhanced_ltv с отключенным кэшем.
+compare сравнивает лучшее из repeat время (оно меньше всего шумит) и
+пиковую память и завершается с кодом 1, если что-то выросло больше чем
+на threshold %. Базы сравнимы только между прогонами на одной машине.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ['LTV_CACHE_SIZE'] = '0'
+
+import numpy as np  # noqa: E402
+
+BASE_PARAMS = {
+    'avg_check': 20000.0, 'purchases_per_year': 2.5, 'margin_pct': 50.0, 'cac': 15000.0,
+    'monthly_churn_pct': 8.0, 'discount_rate_pct': 12.0, 'horizon_months': 36
+}
+HORIZONS = (12, 36, 120, 600)
+BATCH_SIZES = (1, 100, 10_000, 1_000_000)
+QUICK_HORIZONS = (12, 600)
+QUICK_BATCH_SIZES = (1, 10_000)
+# Помесячный движок держит batch × horizon значений в нескольких массивах
+MAX_BATCH_CELLS = 20_000_000
+MIN_SAMPLE_S = 0.05
+# Рост памяти меньше этого порога считается шумом
+MIN_MEMORY_DELTA_MB = 1.0
+
+def batch_columns(size, horizon, seed=0):
+    rng = np.random.default_rng(seed)
+    columns = {k: np.full(size, v, dtype=float) for k, v in BASE_PARAMS.items()}
+    columns['avg_check'] *= rng.uniform(0.5, 1.5, size)
+    columns['monthly_churn_pct'] *= rng.uniform(0.5, 1.5, size)
+    columns['horizon_months'] = horizon
+    return columns
+
+def build_cases(quick):
+    """Список (имя, функция без аргументов); подготовка входов — вне замера."""
+    from ltv import EnhancedLTVModel
+    import streamlit_app as app
+    model = EnhancedLTVModel()
+    horizons = QUICK_HORIZONS if quick else HORIZONS
+    batch_sizes = QUICK_BATCH_SIZES if quick else BATCH_SIZES
+    cases = []
+    for horizon in horizons:
+        params = dict(BASE_PARAMS, horizon_months=horizon)
+        scenarios = model.calculate_scenarios(params)
+        cases += [
+            (f"compute_enhanced_ltv[h={horizon}]", lambda p=params: model.compute_enhanced_ltv(p)),
+            (f"calculate_scenarios[h={horizon}]", lambda p=params: model.calculate_scenarios(p)),
+            (f"generate_detailed_table[h={horizon}]", lambda s=scenarios: app.generate_detailed_table(s)),
+            (f"scenarios_chart[h={horizon}]", lambda s=scenarios: app.render_plot(app.create_scenarios_chart, s)),
+            (f"survival_chart[h={horizon}]", lambda s=scenarios: app.render_plot(app.create_survival_chart, s)),
+            (f"sensitivity_chart[h={horizon}]", lambda p=params: app.render_plot(app.create_sensitivity_chart, p)),
+            (f"calculate_enhanced_ltv[h={horizon}]", lambda p=params: app.calculate_enhanced_ltv(
+                *(p[k] for k in model.BATCH_PARAMS), 'SaaS')),
+        ]
+        for size in batch_sizes:
+            columns = batch_columns(size, horizon)
+            if size * horizon <= MAX_BATCH_CELLS:
+                cases.append((f"ltv_batch[n={size},h={horizon}]",
+                              lambda c=columns: model.compute_enhanced_ltv_batch(c)))
+            cases.append((f"ltv_analytic[n={size},h={horizon}]",
+                          lambda c=columns: model.compute_enhanced_ltv_analytic(c)))
+    return cases
+
+def measure(fn, repeat):
+    started = time.perf_counter()
+    fn()  # прогрев: кэши numpy/matplotlib, ленивые импорты
+    # Быстрые кейсы гоняются пачкой, чтобы один замер длился не меньше MIN_SAMPLE_S
+    loops = max(1, int(MIN_SAMPLE_S / max(time.perf_counter() - started, 1e-9)))
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        timings.append((time.perf_counter() - started) / loops)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'median_s': statistics.median(timings), 'min_s': min(timings),
+        'peak_mb': peak / 2**20, 'repeat': repeat, 'loops': loops
+    }
+
+def run(args):
+    cases = build_cases(args.quick)
+    if args.filter:
+        cases = [(name, fn) for name, fn in cases if args.filter in name]
+    results = {}
+    for name, fn in cases:
+        results[name] = measure(fn, args.repeat)
+        r = results[name]
+        print(f"{name:45s} {r['median_s'] * 1000:10.2f} ms  {r['peak_mb']:9.1f} MB", flush=True)
+    report = {
+        'meta': {
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(), 'numpy': np.__version__,
+            'platform': platform.platform(), 'cpu_count': os.cpu_count(), 'quick': args.quick
+        },
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Сохранено: {args.output}")
+    return 0
+
+def compare(args):
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)['results']
+    with open(args.current, encoding='utf-8') as f:
+        current = json.load(f)['results']
+    limit = 1 + args.threshold / 100
+    regressions = []
+    for name in sorted(baseline.keys() & current.keys()):
+        old, new = baseline[name], current[name]
+        time_ratio = new['min_s'] / old['min_s'] if old['min_s'] > 0 else 1.0
+        memory_grew = (new['peak_mb'] > old['peak_mb'] * limit
+                       and new['peak_mb'] - old['peak_mb'] > MIN_MEMORY_DELTA_MB)
+        flag = ""
+        if time_ratio > limit or memory_grew:
+            regressions.append(name)
+            flag = "  РЕГРЕССИЯ"
+        print(f"{name:45s} {old['min_s'] * 1000:10.2f} -> {new['min_s'] * 1000:10.2f} ms "
+              f"({(time_ratio - 1) * 100:+6.1f}%)  {old['peak_mb']:8.1f} -> {new['peak_mb']:8.1f} MB{flag}")
+    for name in sorted(baseline.keys() - current.keys()):
+        print(f"{name:45s} нет в текущем прогоне")
+    if regressions:
+        print(f"Регрессий больше {args.threshold:g}%: {len(regressions)}")
+        return 1
+    print(f"Регрессий больше {args.threshold:g}% нет")
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help="Прогнать бенчмарки")
+    run_parser.add_argument('--output', help="Куда сохранить результаты (JSON)")
+    run_parser.add_argument('--repeat', type=int, default=5)
+    run_parser.add_argument('--quick', action='store_true', help="Сокращенная сетка горизонтов и батчей")
+    run_parser.add_argument('--filter', help="Только кейсы, в имени которых есть эта подстрока")
+    compare_parser = commands.add_parser('compare', help="Сравнить результаты с базой")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=10.0, help="Допустимый рост, %%")
+    args = parser.parse_args(argv)
+    return run(args) if args.command == 'run' else compare(args)
+
+if __name__ == '__main__':
+    raise SystemExit(main())
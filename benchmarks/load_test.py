@@ -0,0 +1,85 @@
+"""Нагрузочный тест дашборда: латентность p50/p95 при N одновременных пользователях.
+
+    python benchmarks/load_test.py [--url http://127.0.0.1:7860] [--users 50] [--requests 4] [--unique]
+
+Без --url приложение запускается локально в этом же процессе. Каждый
+пользователь — отдельный gradio_client.Client, отправляющий --requests
+последовательных запросов к эндпоинту --endpoint; --unique меняет входы
+в каждом запросе, чтобы обойти кэш результатов.
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+def launch_local():
+    import streamlit_app as app
+    app.workers.warm_up(app.get_offload_pool(), app.OFFLOAD_WORKERS)
+    _, url, _ = app.demo.launch(prevent_thread_lock=True, quiet=True, server_name="127.0.0.1")
+    return app.demo, url
+
+def request_args(endpoint, user, i, unique):
+    avg_check = 20000 + (user * 1000 + i if unique else 0)
+    if endpoint == 'monte_carlo':
+        return (avg_check, 2.5, 50, 15000, 8, 12, 36, 20, 100_000, 42)
+    return (avg_check, 2.5, 50, 15000, 8, 12, 36, 'SaaS')
+
+def run_user(url, endpoint, user, requests, unique, start_barrier):
+    from gradio_client import Client
+    client = Client(url, verbose=False)
+    start_barrier.wait()
+    latencies, errors = [], 0
+    for i in range(requests):
+        started = time.perf_counter()
+        try:
+            client.predict(*request_args(endpoint, user, i, unique), api_name=f"/{endpoint}")
+            latencies.append(time.perf_counter() - started)
+        except Exception:
+            errors += 1
+    return latencies, errors
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=4)
+    parser.add_argument('--endpoint', default='calculate', choices=['calculate', 'monte_carlo'])
+    parser.add_argument('--unique', action='store_true')
+    args = parser.parse_args(argv)
+    demo = None
+    url = args.url
+    if url is None:
+        demo, url = launch_local()
+    barrier = threading.Barrier(args.users + 1)
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        futures = [pool.submit(run_user, url, args.endpoint, u, args.requests, args.unique, barrier)
+                   for u in range(args.users)]
+        barrier.wait()
+        started = time.perf_counter()
+        results = [f.result() for f in futures]
+        elapsed = time.perf_counter() - started
+    latencies = [x for lat, _ in results for x in lat]
+    errors = sum(err for _, err in results)
+    if demo is not None:
+        demo.close()
+    if not latencies:
+        print(f"Все {errors} запросов завершились ошибкой")
+        return 1
+    print(f"{args.users} пользователей × {args.requests} запросов к /{args.endpoint}: "
+          f"{len(latencies)} успешно, {errors} ошибок за {elapsed:.1f} с ({len(latencies) / elapsed:.1f} req/s)")
+    print(f"p50 {percentile(latencies, 50) * 1000:.0f} ms, p95 {percentile(latencies, 95) * 1000:.0f} ms, "
+          f"max {max(latencies) * 1000:.0f} ms, среднее {statistics.mean(latencies) * 1000:.0f} ms")
+    return 1 if errors else 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,106 @@
+"""Нагрузочный тест HTTP API пакетного скоринга: наборы параметров в секунду.
+
+    python benchmarks/load_test_api.py [--url http://127.0.0.1:7860] [--clients 4] [--requests 3] [--batch 100000]
+
+Без --url приложение запускается локально в этом же процессе вместе с
+маршрутами ltv.api. Каждый клиент отправляет --requests запросов по
+--batch случайных наборов параметров в NDJSON и читает ответ потоком;
+503 (очередь заполнена) повторяется после Retry-After и считается отдельно.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+def launch_local():
+    import streamlit_app as app
+    app.workers.warm_up(app.get_offload_pool(), app.OFFLOAD_WORKERS)
+    _, url, _ = app.demo.launch(prevent_thread_lock=True, quiet=True, server_name="127.0.0.1",
+                                app_kwargs={'routes': app.api_routes})
+    return app.demo, url
+
+def make_body(size, seed):
+    rng = np.random.default_rng(seed)
+    columns = {
+        'avg_check': rng.uniform(1000, 50000, size), 'purchases_per_year': rng.uniform(1, 12, size),
+        'margin_pct': rng.uniform(10, 80, size), 'cac': rng.uniform(1000, 30000, size),
+        'monthly_churn_pct': rng.uniform(1, 30, size), 'horizon_months': rng.integers(12, 61, size)
+    }
+    lines = (json.dumps(dict({k: v[i].item() for k, v in columns.items()}, id=i)) for i in range(size))
+    return ("\n".join(lines) + "\n").encode('utf-8')
+
+def send(url, body):
+    """(строк в ответе, строк с ошибками, отказов 503) для одного запроса."""
+    rejected = 0
+    while True:
+        request = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/x-ndjson'})
+        try:
+            with urllib.request.urlopen(request, timeout=600) as response:
+                rows = errors = 0
+                for line in response:
+                    rows += 1
+                    errors += b'"errors"' in line
+                return rows, errors, rejected
+        except urllib.error.HTTPError as e:
+            if e.code != 503:
+                raise
+            rejected += 1
+            time.sleep(float(e.headers.get('Retry-After', 1)))
+
+def run_client(url, bodies, start_barrier):
+    start_barrier.wait()
+    results = []
+    for body in bodies:
+        started = time.perf_counter()
+        rows, errors, rejected = send(url, body)
+        results.append((rows, errors, rejected, time.perf_counter() - started))
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url')
+    parser.add_argument('--clients', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=3)
+    parser.add_argument('--batch', type=int, default=100_000)
+    parser.add_argument('--path', default='/api/v1/score')
+    args = parser.parse_args(argv)
+    demo = None
+    url = args.url
+    if url is None:
+        demo, url = launch_local()
+    endpoint = url.rstrip('/') + args.path
+    bodies = [[make_body(args.batch, c * args.requests + i) for i in range(args.requests)]
+              for c in range(args.clients)]
+    print(f"Тело запроса: {len(bodies[0][0]) / 2**20:.1f} MB на {args.batch} наборов")
+    barrier = threading.Barrier(args.clients + 1)
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        futures = [pool.submit(run_client, endpoint, b, barrier) for b in bodies]
+        barrier.wait()
+        started = time.perf_counter()
+        results = [r for f in futures for r in f.result()]
+        elapsed = time.perf_counter() - started
+    if demo is not None:
+        demo.close()
+    rows = sum(r[0] for r in results)
+    errors = sum(r[1] for r in results)
+    rejected = sum(r[2] for r in results)
+    latencies = [r[3] for r in results]
+    print(f"{args.clients} клиентов × {args.requests} запросов по {args.batch}: {rows} строк "
+          f"({errors} с ошибками валидации) за {elapsed:.1f} с — {rows / elapsed:,.0f} наборов/с")
+    print(f"Латентность запроса: медиана {statistics.median(latencies):.2f} с, max {max(latencies):.2f} с; "
+          f"отказов 503 с повтором: {rejected}")
+    return 0 if rows == args.clients * args.requests * args.batch else 1
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,12 @@
+"""Headless-ядро ULTIMA LTV: модель и кэш без зависимостей от UI.
+
+Импорт пакета тянет только numpy; модули с файловым вводом-выводом
+(ltv.io, ltv.portfolio, ltv.survival, ltv.cli) требуют pandas и
+импортируются явно.
+"""
+from .cache import ResultCache
+from .curves import Schedule
+from .model import EnhancedLTVModel
+from .result import LTVResult
+
+__all__ = ['EnhancedLTVModel', 'LTVResult', 'ResultCache', 'Schedule']
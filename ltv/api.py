@@ -0,0 +1,169 @@
+"""HTTP API пакетного скоринга: POST /api/v1/score с ответом в NDJSON.
+
+Тело — NDJSON (объект на строку) или JSON-массив объектов с полями
+BATCH_PARAMS и необязательными id и industry; discount_rate_pct и
+horizon_months по умолчанию 12 и 36. Строки проверяются теми же
+правилами, что и validate_inputs, и считаются аналитическим движком в
+пуле процессов чанками по chunk_size; ответ уходит по мере готовности
+чанков в исходном порядке:
+
+    {"index": 0, "id": ..., "ltv": ..., "ltv_cac": ..., "roi": ..., "payback_month": ...,
+     "warnings": [...], "insights": [...]}
+    {"index": 1, "id": ..., "errors": [...]}
+
+Размер тела ограничен max_bytes (413), число наборов — max_items (413).
+Одновременно считаются max_concurrent запросов, еще max_pending ждут
+очереди; сверх этого сервер сразу отвечает 503 с Retry-After. Модуль
+требует starlette (ставится вместе с gradio) и импортируется явно.
+"""
+import asyncio
+import json
+from collections import deque
+
+import numpy as np
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from . import workers
+from .model import EnhancedLTVModel
+
+API_DEFAULTS = {'discount_rate_pct': 12.0, 'horizon_months': 36}
+
+class RequestError(ValueError):
+    """Некорректный запрос; status — HTTP-код ответа."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+def parse_items(body, max_items):
+    """Список объектов из тела запроса (JSON-массив или NDJSON)."""
+    try:
+        text = body.decode('utf-8')
+        if text.lstrip().startswith('['):
+            items = json.loads(text)
+        else:
+            lines = [line for line in text.splitlines() if line.strip()]
+            try:
+                items = json.loads('[' + ','.join(lines) + ']')
+            except json.JSONDecodeError:
+                # Построчный разбор медленнее, зато ошибка указывает на строку
+                items = [json.loads(line) for line in lines]
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise RequestError(f"Некорректный JSON: {e}") from e
+    if not items:
+        raise RequestError("Пустой запрос: нужен хотя бы один набор параметров")
+    if len(items) > max_items:
+        raise RequestError(f"Слишком много наборов параметров: {len(items)} (максимум {max_items})", 413)
+    if not all(isinstance(item, dict) for item in items):
+        raise RequestError("Каждый набор параметров должен быть JSON-объектом")
+    return items
+
+def items_to_columns(items, default_industry="SaaS"):
+    """(колонки BATCH_PARAMS, id, отрасли); нечисловые и отсутствующие значения — NaN.
+
+    true/false и строки числами не считаются, даже если numpy умеет их привести.
+    """
+    columns = {}
+    for key in EnhancedLTVModel.BATCH_PARAMS:
+        default = API_DEFAULTS.get(key)
+        raw = [item.get(key, default) for item in items]
+        # Быстрый путь только для колонок из одних int/float: bool — подкласс int, а не число
+        if all(type(v) is float or type(v) is int for v in raw):
+            columns[key] = np.array(raw, dtype=float)
+        else:
+            columns[key] = np.array([_to_float(v) for v in raw])
+    ids = [item.get('id') for item in items]
+    industries = [str(item.get('industry') or default_industry) for item in items]
+    return columns, ids, industries
+
+def _to_float(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return np.nan
+
+class _ReleasingResponse(StreamingResponse):
+    """Вызывает release, когда ответ отправлен или клиент отключился (даже до первого чанка)."""
+
+    def __init__(self, content, release, **kwargs):
+        super().__init__(content, **kwargs)
+        self.release = release
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.release()
+
+def create_routes(get_pool, workers_count, max_items=100_000, max_bytes=32 * 2**20,
+                  max_concurrent=2, max_pending=8, chunk_size=10_000, path='/api/v1/score'):
+    """Маршруты starlette для app_kwargs={'routes': ...} у gradio.Blocks.launch.
+
+    get_pool — функция, возвращающая ProcessPoolExecutor; на запрос в пуле
+    одновременно находится не больше workers_count чанков.
+    """
+    slots = asyncio.Semaphore(max_concurrent)
+    admitted = [0]
+
+    async def read_body(request):
+        length = request.headers.get('content-length')
+        if length is not None and length.isdigit() and int(length) > max_bytes:
+            raise RequestError(f"Тело запроса больше {max_bytes} байт", 413)
+        chunks, size = [], 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > max_bytes:
+                raise RequestError(f"Тело запроса больше {max_bytes} байт", 413)
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    async def stream(columns, ids, industries):
+        loop = asyncio.get_running_loop()
+        pool = get_pool()
+        starts = iter(range(0, len(ids), chunk_size))
+
+        def submit(start):
+            end = start + chunk_size
+            return loop.run_in_executor(pool, workers.score_rows, {k: v[start:end] for k, v in columns.items()},
+                                        ids[start:end], industries[start:end], start)
+
+        pending = deque(submit(start) for _, start in zip(range(workers_count), starts))
+        try:
+            while pending:
+                data = await pending.popleft()
+                start = next(starts, None)
+                if start is not None:
+                    pending.append(submit(start))
+                yield data
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def release():
+        slots.release()
+        admitted[0] -= 1
+
+    async def score(request):
+        if admitted[0] >= max_concurrent + max_pending:
+            return JSONResponse({'error': "Сервер перегружен, повторите запрос позже"}, status_code=503,
+                                headers={'Retry-After': '1'})
+        admitted[0] += 1
+        acquired = False
+        try:
+            body = await read_body(request)
+            await slots.acquire()
+            acquired = True
+            industry = request.query_params.get('industry', "SaaS")
+            columns, ids, industries = await asyncio.to_thread(
+                lambda: items_to_columns(parse_items(body, max_items), industry))
+        except BaseException as e:
+            if acquired:
+                slots.release()
+            admitted[0] -= 1
+            if isinstance(e, RequestError):
+                return JSONResponse({'error': str(e)}, status_code=e.status)
+            raise
+        return _ReleasingResponse(stream(columns, ids, industries), release, media_type='application/x-ndjson',
+                                  headers={'X-Items': str(len(ids))})
+
+    return [Route(path, score, methods=['POST'])]
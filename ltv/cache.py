@@ -0,0 +1,52 @@
+from collections import OrderedDict
+import threading
+import time
+
+
+class ResultCache:
+    """Потокобезопасный LRU-кэш с ограничением размера и TTL.
+
+    Хранит готовые ответы обработчика (KPI HTML, фигуры, таблицу), чтобы
+    повторные запросы с теми же входами не пересчитывали и не перерисовывали
+    графики. ttl=None отключает устаревание, maxsize=0 — кэширование целиком.
+    """
+
+    def __init__(self, maxsize=128, ttl=600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and (self.ttl is None or time.monotonic() - entry[0] <= self.ttl):
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data),
+                    'maxsize': self.maxsize, 'hit_rate': self.hits / total if total else 0.0}
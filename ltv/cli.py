@@ -0,0 +1,49 @@
+"""Пакетный расчет LTV по сетке параметров.
+
+    python -m ltv grid.csv results.parquet --horizon 36 --discount 12
+
+Сетка читается чанками (CSV, Parquet или NDJSON) с теми же колонками, что
+и портфельный режим; каждая строка дополняется ltv, ltv_cac, roi и
+payback_month. Формат вывода определяется по расширению или --format.
+"""
+import argparse
+import sys
+import time
+
+from .io import iter_file_chunks, write_chunks
+from .model import EnhancedLTVModel
+from .portfolio import SEGMENT_COLUMN_ALIASES, SEGMENT_REQUIRED_COLUMNS
+
+def score_grid_chunks(path, discount_rate_pct=12.0, horizon_months=36, chunksize=200_000, model=None):
+    model = model or EnhancedLTVModel()
+    for chunk in iter_file_chunks(path, SEGMENT_COLUMN_ALIASES, chunksize):
+        missing = [c for c in SEGMENT_REQUIRED_COLUMNS if c not in chunk]
+        if missing:
+            raise ValueError(f"В файле нет обязательных колонок: {', '.join(missing)}")
+        if 'discount_rate_pct' not in chunk:
+            chunk['discount_rate_pct'] = float(discount_rate_pct)
+        if 'horizon_months' not in chunk:
+            chunk['horizon_months'] = int(horizon_months)
+        scored = model.compute_enhanced_ltv_analytic({k: chunk[k].to_numpy(dtype=float) for k in model.BATCH_PARAMS})
+        for key, values in scored.items():
+            chunk[key] = values
+        yield chunk
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m ltv', description="Пакетный расчет LTV по сетке параметров")
+    parser.add_argument('grid', help="Файл сетки параметров (CSV, Parquet или NDJSON)")
+    parser.add_argument('output', help="Файл результатов (.csv, .parquet или .ndjson)")
+    parser.add_argument('--format', choices=['csv', 'parquet', 'ndjson'], help="Формат вывода (по умолчанию — по расширению)")
+    parser.add_argument('--horizon', type=int, default=36, help="Горизонт в месяцах, если в сетке нет колонки horizon")
+    parser.add_argument('--discount', type=float, default=12.0, help="Годовая ставка дисконтирования, %%, если нет колонки discount")
+    parser.add_argument('--chunksize', type=int, default=200_000, help="Строк в одном чанке")
+    args = parser.parse_args(argv)
+    started = time.perf_counter()
+    try:
+        rows = write_chunks(score_grid_chunks(args.grid, args.discount, args.horizon, args.chunksize),
+                            args.output, args.format)
+    except (ValueError, KeyError, ImportError, OSError) as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 1
+    print(f"{rows:,} строк за {time.perf_counter() - started:.2f} с -> {args.output}", file=sys.stderr)
+    return 0
@@ -0,0 +1,89 @@
+"""Помесячные кривые параметров: отток, цена, расширение выручки, сезонность.
+
+Кривая задается массивом по месяцам или компактно — объектом Schedule
+(ступеньки, линейная интерполяция, повторяющийся профиль, периодический
+рост), который разворачивается в массив только при расчете и только до
+нужного горизонта. Значения точек Schedule могут быть скалярами или
+массивами длины N — тогда у каждой строки батча своя кривая с общими
+точками перелома, и разворачивание остается векторным.
+"""
+import numpy as np
+
+
+class Schedule:
+    """Компактная кривая; expand(months) возвращает массив (H,) или (N, H)."""
+    __slots__ = ('kind', 'points', 'values', 'period')
+
+    def __init__(self, kind, points, values, period=None):
+        points = np.asarray(points, dtype=float)
+        if kind in ('step', 'linear') and (points.size == 0 or points[0] < 1 or np.any(np.diff(points) <= 0)):
+            raise ValueError("Месяцы точек кривой должны начинаться с 1 или позже и строго возрастать")
+        self.kind = kind
+        self.points = points
+        self.values = np.stack(np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in values)))
+        self.period = period
+
+    @classmethod
+    def steps(cls, points):
+        """{месяц: значение}; значение действует с этого месяца до следующей точки (до первой — первое)."""
+        months = sorted(points)
+        return cls('step', months, [points[m] for m in months])
+
+    @classmethod
+    def linear(cls, points):
+        """{месяц: значение} с линейной интерполяцией; за крайними точками значение постоянно."""
+        months = sorted(points)
+        return cls('linear', months, [points[m] for m in months])
+
+    @classmethod
+    def periodic(cls, profile):
+        """Профиль, повторяющийся с периодом len(profile) месяцев (например, 12 множителей сезонности)."""
+        return cls('periodic', [], list(profile), period=len(profile))
+
+    @classmethod
+    def growth(cls, pct, every=12, start=1):
+        """Множитель (1 + pct/100) ** k, где k — число полных периодов every с месяца start (индексация цен)."""
+        return cls('growth', [start, every], [pct])
+
+    def expand(self, months):
+        months = np.asarray(months)
+        if self.kind == 'step':
+            idx = np.maximum(np.searchsorted(self.points, months, side='right') - 1, 0)
+            expanded = self.values[idx]
+        elif self.kind == 'linear':
+            if len(self.points) == 1:
+                expanded = self.values[np.zeros(len(months), dtype=int)]
+            else:
+                right = np.clip(np.searchsorted(self.points, months, side='right'), 1, len(self.points) - 1)
+                left = right - 1
+                weight = np.clip((months - self.points[left]) / (self.points[right] - self.points[left]), 0.0, 1.0)
+                weight = weight.reshape(weight.shape + (1,) * (self.values.ndim - 1))
+                expanded = self.values[left] + (self.values[right] - self.values[left]) * weight
+        elif self.kind == 'periodic':
+            expanded = self.values[(months - 1) % self.period]
+        else:
+            start, every = self.points
+            periods = np.floor(np.maximum(months - start, 0) / every)
+            return (1.0 + self.values[0, ..., None] / 100.0) ** periods
+        # Ось месяцев — последняя, как у матриц батча
+        return np.moveaxis(expanded, 0, -1)
+
+    def __repr__(self):
+        return f"Schedule({self.kind!r}, points={self.points.tolist()}, values_shape={self.values.shape})"
+
+
+def expand_curve(curve, months):
+    """Кривая на месяцах months: Schedule, скаляр, массив (H',) или (N, H').
+
+    Массив короче горизонта продолжается последним значением, длиннее — обрезается.
+    """
+    if isinstance(curve, Schedule):
+        return curve.expand(months)
+    values = np.asarray(curve, dtype=float)
+    if values.ndim == 0:
+        return np.full(len(months), float(values))
+    horizon = len(months)
+    if values.shape[-1] < horizon:
+        pad = [(0, 0)] * (values.ndim - 1) + [(0, horizon - values.shape[-1])]
+        values = np.pad(values, pad, mode='edge')
+    return values[..., :horizon]
@@ -0,0 +1,97 @@
+"""Инкрементальный пересчет по графу зависимостей.
+
+Узел объявляет, от каких входов или других узлов он зависит; при
+повторном вычислении в той же сессии узел пересчитывается, только если
+изменились значения его зависимостей. Входы сравниваются по значению,
+результаты узлов — по идентичности объекта (переиспользованный узел
+отдает тот же объект, и зависимые от него узлы тоже не пересчитываются).
+"""
+import contextlib
+import contextvars
+import threading
+import time
+
+class GraphState:
+    """Состояние одной сессии: последние значения узлов и статистика пересчета."""
+
+    def __init__(self):
+        self.values = {}
+        self.recomputed = []
+        self.elapsed = 0.0
+        self.lock = threading.Lock()
+
+    def __deepcopy__(self, memo):
+        return GraphState()
+
+class DependencyGraph:
+    def __init__(self, span=None):
+        """span(name) — фабрика контекстов для замера узлов (например, Metrics.span)."""
+        self._nodes = {}
+        self._span = span or (lambda name: contextlib.nullcontext())
+
+    def node(self, name, deps, parallel=False):
+        """Регистрирует функцию узла; parallel=True разрешает считать узел в executor."""
+        def register(fn):
+            self._nodes[name] = (tuple(deps), fn, parallel)
+            return fn
+        return register
+
+    def dependencies(self, name):
+        return self._nodes[name][0]
+
+    def _is_fresh(self, state, name, dep_values):
+        cached = state.values.get(name)
+        if cached is None or len(cached[0]) != len(dep_values):
+            return False
+        for dep, old, new in zip(self._nodes[name][0], cached[0], dep_values):
+            if dep in self._nodes:
+                if old is not new:
+                    return False
+            elif not (old is new or old == new):
+                return False
+        return True
+
+    def _dep_values(self, state, inputs, name, executor):
+        return tuple(self._resolve(state, inputs, dep, executor) if dep in self._nodes else inputs[dep]
+                     for dep in self._nodes[name][0])
+
+    def _resolve(self, state, inputs, name, executor=None):
+        dep_values = self._dep_values(state, inputs, name, executor)
+        if self._is_fresh(state, name, dep_values):
+            return state.values[name][1]
+        value = self._call(name, dep_values)
+        state.values[name] = (dep_values, value)
+        state.recomputed.append(name)
+        return value
+
+    def _call(self, name, dep_values):
+        with self._span(name):
+            return self._nodes[name][1](*dep_values)
+
+    def evaluate(self, state, inputs, outputs, executor=None, reset_stats=True):
+        """Возвращает значения outputs, пересчитывая только устаревшие узлы.
+
+        Узлы с parallel=True, если передан executor, считаются в нем
+        одновременно; их зависимости предварительно вычисляются в текущем потоке.
+        reset_stats=False дописывает статистику к предыдущему вызову.
+        """
+        with state.lock:
+            started = time.perf_counter()
+            if reset_stats:
+                state.recomputed = []
+                state.elapsed = 0.0
+            pending = {}
+            for name in outputs:
+                if not (executor is not None and self._nodes[name][2]):
+                    continue
+                dep_values = self._dep_values(state, inputs, name, executor)
+                if not self._is_fresh(state, name, dep_values):
+                    # Контекст копируется, чтобы замеры из потоков executor попадали в текущий запрос
+                    future = executor.submit(contextvars.copy_context().run, self._call, name, dep_values)
+                    pending[name] = (dep_values, future)
+            for name, (dep_values, future) in pending.items():
+                state.values[name] = (dep_values, future.result())
+                state.recomputed.append(name)
+            result = {name: self._resolve(state, inputs, name, executor) for name in outputs}
+            state.elapsed += time.perf_counter() - started
+            return result
@@ -0,0 +1,62 @@
+"""Потоковое чтение и запись табличных файлов (CSV, Parquet, NDJSON)."""
+import pandas as pd
+
+
+def iter_file_chunks(path, aliases, chunksize=200_000):
+    """Читает CSV, Parquet или NDJSON чанками, оставляя только колонки из aliases под каноническими именами."""
+    fmt = detect_format(path)
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        parquet = pq.ParquetFile(path)
+        columns = [c for c in parquet.schema_arrow.names if c.strip().lower() in aliases]
+        chunks = (batch.to_pandas() for batch in parquet.iter_batches(batch_size=chunksize, columns=columns))
+    elif fmt == 'ndjson':
+        chunks = (chunk[[c for c in chunk.columns if c.strip().lower() in aliases]]
+                  for chunk in pd.read_json(path, lines=True, chunksize=chunksize))
+    else:
+        chunks = pd.read_csv(path, chunksize=chunksize, usecols=lambda c: c.strip().lower() in aliases)
+    for chunk in chunks:
+        yield chunk.rename(columns=lambda c: aliases[c.strip().lower()])
+
+def detect_format(path):
+    name = str(path).lower()
+    if name.endswith(('.parquet', '.pq')):
+        return 'parquet'
+    if name.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    return 'csv'
+
+def write_chunks(chunks, path, fmt=None):
+    """Пишет поток DataFrame в файл по мере поступления; возвращает число строк.
+
+    CSV и NDJSON дописываются чанками, Parquet — отдельной row group на чанк,
+    поэтому результат целиком в памяти не держится.
+    """
+    fmt = fmt or detect_format(path)
+    rows = 0
+    if fmt == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        writer = None
+        try:
+            for chunk in chunks:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+                rows += len(chunk)
+        finally:
+            if writer is not None:
+                writer.close()
+        return rows
+    if fmt not in ('csv', 'ndjson'):
+        raise ValueError(f"Неизвестный формат вывода: {fmt}")
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        for chunk in chunks:
+            if fmt == 'csv':
+                chunk.to_csv(f, index=False, header=rows == 0)
+            elif len(chunk):
+                text = chunk.to_json(orient='records', lines=True, force_ascii=False)
+                f.write(text if text.endswith('\n') else text + '\n')
+            rows += len(chunk)
+    return rows
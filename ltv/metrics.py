@@ -0,0 +1,179 @@
+"""Метрики по этапам расчета: счетчики, тайминги, JSON-логи и cProfile.
+
+По умолчанию выключены: span() и request() тогда возвращают пустой
+контекстный менеджер и ничего не считают. Включенный реестр копит
+счетчики и суммы времени по этапам, отдает их в текстовом формате
+Prometheus и пишет по одной JSON-строке на запрос в логгер ltv.metrics.
+"""
+import contextvars
+import cProfile
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger('ltv.metrics')
+
+HELP = {
+    'ltv_requests_total': ('counter', "Обработанные запросы по эндпоинту и статусу (ok, invalid, error)"),
+    'ltv_response_bytes_total': ('counter', "Байт в ответах (HTML, картинки графиков, таблицы)"),
+    'ltv_profiles_total': ('counter', "Запросы, снятые cProfile"),
+    'ltv_request_seconds': ('summary', "Полное время обработки запроса"),
+    'ltv_stage_seconds': ('summary', "Время этапов расчета (узлы графа, построение и растеризация графиков)"),
+}
+
+class _NullContext:
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_CONTEXT = _NullContext()
+
+class _Span:
+    __slots__ = ('metrics', 'stage', 'started')
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        self.metrics.observe('ltv_stage_seconds', elapsed, stage=self.stage)
+        record = self.metrics._current.get()
+        if record is not None:
+            stages = record['stages']
+            stages[self.stage] = stages.get(self.stage, 0.0) + elapsed
+        return False
+
+class _Request:
+    def __init__(self, metrics, endpoint, profile):
+        self.metrics = metrics
+        self.record = {'endpoint': endpoint, 'status': 'ok', 'stages': {}, 'bytes': 0}
+        self.profiler = cProfile.Profile() if profile else None
+
+    def __enter__(self):
+        self.token = self.metrics._current.set(self.record)
+        self.started = time.perf_counter()
+        if self.profiler is not None:
+            self.profiler.enable()
+        return self.record
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started
+        if self.profiler is not None:
+            self.profiler.disable()
+        self.metrics._current.reset(self.token)
+        record = self.record
+        if exc_type is not None:
+            record['status'] = 'error'
+            record['error'] = f"{exc_type.__name__}: {exc}"
+        endpoint = record['endpoint']
+        self.metrics.inc('ltv_requests_total', endpoint=endpoint, status=record['status'])
+        self.metrics.inc('ltv_response_bytes_total', record['bytes'], endpoint=endpoint)
+        self.metrics.observe('ltv_request_seconds', elapsed, endpoint=endpoint)
+        if self.profiler is not None:
+            record['profile'] = self.metrics.dump_profile(self.profiler, endpoint)
+        record['time'] = time.strftime('%Y-%m-%dT%H:%M:%S%z')
+        record['duration_ms'] = round(elapsed * 1000, 3)
+        record['stages'] = {k: round(v * 1000, 3) for k, v in record['stages'].items()}
+        logger.info(json.dumps(record, ensure_ascii=False))
+        return False
+
+class Metrics:
+    """Реестр метрик процесса; enabled=False делает все вызовы пустыми."""
+
+    def __init__(self, enabled=False, profile_dir=None):
+        self.enabled = enabled
+        self.profile_dir = profile_dir
+        self._counters = {}
+        self._summaries = {}
+        self._lock = threading.Lock()
+        self._current = contextvars.ContextVar('ltv_metrics_request', default=None)
+
+    @classmethod
+    def from_env(cls):
+        """LTV_METRICS=1 включает метрики, LTV_PROFILE_DIR — каталог для cProfile."""
+        return cls(enabled=os.environ.get('LTV_METRICS', '0') not in ('', '0'),
+                   profile_dir=os.environ.get('LTV_PROFILE_DIR') or None)
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            entry = self._summaries.setdefault(key, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def span(self, stage):
+        """Контекст, замеряющий этап; время попадает и в сумму по этапу, и в лог текущего запроса."""
+        return _Span(self, stage) if self.enabled else _NULL_CONTEXT
+
+    def request(self, endpoint, profile=False):
+        """Контекст одного запроса; profile=True снимает cProfile, если задан profile_dir."""
+        profile = profile and self.profile_dir is not None
+        if not (self.enabled or profile):
+            return _NULL_CONTEXT
+        return _Request(self, endpoint, profile)
+
+    def current(self):
+        """Запись текущего запроса (stages, status, bytes) или None вне request()."""
+        return self._current.get()
+
+    def annotate(self, **fields):
+        """Добавляет поля (status, bytes, cache, ...) в запись текущего запроса."""
+        record = self._current.get()
+        if record is not None:
+            record.update(fields)
+
+    def dump_profile(self, profiler, endpoint):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        path = os.path.join(self.profile_dir, f"{endpoint}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-"
+                                              f"{threading.get_ident()}.prof")
+        profiler.dump_stats(path)
+        self.inc('ltv_profiles_total', endpoint=endpoint)
+        return path
+
+    def render_prometheus(self, extra=()):
+        """Текст в формате Prometheus; extra — дополнительные (имя, тип, описание, значение)."""
+        with self._lock:
+            counters = dict(self._counters)
+            summaries = {k: tuple(v) for k, v in self._summaries.items()}
+        families = {}
+        for (name, labels), value in counters.items():
+            families.setdefault(name, []).append((name, labels, value))
+        for (name, labels), (count, total) in summaries.items():
+            families.setdefault(name, []).extend([(f"{name}_count", labels, count), (f"{name}_sum", labels, total)])
+        lines = []
+        for name in sorted(families):
+            kind, description = HELP.get(name, ('untyped', name))
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+            for sample, labels, value in sorted(families[name], key=lambda s: (s[1], s[0])):
+                lines.append(f"{sample}{_format_labels(labels)} {_format_value(value)}")
+        for name, kind, description, value in extra:
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} {kind}", f"{name} {_format_value(value)}"]
+        return "\n".join(lines) + "\n"
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
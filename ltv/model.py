@@ -0,0 +1,803 @@
+"""Модель LTV: расчеты, валидация входов и инсайты.
+
+Модуль зависит только от numpy, чтобы его можно было использовать в
+пакетных задачах и воркерах без загрузки UI.
+"""
+from statistics import NormalDist
+
+import numpy as np
+
+from .curves import expand_curve
+from .result import LTVResult
+from .sobol import sobol_points
+
+
+class EnhancedLTVModel:
+    def __init__(self):
+        self.industry_benchmarks = {
+            "SaaS": {"ltv_cac_min": 3.0, "payback_max": 12, "churn_typical": 5},
+            "E-commerce": {"ltv_cac_min": 2.5, "payback_max": 6, "churn_typical": 15},
+            "Marketplace": {"ltv_cac_min": 2.0, "payback_max": 8, "churn_typical": 12},
+            "Fintech": {"ltv_cac_min": 4.0, "payback_max": 18, "churn_typical": 8},
+            "Услуги (салоны, фитнес, обучение)": {"ltv_cac_min": 2.0, "payback_max": 9, "churn_typical": 20,},
+        }
+    
+    # (уровень, сообщение, проверка); проверки работают и со скалярами, и с колонками numpy
+    VALIDATION_RULES = (
+        ('error', "Средний чек должен быть положительным", lambda p: p['avg_check'] <= 0),
+        ('error', "CAC должен быть положительным", lambda p: p['cac'] <= 0),
+        ('warning', "⚠️ Очень высокий отток - проверьте корректность данных", lambda p: p['monthly_churn_pct'] >= 50),
+        ('warning', "⚠️ Низкая маржинальность может негативно влиять на LTV", lambda p: p['margin_pct'] < 20),
+        ('warning', "⚠️ Средний чек меньше CAC - окупаемость под вопросом", lambda p: p['avg_check'] < p['cac']),
+    )
+
+    def validate_inputs(self, params):
+        warnings = []
+        errors = []
+        for level, message, check in self.VALIDATION_RULES:
+            if check(params):
+                (errors if level == 'error' else warnings).append(message)
+        return warnings, errors
+
+    def validate_batch(self, params):
+        """validate_inputs для колонок: (warnings, errors) — списки пар (сообщение, булева маска строк)."""
+        warnings = []
+        errors = []
+        for level, message, check in self.VALIDATION_RULES:
+            (errors if level == 'error' else warnings).append((message, np.asarray(check(params), dtype=bool)))
+        return warnings, errors
+
+    BATCH_PARAMS = ('avg_check', 'purchases_per_year', 'margin_pct', 'cac',
+                    'monthly_churn_pct', 'discount_rate_pct', 'horizon_months')
+    # Необязательные помесячные кривые (см. ltv.curves и compute_enhanced_ltv_batch)
+    CURVE_PARAMS = ('churn_curve', 'price_curve', 'expansion_curve', 'seasonality')
+
+    SCENARIO_MULTIPLIERS = {
+        "Пессимистичный": {"churn": 1.5, "margin": 0.8, "check": 0.9},
+        "Базовый": {"churn": 1.0, "margin": 1.0, "check": 1.0},
+        "Оптимистичный": {"churn": 0.7, "margin": 1.2, "check": 1.1}
+    }
+
+    def calculate_scenarios(self, base_params):
+        return self.scenarios_from_batch(self.scenario_batch(base_params))
+
+    def scenario_batch(self, base_params, horizon_months=None):
+        """Батч из трех сценариев (строки в порядке SCENARIO_MULTIPLIERS).
+
+        Кривые CURVE_PARAMS из base_params передаются в расчет; множитель
+        оттока сценария применяется и к churn_curve.
+        """
+        names = list(self.SCENARIO_MULTIPLIERS)
+        columns = {k: np.full(len(names), base_params[k], dtype=float) for k in self.BATCH_PARAMS}
+        churn_multipliers = np.array([self.SCENARIO_MULTIPLIERS[n]['churn'] for n in names])
+        columns['monthly_churn_pct'] *= churn_multipliers
+        columns['margin_pct'] *= [self.SCENARIO_MULTIPLIERS[n]['margin'] for n in names]
+        columns['avg_check'] *= [self.SCENARIO_MULTIPLIERS[n]['check'] for n in names]
+        columns['horizon_months'] = horizon = int(horizon_months or base_params['horizon_months'])
+        columns.update(self._curve_inputs(base_params))
+        if 'churn_curve' in columns:
+            churn = expand_curve(columns['churn_curve'], np.arange(1, max(horizon, 1) + 1))
+            columns['churn_curve'] = churn * churn_multipliers[:, None]
+        return self.compute_enhanced_ltv_batch(columns)
+
+    def scenarios_from_batch(self, batch, horizon_months=None):
+        """Раскладывает батч сценариев по именам.
+
+        Если horizon_months меньше горизонта батча, метрики пересчитываются
+        по префиксу уже посчитанных кривых, без повторного расчета потоков.
+        """
+        if horizon_months is not None and int(horizon_months) < len(batch['months']):
+            batch = self.truncate_batch(batch, horizon_months)
+        return {name: self.batch_row(batch, i) for i, name in enumerate(self.SCENARIO_MULTIPLIERS)}
+
+    def truncate_batch(self, batch, horizon_months):
+        horizon = int(horizon_months)
+        return self._cash_flow_metrics(batch['monthly_cf'][:, :horizon], batch['months'][:horizon],
+                                       batch['survival_curve'][:, :horizon], batch['cac'],
+                                       batch['monthly_churn_pct'], np.minimum(batch['horizon_months'], horizon))
+
+    def compute_enhanced_ltv(self, params):
+        columns = {k: np.atleast_1d(params[k]) for k in self.BATCH_PARAMS}
+        columns.update(self._curve_inputs(params))
+        return self.batch_row(self.compute_enhanced_ltv_batch(columns), 0)
+
+    @staticmethod
+    def survival_curve(monthly_churn_pct, months):
+        """Доля клиентов, доживших до каждого месяца: (1 - churn) ** (месяц - 1)."""
+        return (1.0 - np.asarray(monthly_churn_pct, dtype=float) / 100.0) ** (months - 1)
+
+    def compute_enhanced_ltv_batch(self, params, dtype=np.float64):
+        """Считает N наборов параметров за один векторизованный проход.
+
+        params — словарь колонок (скаляры или массивы одной длины N) с ключами
+        из BATCH_PARAMS. Возвращает матрицы N×horizon и векторы длины N;
+        payback_month равен NaN, если окупаемость не достигнута. Для наборов
+        с разным горизонтом матрицы считаются до максимального горизонта,
+        а поток за пределами собственного горизонта обнуляется.
+        dtype=np.float32 вдвое сокращает память под матрицы больших батчей.
+
+        Необязательные кривые CURVE_PARAMS заменяют константы по месяцам:
+        churn_curve — отток, % в месяц (вместо monthly_churn_pct; для
+        lifetime и retention берется эквивалентный постоянный отток),
+        price_curve — множитель среднего чека (плановые повышения цен),
+        expansion_curve — доп. выручка на оставшегося клиента в месяц,
+        seasonality — множитель сезонности (по умолчанию синусоида ±5%).
+        Кривая — Schedule, массив (H,) общий для всех строк или (N, H).
+        """
+        cols = np.broadcast_arrays(*(np.asarray(params[k], dtype=float) for k in self.BATCH_PARAMS))
+        avg_check, purchases, margin_pct, cac, churn_pct, discount_pct, horizon = (
+            np.atleast_1d(c).ravel() for c in cols
+        )
+        horizon = horizon.astype(int)
+        monthly_revenue = (avg_check * purchases) / 12.0
+        monthly_margin = monthly_revenue * (margin_pct / 100.0)
+        survival_rate = 1.0 - churn_pct / 100.0
+        monthly_discount = 1.0 / ((1.0 + discount_pct / 100.0) ** (1.0 / 12.0))
+        months = np.arange(1, int(horizon.max()) + 1)
+        shape = (len(horizon), len(months))
+        exponents = months.astype(float)
+        curves = self._curve_inputs(params)
+        if 'seasonality' in curves:
+            seasonality = expand_curve(curves['seasonality'], months)
+        else:
+            seasonality = 1 + 0.05 * np.sin(2 * np.pi * months / 12)
+        # Степени считаются в float64 и пишутся сразу в матрицу dtype (быстрый цикл,
+        # без промежуточной float64-матрицы); умножения — на месте, в том же порядке
+        if 'churn_curve' in curves:
+            # Хотя бы один месяц кривой: при нулевом горизонте отток строки — значение первого месяца
+            churn = expand_curve(curves['churn_curve'], np.arange(1, max(len(months), 1) + 1))
+            survival_curve = np.empty(shape, dtype)
+            survival_curve[:, :1] = 1.0
+            survival_curve[:, 1:] = np.cumprod(1.0 - churn[..., :-1] / 100.0, axis=-1)
+            churn_pct = self._equivalent_churn(survival_curve, horizon, churn)
+        else:
+            survival_curve = np.power((1.0 - churn_pct / 100.0)[:, None], exponents - 1, out=np.empty(shape, dtype))
+        monthly_cf = np.multiply(monthly_margin[:, None], seasonality, out=np.empty(shape, dtype))
+        if 'price_curve' in curves:
+            monthly_cf *= expand_curve(curves['price_curve'], months)
+        if 'expansion_curve' in curves:
+            monthly_cf += expand_curve(curves['expansion_curve'], months) * (margin_pct / 100.0)[:, None]
+        monthly_cf *= survival_curve
+        monthly_cf *= np.power(monthly_discount[:, None], exponents, out=np.empty(shape, dtype))
+        if len(months) and np.any(horizon != months[-1]):
+            monthly_cf[months > horizon[:, None]] = 0.0
+        return self._cash_flow_metrics(monthly_cf, months, survival_curve, cac, churn_pct, horizon)
+
+    def _curve_inputs(self, params):
+        return {k: params[k] for k in self.CURVE_PARAMS if k in params and params[k] is not None}
+
+    @staticmethod
+    def _equivalent_churn(survival_curve, horizon, churn):
+        """Постоянный отток, % в месяц, дающий ту же выживаемость на горизонте строки."""
+        if survival_curve.shape[1]:
+            last = survival_curve[np.arange(len(horizon)), np.maximum(horizon - 1, 0)].astype(float)
+        else:
+            last = np.ones(len(horizon))
+        first = np.broadcast_to(churn[..., 0], horizon.shape).astype(float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            equivalent = (1.0 - last ** (1.0 / (horizon - 1))) * 100
+        return np.where(horizon > 1, np.where(last > 0, equivalent, 100.0), first)
+
+    def _cash_flow_metrics(self, monthly_cf, months, survival_curve, cac, churn_pct, horizon):
+        cumulative_cf = np.cumsum(monthly_cf, axis=1)
+        # Нулевой горизонт — пустые по месяцам матрицы: LTV 0, окупаемости нет, как в исходной модели
+        empty = not len(months)
+        ltv = np.zeros(len(cac), monthly_cf.dtype) if empty else cumulative_cf[:, -1].copy()
+        has_cac = cac > 0
+        safe_cac = np.where(has_cac, cac, 1.0)
+        ltv_cac = np.where(has_cac, ltv / safe_cac, 0.0)
+        roi = np.where(has_cac, (ltv - cac) / safe_cac, 0.0)
+        reached = cumulative_cf >= cac[:, None]
+        paid_back = reached.any(axis=1)
+        if empty:
+            payback_month = np.full(len(cac), np.nan)
+        else:
+            payback_month = np.where(paid_back, months[reached.argmax(axis=1)], np.nan)
+        survival_rate = 1.0 - churn_pct / 100.0
+        with np.errstate(divide='ignore'):
+            customer_lifetime = np.where(churn_pct > 0, 1 / (churn_pct / 100), np.inf)
+        monthly_retention = survival_rate * 100
+        annual_retention = (survival_rate ** 12) * 100
+        confidence_score = np.where(ltv_cac > 0, np.clip((ltv_cac - 1) * 25, 0, 100), 0.0)
+        return {
+            'ltv': ltv, 'ltv_cac': ltv_cac, 'roi': roi,
+            'payback_month': payback_month, 'customer_lifetime': customer_lifetime,
+            'monthly_retention': monthly_retention, 'annual_retention': annual_retention,
+            'confidence_score': confidence_score,
+            'monthly_cf': monthly_cf, 'cumulative_cf': cumulative_cf,
+            'months': months, 'survival_curve': survival_curve, 'horizon_months': horizon,
+            'cac': cac, 'monthly_churn_pct': churn_pct
+        }
+
+    def compute_empirical_ltv(self, params, curves):
+        """LTV по эмпирическим кривым из fit_empirical_curves.
+
+        Кривая выживаемости и выручка на выжившего клиента заменяют
+        survival_rate ** (months - 1) и monthly_margin × сезонность; из params
+        берутся margin_pct, discount_rate_pct, cac и horizon_months.
+        Месячный отток для lifetime/retention — средний эквивалентный по кривой.
+        """
+        horizon = int(params['horizon_months'])
+        months = np.arange(1, horizon + 1)
+        survival_curve = curves['survival_curve'][:horizon]
+        revenue = curves['revenue_per_survivor'][:horizon]
+        monthly_discount = 1.0 / ((1.0 + params['discount_rate_pct'] / 100.0) ** (1.0 / 12.0))
+        monthly_cf = revenue * (params['margin_pct'] / 100.0) * survival_curve * monthly_discount ** months
+        last = survival_curve[-1]
+        churn_pct = (1.0 - last ** (1.0 / (horizon - 1))) * 100 if horizon > 1 and last > 0 else 100.0
+        batch = self._cash_flow_metrics(monthly_cf[None, :], months, survival_curve[None, :],
+                                        np.array([float(params['cac'])]), np.array([churn_pct]),
+                                        np.array([horizon]))
+        return self.batch_row(batch, 0)
+
+    def batch_row(self, batch, i):
+        """Извлекает i-й набор из результата батча как LTVResult.
+
+        Кривые — срезы-представления строки i без копирования; результат
+        ссылается только на матрицы кривых, а не на весь словарь батча.
+        """
+        horizon = int(batch['horizon_months'][i])
+        payback = batch['payback_month'][i]
+        scalars = {
+            'ltv': float(batch['ltv'][i]), 'ltv_cac': float(batch['ltv_cac'][i]),
+            'roi': float(batch['roi'][i]),
+            'payback_month': None if np.isnan(payback) else int(payback),
+            'customer_lifetime': float(batch['customer_lifetime'][i]),
+            'monthly_retention': float(batch['monthly_retention'][i]),
+            'annual_retention': float(batch['annual_retention'][i]),
+            'confidence_score': float(batch['confidence_score'][i])
+        }
+        return LTVResult(scalars, {
+            'monthly_cf': batch['monthly_cf'][i, :horizon],
+            'cumulative_cf': batch['cumulative_cf'][i, :horizon],
+            'months': batch['months'][:horizon],
+            'survival_curve': batch['survival_curve'][i, :horizon]
+        })
+
+    def compute_enhanced_ltv_analytic(self, params, with_payback=True):
+        """Скалярные LTV, LTV/CAC, ROI и payback без помесячных массивов.
+
+        Поток — дисконтированный геометрический ряд с 12-периодической
+        синусоидальной сезонностью, поэтому сумма за n месяцев считается
+        в замкнутой форме за O(1), а payback — бинарным поиском за
+        O(log horizon). Принимает те же колонки, что и compute_enhanced_ltv_batch;
+        с кривыми CURVE_PARAMS передает расчет ему.
+        with_payback=False пропускает бинарный поиск и не возвращает payback_month.
+        """
+        if self._curve_inputs(params):
+            # Помесячные кривые не сворачиваются в замкнутую форму — считаем помесячно
+            batch = self.compute_enhanced_ltv_batch(params)
+            keys = ('ltv', 'ltv_cac', 'roi') + (('payback_month',) if with_payback else ())
+            return {k: batch[k] for k in keys}
+        cols = np.broadcast_arrays(*(np.asarray(params[k], dtype=float) for k in self.BATCH_PARAMS))
+        avg_check, purchases, margin_pct, cac, churn_pct, discount_pct, horizon = (
+            np.atleast_1d(c).ravel() for c in cols
+        )
+        horizon = horizon.astype(int)
+        monthly_margin = (avg_check * purchases) / 12.0 * (margin_pct / 100.0)
+        survival_rate = 1.0 - churn_pct / 100.0
+        log_discount = -np.log1p(discount_pct / 100.0) / 12.0
+        cumulative_cf = self._analytic_cumulative_cf(monthly_margin, survival_rate, log_discount)
+        ltv = cumulative_cf(horizon)
+        has_cac = cac > 0
+        safe_cac = np.where(has_cac, cac, 1.0)
+        ltv_cac = np.where(has_cac, ltv / safe_cac, 0.0)
+        roi = np.where(has_cac, (ltv - cac) / safe_cac, 0.0)
+        if not with_payback:
+            return {'ltv': ltv, 'ltv_cac': ltv_cac, 'roi': roi}
+        payback_month = self._analytic_payback_month(cumulative_cf, horizon, cac, ltv)
+        monotonic = (monthly_margin >= 0) & (survival_rate >= 0)
+        if not monotonic.all():
+            # Знакопеременный поток: кумулятивный CF немонотонен, бинпоиск неприменим
+            idx = np.flatnonzero(~monotonic)
+            fallback = self.compute_enhanced_ltv_batch({k: np.asarray(v)[idx] for k, v in zip(
+                self.BATCH_PARAMS, (avg_check, purchases, margin_pct, cac, churn_pct, discount_pct, horizon))})
+            payback_month[idx] = fallback['payback_month']
+        return {'ltv': ltv, 'ltv_cac': ltv_cac, 'roi': roi, 'payback_month': payback_month}
+
+    @staticmethod
+    def _analytic_cumulative_cf(monthly_margin, survival_rate, log_discount):
+        """Возвращает функцию n -> кумулятивный CF за n месяцев.
+
+        Σ_{t=1..n} s^(t-1)·d^t·(1 + 0.05·sin(ωt)) = d·Σ_{k<n} q^k + 0.05·d·Im(e^{iω}·Σ_{k<n} z^k),
+        где q = s·d, z = q·e^{iω}. Не зависящие от n члены считаются один раз,
+        чтобы бинарный поиск payback не повторял их на каждом шаге.
+        """
+        omega = np.pi / 6
+        months_in_year = np.arange(12)
+        cos_table, sin_table = np.cos(omega * months_in_year), np.sin(omega * months_in_year)
+        d = np.exp(log_discount)
+        q = survival_rate * d
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # expm1 сохраняет точность при q → 1 (нулевой отток и дисконт)
+            log_q = np.log(survival_rate) + log_discount
+            denom = np.expm1(log_q)
+        special = (q < 0) | (log_q == 0)
+        coef = np.exp(1j * omega) / (1 - q * np.exp(1j * omega))
+        coef_re, coef_im = coef.real, coef.imag
+        scale = monthly_margin * d
+
+        def cumulative_cf(n):
+            with np.errstate(divide='ignore', invalid='ignore'):
+                growth = np.expm1(n * log_q)
+                q_n = growth + 1.0
+                geometric = growth / denom
+                if special.any():
+                    # Ветви np.where считаются для всех строк; при q = 1 берется n, а не 0/0
+                    q_n = np.where(q < 0, q ** n, q_n)
+                    geometric = np.where(log_q == 0, n, np.where(q < 0, (1 - q_n) / (1 - q), geometric))
+            phase = n % 12
+            periodic = coef_im * (1 - q_n * cos_table[phase]) - coef_re * q_n * sin_table[phase]
+            return scale * (geometric + 0.05 * periodic)
+
+        return cumulative_cf
+
+    @staticmethod
+    def _analytic_payback_month(cumulative_cf, horizon, cac, ltv):
+        # При нулевом горизонте месяцев нет и окупаемости тоже (как в compute_enhanced_ltv_batch), даже при CAC <= 0
+        paid_back = (ltv >= cac) & (horizon > 0)
+        lo = np.zeros_like(horizon)
+        hi = horizon.copy()
+        while np.any(hi - lo > 1):
+            mid = (lo + hi) // 2
+            reached = cumulative_cf(mid) >= cac
+            active = hi - lo > 1
+            hi = np.where(active & reached, mid, hi)
+            lo = np.where(active & ~reached, mid, lo)
+        return np.where(paid_back, hi, np.nan)
+
+    SENSITIVITY_PARAMS = ('avg_check', 'purchases_per_year', 'margin_pct', 'cac',
+                          'monthly_churn_pct', 'discount_rate_pct')
+
+    def sensitivity_grid(self, base_params, x_param, y_param, x_values, y_values, metric='ltv_cac'):
+        """metric на сетке x_values × y_values одной broadcast-операцией.
+
+        Возвращает массив формы (len(y_values), len(x_values)); остальные
+        параметры берутся из base_params.
+        """
+        if x_param == y_param:
+            raise ValueError("Для тепловой карты нужны два разных параметра")
+        columns = {k: base_params[k] for k in self.BATCH_PARAMS}
+        columns[x_param] = np.asarray(x_values, dtype=float)[np.newaxis, :]
+        columns[y_param] = np.asarray(y_values, dtype=float)[:, np.newaxis]
+        values = self.compute_enhanced_ltv_analytic(columns, with_payback=metric == 'payback_month')[metric]
+        return values.reshape(len(y_values), len(x_values))
+
+    def tornado(self, base_params, swing_pct=20.0, params=SENSITIVITY_PARAMS, metric='ltv_cac'):
+        """metric при изменении каждого параметра на ±swing_pct %, по убыванию размаха.
+
+        Возвращает {'base', 'params', 'low', 'high'}: low/high — значения
+        metric при уменьшении/увеличении соответствующего параметра.
+        """
+        n = len(params)
+        columns = {k: np.full(2 * n + 1, base_params[k], dtype=float) for k in self.BATCH_PARAMS}
+        for i, k in enumerate(params):
+            columns[k][2 * i:2 * i + 2] *= (1 - swing_pct / 100.0, 1 + swing_pct / 100.0)
+            columns[k] = np.clip(columns[k], *self.MC_BOUNDS.get(k, (-np.inf, np.inf)))
+        values = self.compute_enhanced_ltv_analytic(columns, with_payback=metric == 'payback_month')[metric]
+        low, high = values[:-1:2], values[1:-1:2]
+        order = np.argsort(-np.abs(high - low), kind='stable')
+        return {'base': values[-1], 'params': [params[i] for i in order], 'low': low[order], 'high': high[order]}
+
+    def sobol_bounds(self, base_params, spread_pct=20.0, params=BATCH_PARAMS):
+        """Диапазоны base ± spread_pct % для sobol_indices (отток и маржа — в пределах MC_BOUNDS)."""
+        bounds = {}
+        for k in params:
+            low, high = sorted((base_params[k] * (1 - spread_pct / 100.0), base_params[k] * (1 + spread_pct / 100.0)))
+            low, high = np.clip((low, high), *self.MC_BOUNDS.get(k, (-np.inf, np.inf)))
+            if k == 'horizon_months':
+                low, high = max(1, int(np.ceil(low))), max(1, int(high))
+            bounds[k] = (float(low), float(high))
+        return bounds
+
+    def sobol_chunk(self, base_params, bounds, start, n, metric='ltv_cac'):
+        """Частичные суммы оценок индексов Соболя по точкам start..start+n-1 последовательности.
+
+        Задача для sobol_indices: чанки независимы и складываются, поэтому
+        их можно считать в пуле процессов.
+        """
+        names = tuple(bounds)
+        d = len(names)
+        u = sobol_points(start, n, 2 * d)
+        columns = {k: np.full((d + 2) * n, base_params[k], dtype=float) for k in self.BATCH_PARAMS}
+        for j, k in enumerate(names):
+            low, high = bounds[k]
+            if k == 'horizon_months':
+                a, b = (np.minimum(np.floor(low + u[:, c] * (high - low + 1)), high) for c in (j, d + j))
+            else:
+                a, b = (low + u[:, c] * (high - low) for c in (j, d + j))
+            # Строки: A, B, затем A с j-м столбцом из B для каждого j
+            column = np.tile(a, d + 2)
+            column[n:2 * n] = b
+            column[(2 + j) * n:(3 + j) * n] = b
+            columns[k] = column
+        f = self.compute_enhanced_ltv_analytic(columns, with_payback=False)[metric].reshape(d + 2, n)
+        f_a, f_b, f_ab = f[0], f[1], f[2:]
+        first = f_b * (f_ab - f_a)
+        total = 0.5 * (f_a - f_ab) ** 2
+        return {
+            'n': n, 'sum_f': f[:2].sum(), 'sum_f2': (f[:2] ** 2).sum(),
+            'sum_first': first.sum(axis=1), 'sum_first2': (first ** 2).sum(axis=1),
+            'sum_total': total.sum(axis=1), 'sum_total2': (total ** 2).sum(axis=1)
+        }
+
+    def sobol_indices(self, base_params, bounds=None, spread_pct=20.0, metric='ltv_cac', n_samples=2**14,
+                      chunk_size=2**12, tol=None, min_samples=2**11, confidence=0.95,
+                      executor=None, chunks_per_round=4):
+        """Первые (S1) и полные (ST) индексы Соболя metric ('ltv', 'ltv_cac' или 'roi').
+
+        Входы равномерны на bounds ({параметр: (low, high)}, по умолчанию
+        sobol_bounds(base_params, spread_pct) по всем BATCH_PARAMS;
+        horizon_months — целый), остальные берутся из base_params. Схема
+        Saltelli: матрицы A и B — половины 2d-мерной последовательности
+        Соболя, плюс d матриц A с i-м столбцом из B, всего n × (d + 2)
+        расчетов аналитическим движком чанками по chunk_size. S1 — оценка
+        Saltelli (2010), ST — Jansen (1999); *_ci — полуширины интервалов
+        уровня confidence в нормальном приближении.
+
+        Чанки идут раундами по chunks_per_round (в executor — параллельно,
+        результат от разбиения не зависит). С tol расчет останавливается
+        после раунда, в котором все полуширины ≤ tol, но не раньше min_samples.
+        """
+        bounds = self.sobol_bounds(base_params, spread_pct) if bounds is None else dict(bounds)
+        names = tuple(bounds)
+        d = len(names)
+        sums = {'n': 0, 'sum_f': 0.0, 'sum_f2': 0.0, 'sum_first': np.zeros(d), 'sum_first2': np.zeros(d),
+                'sum_total': np.zeros(d), 'sum_total2': np.zeros(d)}
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        start = 1  # нулевая точка последовательности вырождена
+        converged = False
+        while sums['n'] < n_samples and not converged:
+            chunks = []
+            while len(chunks) < chunks_per_round and start - 1 < n_samples:
+                size = min(chunk_size, n_samples - (start - 1))
+                chunks.append((start, size))
+                start += size
+            if executor is None:
+                partials = [self.sobol_chunk(base_params, bounds, s, n, metric) for s, n in chunks]
+            else:
+                partials = [f.result() for f in [executor.submit(self.sobol_chunk, base_params, bounds, s, n, metric)
+                                                 for s, n in chunks]]
+            for partial in partials:
+                for key in sums:
+                    sums[key] = sums[key] + partial[key]
+            result = self._sobol_estimates(names, sums, z)
+            converged = (tol is not None and sums['n'] >= min_samples
+                         and max(result['first_order_ci'].max(), result['total_ci'].max()) <= tol)
+        result.update(converged=converged, confidence=confidence, metric=metric, bounds=bounds)
+        return result
+
+    @staticmethod
+    def _sobol_estimates(names, sums, z):
+        n = sums['n']
+        mean = sums['sum_f'] / (2 * n)
+        variance = sums['sum_f2'] / (2 * n) - mean ** 2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            first = sums['sum_first'] / n / variance
+            total = sums['sum_total'] / n / variance
+            first_sd = np.sqrt(np.maximum(sums['sum_first2'] / n - (sums['sum_first'] / n) ** 2, 0) / n) / variance
+            total_sd = np.sqrt(np.maximum(sums['sum_total2'] / n - (sums['sum_total'] / n) ** 2, 0) / n) / variance
+        return {
+            'params': list(names), 'first_order': first, 'total': total,
+            'first_order_ci': z * first_sd, 'total_ci': z * total_sd,
+            'n_samples': n, 'evaluations': n * (len(names) + 2), 'mean': mean, 'variance': variance
+        }
+
+    GOAL_SEEK_BOUNDS = {'margin_pct': (0.0, 100.0), 'monthly_churn_pct': (0.0, 100.0),
+                        'discount_rate_pct': (0.0, 1000.0)}
+    GOAL_SEEK_SPAN = (1e-6, 1e3)
+
+    def goal_seek(self, params, solve_for, metric='ltv_cac', target=3.0, bounds=None,
+                  rtol=1e-9, max_iter=200):
+        """Порог solve_for, при котором metric достигает target, при прочих равных.
+
+        params — колонки как в compute_enhanced_ltv_batch (скаляры или массивы),
+        target тоже может быть массивом: все строки решаются одновременно
+        векторизованной бисекцией. metric='ltv_cac' — LTV/CAC ≥ target,
+        metric='payback_month' — payback ≤ target (то же, что кумулятивный CF
+        за target месяцев ≥ CAC). bounds — интервал поиска; по умолчанию
+        GOAL_SEEK_BOUNDS или GOAL_SEEK_SPAN × текущее значение.
+
+        Возвращает массивы: value — граничное значение, на котором цель еще
+        выполняется (NaN, если корня в интервале нет); is_max — порог является
+        максимумом (иначе минимумом); always_met — цель выполнена на всем
+        интервале; bracketed, converged, iterations, residual.
+        """
+        if metric not in ('ltv_cac', 'payback_month'):
+            raise ValueError(f"Неизвестная метрика: {metric}")
+        arrays = np.broadcast_arrays(*(np.asarray(params[k], dtype=float) for k in self.BATCH_PARAMS),
+                                     np.asarray(target, dtype=float))
+        columns = dict(zip(self.BATCH_PARAMS, (np.atleast_1d(a).ravel() for a in arrays[:-1])))
+        target = np.atleast_1d(arrays[-1]).ravel()
+        if metric == 'payback_month':
+            columns['horizon_months'] = np.minimum(columns['horizon_months'], np.floor(target))
+            target = np.ones_like(target)
+        if bounds is None:
+            bounds = self.GOAL_SEEK_BOUNDS.get(solve_for)
+        if bounds is None:
+            current = np.abs(columns[solve_for])
+            lo, hi = current * self.GOAL_SEEK_SPAN[0], current * self.GOAL_SEEK_SPAN[1]
+        else:
+            lo, hi = (np.full(len(target), float(b)) for b in bounds)
+
+        def residual(x, idx):
+            rows = {k: v[idx] for k, v in columns.items()}
+            rows[solve_for] = x
+            return self.compute_enhanced_ltv_analytic(rows, with_payback=False)['ltv_cac'] - target[idx]
+
+        everything = np.arange(len(target))
+        f_lo, f_hi = residual(lo, everything), residual(hi, everything)
+        bracketed = (f_lo < 0) != (f_hi < 0)
+        is_max = f_lo >= f_hi
+        iterations = np.zeros(len(target), dtype=int)
+        active = bracketed & (hi - lo > rtol * np.maximum(np.abs(lo), np.abs(hi)))
+        for _ in range(max_iter):
+            idx = np.flatnonzero(active)
+            if len(idx) == 0:
+                break
+            mid = (lo[idx] + hi[idx]) / 2
+            # Граница, на которой цель выполнена, остается внутри интервала
+            met = residual(mid, idx) >= 0
+            move_lo = met == is_max[idx]
+            lo[idx] = np.where(move_lo, mid, lo[idx])
+            hi[idx] = np.where(move_lo, hi[idx], mid)
+            iterations[idx] += 1
+            active[idx] = hi[idx] - lo[idx] > rtol * np.maximum(np.abs(lo[idx]), np.abs(hi[idx]))
+        value = np.where(bracketed, np.where(is_max, lo, hi), np.nan)
+        valid = np.flatnonzero(bracketed)
+        residuals = np.full(len(target), np.nan)
+        residuals[valid] = residual(value[valid], valid)
+        return {
+            'value': value, 'is_max': is_max, 'always_met': (f_lo >= 0) & (f_hi >= 0),
+            'bracketed': bracketed, 'converged': bracketed & ~active,
+            'iterations': iterations, 'residual': residuals
+        }
+
+    def benchmark_thresholds(self, params, industry, solve_for=SENSITIVITY_PARAMS,
+                             ltv_cac_min=None, payback_max=None):
+        """Пороги каждого параметра для LTV/CAC ≥ ltv_cac_min и payback ≤ payback_max.
+
+        Цели, не переданные явно, берутся из бенчмарков отрасли.
+        """
+        benchmark = self.industry_benchmarks.get(industry, self.industry_benchmarks["SaaS"])
+        ltv_cac_min = benchmark['ltv_cac_min'] if ltv_cac_min is None else ltv_cac_min
+        payback_max = benchmark['payback_max'] if payback_max is None else payback_max
+        return {
+            name: {
+                'ltv_cac': self.goal_seek(params, name, 'ltv_cac', ltv_cac_min),
+                'payback_month': self.goal_seek(params, name, 'payback_month', payback_max)
+            }
+            for name in solve_for
+        }
+
+    MC_PARAMS = ('avg_check', 'margin_pct', 'monthly_churn_pct', 'purchases_per_year', 'cac')
+    MC_BOUNDS = {'margin_pct': (0.0, 100.0), 'monthly_churn_pct': (0.0, 100.0)}
+    # Денежные входы и частота строго положительны: неположительные розыгрыши
+    # перетягиваются, а не обрезаются до 0 (CAC = 0 дает LTV/CAC = 0 и завышал бы риск)
+    MC_POSITIVE = ('avg_check', 'purchases_per_year', 'cac')
+    MC_MAX_REDRAWS = 100
+
+    def default_distributions(self, base_params, spread_pct=20.0):
+        """Нормальные распределения вокруг базовых значений со стандартным отклонением spread_pct %."""
+        return {k: ('normal', base_params[k], abs(base_params[k]) * spread_pct / 100.0)
+                for k in self.MC_PARAMS}
+
+    @staticmethod
+    def _draw(rng, name, kind, args, size):
+        if kind == 'fixed':
+            return np.full(size, float(args[0]))
+        if kind == 'normal':
+            return rng.normal(args[0], args[1], size)
+        if kind == 'lognormal':
+            return args[0] * np.exp(rng.normal(0.0, args[1], size))
+        if kind == 'uniform':
+            return rng.uniform(args[0], args[1], size)
+        if kind == 'triangular':
+            return rng.triangular(args[0], args[1], args[2], size)
+        raise ValueError(f"Неизвестное распределение для {name}: {kind}")
+
+    def _sample_param(self, rng, name, spec, size):
+        kind, *args = spec
+        values = self._draw(rng, name, kind, args, size)
+        if name in self.MC_POSITIVE:
+            # Перевыборка дает распределение, усеченное слева нулем
+            for _ in range(self.MC_MAX_REDRAWS):
+                bad = np.flatnonzero(values <= 0)
+                if len(bad) == 0:
+                    return values
+                values[bad] = self._draw(rng, name, kind, args, len(bad))
+            raise ValueError(f"Распределение {name} почти не дает положительных значений")
+        low, high = self.MC_BOUNDS.get(name, (-np.inf, np.inf))
+        return np.clip(values, low, high)
+
+    def simulate_monte_carlo(self, base_params, distributions, n_draws=100_000, chunk_size=50_000,
+                             seed=None, percentiles=(5, 25, 50, 75, 95), reservoir_size=5_000):
+        """Monte Carlo по распределениям параметров с ограниченной памятью.
+
+        distributions — словарь {параметр: (вид, *аргументы)} для параметров из
+        MC_PARAMS; вид: 'fixed', 'normal' (mean, sd), 'lognormal' (median, sigma),
+        'uniform' (low, high), 'triangular' (left, mode, right); для MC_POSITIVE
+        распределение усекается слева нулем перевыборкой. Остальные
+        параметры берутся из base_params. Скаляры для всех розыгрышей считаются
+        аналитическим движком чанками по chunk_size; полосы кумулятивного CF
+        строятся по равномерной резервуарной выборке из reservoir_size кривых,
+        поэтому пиковая память не зависит от n_draws.
+        """
+        rng = np.random.default_rng(seed)
+        horizon = int(base_params['horizon_months'])
+        payback_counts = np.zeros(horizon + 1, dtype=np.int64)  # индекс 0 — окупаемость не достигнута
+        below_one = 0
+        ltv_sum = 0.0
+        res_keys = np.empty(0)
+        res_ltv = np.empty(0)
+        res_curves = np.empty((0, horizon), dtype=np.float32)
+        for columns, scalars, keys in self._monte_carlo_chunks(rng, base_params, distributions, n_draws, chunk_size):
+            size = len(keys)
+            below_one += int(np.count_nonzero(scalars['ltv_cac'] < 1))
+            ltv_sum += float(scalars['ltv'].sum())
+            payback = np.nan_to_num(scalars['payback_month'], nan=0).astype(np.int64)
+            payback_counts += np.bincount(payback, minlength=horizon + 1)
+            # Резервуар: храним reservoir_size розыгрышей с наименьшими случайными ключами
+            take = np.arange(size)
+            if size > reservoir_size:
+                take = np.argpartition(keys, reservoir_size)[:reservoir_size]
+            if len(res_keys) == reservoir_size:
+                take = take[keys[take] < res_keys.max()]
+            if len(take) == 0:
+                continue
+            # Кривые резервуара нужны только для полос графика: float32 вдвое меньше по памяти
+            curves = self.compute_enhanced_ltv_batch({k: v[take] for k, v in columns.items()},
+                                                     dtype=np.float32)['cumulative_cf']
+            res_keys = np.concatenate([res_keys, keys[take]])
+            res_ltv = np.concatenate([res_ltv, scalars['ltv'][take]])
+            res_curves = np.concatenate([res_curves, curves])
+            if len(res_keys) > reservoir_size:
+                keep = np.argpartition(res_keys, reservoir_size)[:reservoir_size]
+                res_keys, res_ltv, res_curves = res_keys[keep], res_ltv[keep], res_curves[keep]
+        paid = np.cumsum(payback_counts[1:])
+        payback_percentiles = {}
+        for p in percentiles:
+            month = int(np.searchsorted(paid, n_draws * p / 100.0)) + 1
+            payback_percentiles[p] = month if month <= horizon else None
+        return {
+            'n_draws': n_draws, 'seed': seed, 'months': np.arange(1, horizon + 1),
+            'bands': dict(zip(percentiles, np.percentile(res_curves, percentiles, axis=0))),
+            'ltv_percentiles': dict(zip(percentiles, np.percentile(res_ltv, percentiles))),
+            'mean_ltv': ltv_sum / n_draws,
+            'prob_ltv_cac_below_1': below_one / n_draws,
+            'payback_counts': payback_counts,
+            'prob_no_payback': payback_counts[0] / n_draws,
+            'payback_percentiles': payback_percentiles
+        }
+
+    def iter_monte_carlo_draws(self, base_params, distributions, n_draws=100_000, chunk_size=50_000, seed=None):
+        """Результаты каждого розыгрыша чанками по chunk_size: колонки BATCH_PARAMS и ltv, ltv_cac, roi, payback_month.
+
+        При том же seed розыгрыши совпадают с simulate_monte_carlo, поэтому
+        выгрузка соответствует показанной сводке.
+        """
+        rng = np.random.default_rng(seed)
+        for columns, scalars, _ in self._monte_carlo_chunks(rng, base_params, distributions, n_draws, chunk_size):
+            yield dict(columns, **scalars)
+
+    def _monte_carlo_chunks(self, rng, base_params, distributions, n_draws, chunk_size):
+        for start in range(0, n_draws, chunk_size):
+            size = min(chunk_size, n_draws - start)
+            columns = {k: np.full(size, float(base_params[k])) for k in self.BATCH_PARAMS}
+            for name, spec in distributions.items():
+                columns[name] = self._sample_param(rng, name, spec, size)
+            # Ключи резервуара берутся из того же потока, чтобы не менять розыгрыши для данного seed
+            yield columns, self.compute_enhanced_ltv_analytic(columns), rng.random(size)
+
+    # Правила инсайтов в порядке вывода: (код, тип, иконка, шаблон текста)
+    INSIGHT_RULES = (
+        ('ltv_cac_below_min', 'warning', "⚠️",
+         "LTV/CAC ниже отраслевого минимума ({ltv_cac_min}). Необходимо увеличить LTV или снизить CAC."),
+        ('ltv_cac_ok', 'success', "✅", "LTV/CAC соответствует отраслевым стандартам ({ltv_cac:.1f})."),
+        ('payback_fast', 'success', "🚀", "Отличный payback период ({payback_month} мес.) - быстрая окупаемость."),
+        ('payback_slow', 'warning', "⏳",
+         "Payback период ({payback_month} мес.) выше рекомендуемого ({payback_max} мес.)."),
+        ('churn_critical', 'error', "📉",
+         "Критически высокий отток ({monthly_churn_pct:.1f}% в месяц). Срочно требуется работа с retention."),
+        ('raise_margin', 'info', "💡", "Рекомендация: увеличить маржинальность через апсейл или снижение затрат."),
+        ('loyalty_program', 'info', "💡", "Рекомендация: инвестировать в программы лояльности для снижения оттока."),
+    )
+    INSIGHT_CODES = tuple(rule[0] for rule in INSIGHT_RULES)
+    # Ранжирование рекомендаций: сначала критичные, при равенстве — порядок INSIGHT_RULES
+    INSIGHT_SEVERITY = {'error': 0, 'warning': 1, 'info': 2, 'success': 3}
+    # Пороги (хорошо, допустимо) для классов KPI: 0 — good, 1 — warn, 2 — bad
+    KPI_THRESHOLDS = {'ltv_cac': (3.0, 1.0), 'roi': (2.0, 0.0), 'confidence_score': (70.0, 40.0)}
+    KPI_PAYBACK_MAX = 12
+
+    def benchmark_table(self):
+        """Бенчмарки отраслей колонками numpy; строка i — отрасль industries[i]."""
+        industries = tuple(self.industry_benchmarks)
+        return dict({key: np.array([self.industry_benchmarks[name][key] for name in industries], dtype=float)
+                     for key in ('ltv_cac_min', 'payback_max', 'churn_typical')}, industries=industries)
+
+    def industry_codes(self, industries, table=None):
+        """Номера строк benchmark_table для названий отраслей; неизвестные — SaaS, как в generate_insights."""
+        table = table or self.benchmark_table()
+        lookup = {name: code for code, name in enumerate(table['industries'])}
+        names = np.asarray(industries)
+        if names.ndim == 0:
+            return np.intp(lookup.get(str(names), lookup["SaaS"]))
+        # Отраслей единицы: по сравнению колонки на каждую вместо словаря по строкам
+        codes = np.full(names.shape, lookup["SaaS"], dtype=np.intp)
+        for name, code in lookup.items():
+            codes[names == name] = code
+        return codes
+
+    def insight_flags(self, ltv_cac, payback_month, monthly_churn_pct, margin_pct, industries="SaaS", table=None):
+        """Маски правил INSIGHT_RULES: булев массив (..., len(INSIGHT_RULES)).
+
+        Аргументы — скаляры или колонки одной длины; payback_month — NaN
+        (или None), если окупаемости нет. Условия те же, что у generate_insights.
+        """
+        table = table or self.benchmark_table()
+        codes = self.industry_codes(industries, table)
+        ltv_cac = np.asarray(ltv_cac, dtype=float)
+        payback = np.asarray(payback_month, dtype=float)
+        churn = np.asarray(monthly_churn_pct, dtype=float)
+        margin = np.asarray(margin_pct, dtype=float)
+        below_min = ltv_cac < table['ltv_cac_min'][codes]
+        has_payback = np.isfinite(payback) & (payback != 0)
+        fast = has_payback & (payback <= table['payback_max'][codes])
+        low_ltv_cac = ltv_cac < 3
+        masks = (below_min, ~below_min, fast, has_payback & ~fast, churn > table['churn_typical'][codes] * 1.5,
+                 low_ltv_cac & (margin < 30), low_ltv_cac & (churn > 10))
+        return np.stack(np.broadcast_arrays(*masks), axis=-1)
+
+    def rank_insights(self, flags):
+        """Номера сработавших правил по строке, от критичных к успешным; пустые места — -1."""
+        order = np.array(sorted(range(len(self.INSIGHT_RULES)),
+                                key=lambda i: (self.INSIGHT_SEVERITY[self.INSIGHT_RULES[i][1]], i)))
+        ordered = np.atleast_2d(flags)[:, order]
+        rows, columns = np.nonzero(ordered)
+        ranked = np.full(ordered.shape, -1, dtype=np.int8)
+        ranked[rows, np.cumsum(ordered, axis=1, dtype=np.int8)[rows, columns] - 1] = order[columns]
+        return ranked.reshape(np.shape(flags))
+
+    def kpi_levels(self, metric, values):
+        """Классы KPI-карточек для колонки values: 0 — хорошо, 1 — допустимо, 2 — плохо."""
+        values = np.asarray(values, dtype=float)
+        if metric == 'payback_month':
+            has_payback = np.isfinite(values) & (values != 0)
+            return np.where(has_payback & (values <= self.KPI_PAYBACK_MAX), 0, np.where(has_payback, 1, 2))
+        good, fair = self.KPI_THRESHOLDS[metric]
+        return np.where(values >= good, 0, np.where(values >= fair, 1, 2))
+
+    def classify_batch(self, scored, params, industries="SaaS"):
+        """Классификация строк батча за один проход по колонкам.
+
+        scored — результат compute_enhanced_ltv_analytic/batch, params — его
+        входные колонки. Возвращает коды отраслей, маски правил flags (N, R),
+        ранжированные номера правил ranked, число строк по каждому коду
+        INSIGHT_CODES и уровни KPI (см. kpi_levels).
+        """
+        table = self.benchmark_table()
+        payback = scored.get('payback_month', np.nan)
+        flags = self.insight_flags(scored['ltv_cac'], payback, params['monthly_churn_pct'],
+                                   params['margin_pct'], industries, table)
+        flags = np.atleast_2d(flags)
+        kpi = {metric: self.kpi_levels(metric, scored[metric])
+               for metric in ('ltv_cac', 'roi', 'payback_month', 'confidence_score') if metric in scored}
+        return {
+            'industry': np.broadcast_to(self.industry_codes(industries, table), flags.shape[:1]),
+            'flags': flags, 'ranked': self.rank_insights(flags),
+            'counts': dict(zip(self.INSIGHT_CODES, flags.sum(axis=0).tolist())), 'kpi': kpi
+        }
+
+    def render_insights(self, flags, ltv_data, params, industry="SaaS"):
+        """Тексты инсайтов для одной строки по маскам insight_flags, в порядке INSIGHT_RULES."""
+        benchmark = self.industry_benchmarks.get(industry, self.industry_benchmarks["SaaS"])
+        values = dict(benchmark, ltv_cac=ltv_data['ltv_cac'], payback_month=ltv_data['payback_month'],
+                      monthly_churn_pct=params['monthly_churn_pct'])
+        return [{"icon": icon, "type": kind, "text": template.format(**values)}
+                for (_, kind, icon, template), flag in zip(self.INSIGHT_RULES, flags) if flag]
+
+    def generate_insights(self, ltv_data, params, industry="SaaS"):
+        payback = ltv_data['payback_month']
+        flags = self.insight_flags(ltv_data['ltv_cac'], np.nan if payback is None else payback,
+                                   params['monthly_churn_pct'], params['margin_pct'], industry)
+        return self.render_insights(flags, ltv_data, params, industry)
@@ -0,0 +1,109 @@
+"""Портфельный режим: потоковый расчет LTV по сегментам/когортам из файла."""
+import numpy as np
+import pandas as pd
+
+from .io import iter_file_chunks
+from .model import EnhancedLTVModel
+
+
+SEGMENT_COLUMN_ALIASES = {
+    'avg_check': 'avg_check', 'purchases': 'purchases_per_year', 'purchases_per_year': 'purchases_per_year',
+    'margin': 'margin_pct', 'margin_pct': 'margin_pct', 'churn': 'monthly_churn_pct',
+    'monthly_churn_pct': 'monthly_churn_pct', 'cac': 'cac', 'discount': 'discount_rate_pct',
+    'discount_rate_pct': 'discount_rate_pct', 'horizon': 'horizon_months', 'horizon_months': 'horizon_months',
+    'segment': 'segment', 'customers': 'customers', 'industry': 'industry'
+}
+SEGMENT_REQUIRED_COLUMNS = ('avg_check', 'purchases_per_year', 'margin_pct', 'monthly_churn_pct', 'cac')
+
+def iter_segment_chunks(path, chunksize=200_000):
+    return iter_file_chunks(path, SEGMENT_COLUMN_ALIASES, chunksize)
+
+# Правила EnhancedLTVModel.INSIGHT_RULES, доли которых выводятся по сегментам
+SEGMENT_INSIGHT_COLUMNS = {
+    'ltv_cac_below_min': 'Доля LTV/CAC ниже бенчмарка (%)',
+    'payback_slow': 'Доля payback выше бенчмарка (%)',
+    'churn_critical': 'Доля критического оттока (%)'
+}
+
+def invalid_segment_rows(model, columns):
+    """Маска строк, которые нельзя посчитать: пропуски и нечисла, отток вне 0–100%,
+    горизонт не целое положительное число, ошибки правил модели (validate_batch)."""
+    invalid = np.zeros(len(columns['cac']), dtype=bool)
+    for key in model.BATCH_PARAMS:
+        invalid |= ~np.isfinite(columns[key])
+    churn, horizon = columns['monthly_churn_pct'], columns['horizon_months']
+    with np.errstate(invalid='ignore'):
+        invalid |= (churn < 0) | (churn > 100) | (horizon < 1) | (horizon % 1 != 0)
+        for _, mask in model.validate_batch(columns)[1]:
+            invalid |= mask
+    return invalid
+
+def score_segments_file(path, discount_rate_pct=12.0, horizon_months=36, chunksize=200_000, model=None,
+                        industry="SaaS"):
+    """Потоково считает LTV по строкам файла и агрегирует результат по сегментам.
+
+    В памяти одновременно находится только один чанк и накопленные суммы по
+    сегментам. Колонки discount/horizon, если они есть, переопределяют
+    значения по умолчанию; customers задает вес строки (размер когорты),
+    industry — отрасль строки для бенчмарков (иначе — аргумент industry).
+    Невалидные строки (см. invalid_segment_rows) в средние не входят и
+    считаются в колонке «Отклонено строк».
+    """
+    model = model or EnhancedLTVModel()
+    totals = rejected_totals = None
+    for chunk in iter_segment_chunks(path, chunksize):
+        missing = [c for c in SEGMENT_REQUIRED_COLUMNS if c not in chunk]
+        if missing:
+            raise ValueError(f"В файле нет обязательных колонок: {', '.join(missing)}")
+        columns = {k: chunk[k].to_numpy(dtype=float) for k in SEGMENT_REQUIRED_COLUMNS}
+        for k, default in (('discount_rate_pct', float(discount_rate_pct)), ('horizon_months', int(horizon_months))):
+            columns[k] = chunk[k].to_numpy(dtype=float) if k in chunk else np.full(len(chunk), default, dtype=float)
+        segments = chunk['segment'].astype(str).to_numpy() if 'segment' in chunk else np.full(len(chunk), 'Все')
+        weight = chunk['customers'].to_numpy(dtype=float) if 'customers' in chunk else np.ones(len(chunk))
+        invalid = invalid_segment_rows(model, columns) | ~(weight >= 0) | np.isinf(weight)
+        if invalid.any():
+            rejected = pd.Series(1, index=segments[invalid]).groupby(level=0, sort=False).sum()
+            rejected_totals = rejected if rejected_totals is None else rejected_totals.add(rejected, fill_value=0)
+            ok = ~invalid
+            chunk, segments, weight = chunk[ok], segments[ok], weight[ok]
+            columns = {k: v[ok] for k, v in columns.items()}
+        if not len(chunk):
+            continue
+        scored = model.compute_enhanced_ltv_analytic(columns)
+        paid = ~np.isnan(scored['payback_month'])
+        industries = chunk['industry'].fillna(industry).astype(str).to_numpy() if 'industry' in chunk else industry
+        flags = model.classify_batch(scored, columns, industries)['flags']
+        frame = pd.DataFrame({
+            'segment': segments,
+            'rows': 1,
+            'customers': weight,
+            'ltv_sum': scored['ltv'] * weight,
+            'cac_sum': columns['cac'] * weight,
+            'ltv_cac_sum': scored['ltv_cac'] * weight,
+            'below_one': (scored['ltv_cac'] < 1) * weight,
+            'paid_back': paid * weight,
+            'payback_sum': np.where(paid, scored['payback_month'], 0.0) * weight,
+            **{code: flags[:, model.INSIGHT_CODES.index(code)] * weight for code in SEGMENT_INSIGHT_COLUMNS}
+        })
+        partial = frame.groupby('segment', sort=False).sum()
+        totals = partial if totals is None else totals.add(partial, fill_value=0)
+    if totals is None:
+        raise ValueError("В файле нет валидных строк" if rejected_totals is not None else "Файл не содержит строк")
+    if rejected_totals is not None:
+        totals = totals.reindex(totals.index.union(rejected_totals.index, sort=False), fill_value=0)
+    rejected = (rejected_totals if rejected_totals is not None else pd.Series(dtype=np.int64)).reindex(totals.index, fill_value=0)
+    customers = totals['customers'].where(totals['customers'] > 0)
+    result = pd.DataFrame({
+        'Сегмент': totals.index,
+        'Строк': totals['rows'].astype(np.int64),
+        'Отклонено строк': rejected.astype(np.int64),
+        'Клиентов': customers,
+        'Средний LTV (₽)': (totals['ltv_sum'] / customers).round(0),
+        'Средний CAC (₽)': (totals['cac_sum'] / customers).round(0),
+        'LTV/CAC портфеля': (totals['ltv_sum'] / totals['cac_sum']).round(2),
+        'Средний LTV/CAC': (totals['ltv_cac_sum'] / customers).round(2),
+        'Доля LTV/CAC < 1 (%)': (totals['below_one'] / customers * 100).round(1),
+        'Средний payback (мес.)': (totals['payback_sum'] / totals['paid_back'].where(totals['paid_back'] > 0)).round(1),
+        **{label: (totals[code] / customers * 100).round(1) for code, label in SEGMENT_INSIGHT_COLUMNS.items()}
+    })
+    return result.sort_values('Средний LTV (₽)', ascending=False).reset_index(drop=True)
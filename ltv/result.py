@@ -0,0 +1,57 @@
+"""Компактный результат расчета LTV для одного набора параметров."""
+from collections.abc import Mapping
+
+
+class LTVResult(Mapping):
+    """Скаляры — атрибуты в __slots__, помесячные кривые — отдельный словарь.
+
+    Совместим с прежним словарем из compute_enhanced_ltv: result['ltv'],
+    result.get(...), dict(result) и итерация по тем же ключам; доступны и
+    атрибуты (result.ltv, result.monthly_cf). curves — словарь кривых,
+    обычно срезы-представления матриц батча (см. EnhancedLTVModel.batch_row).
+    """
+    SCALAR_KEYS = ('ltv', 'ltv_cac', 'roi', 'payback_month', 'customer_lifetime',
+                   'monthly_retention', 'annual_retention', 'confidence_score')
+    CURVE_KEYS = ('monthly_cf', 'cumulative_cf', 'months', 'survival_curve')
+    __slots__ = SCALAR_KEYS + ('_curves',)
+
+    def __init__(self, scalars, curves):
+        for key in self.SCALAR_KEYS:
+            setattr(self, key, scalars[key])
+        self._curves = curves
+
+    def curves(self):
+        return self._curves
+
+    def scalars(self):
+        return {key: getattr(self, key) for key in self.SCALAR_KEYS}
+
+    def __getitem__(self, key):
+        if key in self.SCALAR_KEYS:
+            return getattr(self, key)
+        if key in self.CURVE_KEYS:
+            return self.curves()[key]
+        raise KeyError(key)
+
+    def __getattr__(self, name):
+        # Вызывается только для имен вне __slots__, т.е. для кривых
+        if name in LTVResult.CURVE_KEYS:
+            return self.curves()[name]
+        raise AttributeError(name)
+
+    def __contains__(self, key):
+        return key in self.SCALAR_KEYS or key in self.CURVE_KEYS
+
+    def __iter__(self):
+        return iter(self.SCALAR_KEYS + self.CURVE_KEYS)
+
+    def __len__(self):
+        return len(self.SCALAR_KEYS) + len(self.CURVE_KEYS)
+
+    def __reduce__(self):
+        # __slots__ без __dict__: состояние передается через аргументы конструктора
+        return self.__class__, (self.scalars(), dict(self._curves))
+
+    def __repr__(self):
+        scalars = ', '.join(f"{key}={getattr(self, key)!r}" for key in self.SCALAR_KEYS[:4])
+        return f"LTVResult({scalars}, horizon={len(self._curves['months'])})"
@@ -0,0 +1,46 @@
+"""Квазислучайная последовательность Соболя для глобального анализа чувствительности.
+
+Направляющие числа — Joe & Kuo (new-joe-kuo-6.21201), первые 16 измерений.
+Точка с номером i — XOR направляющих чисел по установленным битам i,
+поэтому любой отрезок последовательности считается независимо: чанки
+можно раздавать процессам, и результат не зависит от разбиения.
+"""
+import numpy as np
+
+# (степень s, коэффициенты a, начальные m_1..m_s) для измерений 2..16
+DIRECTION_NUMBERS = (
+    (1, 0, (1,)), (2, 1, (1, 3)), (3, 1, (1, 3, 1)), (3, 2, (1, 1, 1)),
+    (4, 1, (1, 1, 3, 3)), (4, 4, (1, 3, 5, 13)), (5, 2, (1, 1, 5, 5, 17)),
+    (5, 4, (1, 1, 5, 5, 5)), (5, 7, (1, 1, 7, 11, 19)), (5, 11, (1, 1, 5, 1, 1)),
+    (5, 13, (1, 1, 1, 3, 11)), (5, 14, (1, 3, 5, 5, 31)), (6, 1, (1, 3, 3, 9, 7, 49)),
+    (6, 13, (1, 1, 1, 15, 21, 21)), (6, 16, (1, 3, 1, 13, 27, 49)),
+)
+MAX_DIM = len(DIRECTION_NUMBERS) + 1
+BITS = 32
+
+def direction_vectors(dim):
+    """Матрица (dim, BITS) направляющих чисел, сдвинутых к старшим битам."""
+    if not 1 <= dim <= MAX_DIM:
+        raise ValueError(f"Последовательность Соболя поддерживает от 1 до {MAX_DIM} измерений")
+    vectors = np.empty((dim, BITS), dtype=np.uint64)
+    vectors[0] = [1 << (BITS - k) for k in range(1, BITS + 1)]
+    for j, (s, a, initial) in enumerate(DIRECTION_NUMBERS[:dim - 1], start=1):
+        m = list(initial)
+        for k in range(s, BITS):
+            value = m[k - s] ^ (m[k - s] << s)
+            for bit in range(1, s):
+                if (a >> (s - 1 - bit)) & 1:
+                    value ^= m[k - bit] << bit
+            m.append(value)
+        vectors[j] = [m[k] << (BITS - 1 - k) for k in range(BITS)]
+    return vectors
+
+def sobol_points(start, n, dim):
+    """Точки start..start+n-1 последовательности в [0, 1)^dim, массив (n, dim)."""
+    vectors = direction_vectors(dim)
+    index = np.arange(start, start + n, dtype=np.uint64)
+    points = np.zeros((n, dim), dtype=np.uint64)
+    for k in range(int(start + n).bit_length()):
+        bit = ((index >> np.uint64(k)) & np.uint64(1)).astype(bool)
+        points[bit] ^= vectors[:, k]
+    return points.astype(float) / float(1 << BITS)
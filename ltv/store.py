@@ -0,0 +1,177 @@
+"""Локальное хранилище расчетов на SQLite: параметры, KPI и сжатые кривые.
+
+Параметры и скалярные KPI лежат в колонках таблицы runs с индексами по
+дате, отрасли и KPI, поэтому фильтры query выполняет SQLite. Кривые
+(помесячный CF и выживаемость) хранятся в таблице curves одним блобом на
+расчет: float32, байты перегруппированы по разрядам и сжаты zlib.
+load_curves читает блобы пачкой и собирает матрицы для наложения графиков.
+"""
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import date, datetime
+
+import numpy as np
+
+from .model import EnhancedLTVModel
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    name TEXT,
+    industry TEXT NOT NULL,
+    params TEXT NOT NULL,
+    horizon_months INTEGER NOT NULL,
+    ltv REAL NOT NULL,
+    ltv_cac REAL NOT NULL,
+    roi REAL NOT NULL,
+    payback_month INTEGER,
+    confidence_score REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_created_at ON runs (created_at);
+CREATE INDEX IF NOT EXISTS runs_industry ON runs (industry, created_at);
+CREATE INDEX IF NOT EXISTS runs_ltv ON runs (ltv);
+CREATE INDEX IF NOT EXISTS runs_ltv_cac ON runs (ltv_cac);
+CREATE INDEX IF NOT EXISTS runs_payback ON runs (payback_month);
+CREATE TABLE IF NOT EXISTS curves (
+    run_id INTEGER PRIMARY KEY REFERENCES runs (id) ON DELETE CASCADE,
+    length INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+"""
+RUN_COLUMNS = ('id', 'created_at', 'name', 'industry', 'params', 'horizon_months',
+               'ltv', 'ltv_cac', 'roi', 'payback_month', 'confidence_score')
+# Фильтры query: аргумент -> условие
+FILTERS = {
+    'since': 'created_at >= ?', 'until': 'created_at < ?',
+    'ltv_min': 'ltv >= ?', 'ltv_max': 'ltv <= ?',
+    'ltv_cac_min': 'ltv_cac >= ?', 'ltv_cac_max': 'ltv_cac <= ?',
+    'payback_max': 'payback_month <= ?'
+}
+# Ниже лимита SQLite на число параметров запроса в старых сборках (999)
+MAX_SQL_VARIABLES = 900
+
+def pack_curves(monthly_cf, survival_curve):
+    data = np.ascontiguousarray(np.stack([monthly_cf, survival_curve]), dtype=np.float32)
+    # Одноименные байты соседних чисел почти совпадают, подряд они сжимаются лучше
+    return zlib.compress(data.view(np.uint8).reshape(-1, 4).T.tobytes(), 6)
+
+def unpack_curves(blob, length):
+    shuffled = np.frombuffer(zlib.decompress(blob), dtype=np.uint8).reshape(4, -1)
+    return np.ascontiguousarray(shuffled.T).view(np.float32).reshape(2, length)
+
+def _timestamp(value):
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day).timestamp()
+    return float(value)
+
+class ScenarioStore:
+    """Хранилище в файле path (':memory:' — в памяти); потокобезопасно."""
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._conn.executescript(SCHEMA)
+
+    def save(self, params, industry, result, name=None, created_at=None):
+        """Сохраняет расчет (LTVResult или словарь с KPI и кривыми); возвращает id."""
+        return self.save_many([(params, industry, result, name)], created_at)[0]
+
+    def save_many(self, runs, created_at=None):
+        """Сохраняет (params, industry, result, name) одной транзакцией; возвращает id."""
+        created_at = time.time() if created_at is None else _timestamp(created_at)
+        ids = []
+        with self._lock, self._conn:
+            for params, industry, result, name in runs:
+                payback = result['payback_month']
+                cursor = self._conn.execute(
+                    "INSERT INTO runs (created_at, name, industry, params, horizon_months, ltv, ltv_cac, roi, "
+                    "payback_month, confidence_score) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (created_at, name, industry,
+                     json.dumps({k: float(params[k]) for k in EnhancedLTVModel.BATCH_PARAMS}),
+                     int(params['horizon_months']), float(result['ltv']), float(result['ltv_cac']),
+                     float(result['roi']), None if payback is None else int(payback),
+                     float(result['confidence_score'])))
+                monthly_cf = np.asarray(result['monthly_cf'])
+                self._conn.execute("INSERT INTO curves (run_id, length, data) VALUES (?, ?, ?)",
+                                   (cursor.lastrowid, len(monthly_cf),
+                                    pack_curves(monthly_cf, result['survival_curve'])))
+                ids.append(cursor.lastrowid)
+        return ids
+
+    def query(self, industry=None, ids=None, limit=500, **filters):
+        """Расчеты, новые первыми; filters — ключи FILTERS (since/until — datetime, date или unix time)."""
+        conditions, args = [], []
+        if industry is not None:
+            conditions.append("industry = ?")
+            args.append(industry)
+        if ids is not None:
+            ids = [int(i) for i in ids][:MAX_SQL_VARIABLES]
+            conditions.append(f"id IN ({', '.join('?' * len(ids))})" if ids else "0")
+            args += ids
+        for key, value in filters.items():
+            if key not in FILTERS:
+                raise TypeError(f"Неизвестный фильтр: {key}")
+            if value is not None:
+                conditions.append(FILTERS[key])
+                args.append(_timestamp(value) if key in ('since', 'until') else value)
+        sql = f"SELECT {', '.join(RUN_COLUMNS)} FROM runs"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        with self._lock:
+            rows = self._conn.execute(sql, args + [int(limit)]).fetchall()
+        runs = [dict(zip(RUN_COLUMNS, row)) for row in rows]
+        for run in runs:
+            run['params'] = json.loads(run['params'])
+        return runs
+
+    def load_curves(self, ids):
+        """Кривые расчетов ids пачкой: матрицы (N, max horizon), хвосты коротких горизонтов — NaN.
+
+        Возвращает {'ids', 'months', 'monthly_cf', 'cumulative_cf', 'survival_curve'};
+        строки идут в порядке ids, отсутствующие id пропускаются.
+        """
+        ids = [int(i) for i in ids]
+        blobs = {}
+        with self._lock:
+            for start in range(0, len(ids), MAX_SQL_VARIABLES):
+                chunk = ids[start:start + MAX_SQL_VARIABLES]
+                blobs.update((run_id, (length, data)) for run_id, length, data in self._conn.execute(
+                    f"SELECT run_id, length, data FROM curves WHERE run_id IN ({', '.join('?' * len(chunk))})",
+                    chunk))
+        found = [i for i in ids if i in blobs]
+        horizon = max((blobs[i][0] for i in found), default=0)
+        monthly_cf = np.full((len(found), horizon), np.nan)
+        survival_curve = np.full((len(found), horizon), np.nan)
+        for row, run_id in enumerate(found):
+            length, data = blobs[run_id]
+            monthly_cf[row, :length], survival_curve[row, :length] = unpack_curves(data, length)
+        return {
+            'ids': found, 'months': np.arange(1, horizon + 1), 'monthly_cf': monthly_cf,
+            'cumulative_cf': np.cumsum(monthly_cf, axis=1), 'survival_curve': survival_curve
+        }
+
+    def delete(self, ids):
+        ids = [int(i) for i in ids]
+        with self._lock, self._conn:
+            for start in range(0, len(ids), MAX_SQL_VARIABLES):
+                chunk = ids[start:start + MAX_SQL_VARIABLES]
+                self._conn.execute(f"DELETE FROM runs WHERE id IN ({', '.join('?' * len(chunk))})", chunk)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,337 @@
+"""Полнофакторные прогоны по сетке параметров с результатами в файлах .npy.
+
+    python -m ltv.sweep run sweep_dir --axis avg_check=5000:50000:50 --axis monthly_churn_pct=1:30:59 ... [--workers 4]
+    python -m ltv.sweep query sweep_dir --keep monthly_churn_pct cac --ltv-cac-min 3
+
+Сетка — декартово произведение осей (остальные параметры фиксированы).
+Плоский индекс сетки режется на чанки; чанки считаются аналитическим
+движком в пуле процессов и пишутся прямо в отображенные в память файлы
+ltv.npy, ltv_cac.npy и payback_month.npy (float32, порядок C по осям).
+Готовые чанки отмечаются в chunks_done.npy, поэтому прерванный прогон
+продолжается с того же места. SweepResult читает результаты чанками и
+агрегирует их, не загружая сетку в память целиком; неготовые чанки
+(в файлах там нули) в срезы и свертки не попадают.
+"""
+import argparse
+import json
+import os
+import signal
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from .model import EnhancedLTVModel
+
+METRICS = ('ltv', 'ltv_cac', 'payback_month')
+META_FILE = 'sweep.json'
+DONE_FILE = 'chunks_done.npy'
+AGGREGATIONS = ('count', 'share', 'sum', 'mean', 'min', 'max')
+# Фиксированные параметры CLI по умолчанию — как в интерфейсе
+DEFAULT_PARAMS = {
+    'avg_check': 20000.0, 'purchases_per_year': 2.5, 'margin_pct': 50.0, 'cac': 15000.0,
+    'monthly_churn_pct': 8.0, 'discount_rate_pct': 12.0, 'horizon_months': 36
+}
+
+def _metric_path(directory, metric):
+    return os.path.join(directory, f"{metric}.npy")
+
+def _grid_coords(axes, start, stop):
+    """Значения осей для плоских индексов start..stop-1 (порядок C)."""
+    shape = tuple(len(values) for values in axes.values())
+    index = np.arange(start, stop)
+    return {name: np.asarray(values, dtype=float)[coords]
+            for (name, values), coords in zip(axes.items(), np.unravel_index(index, shape))}
+
+def sweep_chunk(directory, chunk):
+    """Считает чанк chunk и пишет его в файлы метрик; задача для пула процессов."""
+    with open(os.path.join(directory, META_FILE), encoding='utf-8') as f:
+        meta = json.load(f)
+    total = int(np.prod([len(v) for v in meta['axes'].values()]))
+    start = chunk * meta['chunk_size']
+    stop = min(start + meta['chunk_size'], total)
+    columns = dict(meta['base_params'])
+    columns.update(_grid_coords(meta['axes'], start, stop))
+    scored = EnhancedLTVModel().compute_enhanced_ltv_analytic(columns)
+    for metric in METRICS:
+        values = np.lib.format.open_memmap(_metric_path(directory, metric), mode='r+')
+        values[start:stop] = scored[metric]
+        values.flush()
+        del values
+    return chunk
+
+def run_sweep(directory, axes=None, base_params=None, chunk_size=2**19, executor=None, progress=None,
+              max_pending=8):
+    """Считает сетку axes ({параметр: значения}) в каталог directory; возвращает SweepResult.
+
+    Параметры вне axes берутся из base_params. Если в каталоге уже есть
+    прогон, axes и base_params можно не передавать: досчитываются только
+    неотмеченные чанки (с другой сеткой — ValueError). executor считает
+    чанки параллельно, держа в работе не больше max_pending;
+    progress(готово точек, всего точек, точек/с в этом запуске) вызывается
+    после каждого чанка.
+    """
+    meta_path = os.path.join(directory, META_FILE)
+    if os.path.exists(meta_path):
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+        if axes is not None and _normalize_axes(axes) != meta['axes']:
+            raise ValueError(f"В {directory} другая сетка: продолжить можно только тот же прогон")
+        if base_params is not None and _normalize_base(base_params, meta['axes']) != meta['base_params']:
+            raise ValueError(f"В {directory} прогон с другими фиксированными параметрами")
+    else:
+        if axes is None:
+            raise ValueError(f"В {directory} нет прогона: задайте оси сетки")
+        meta = _create_sweep(directory, _normalize_axes(axes), base_params or {}, chunk_size)
+    total = int(np.prod([len(v) for v in meta['axes'].values()]))
+    done = np.lib.format.open_memmap(os.path.join(directory, DONE_FILE), mode='r+')
+    pending = [int(c) for c in np.flatnonzero(done == 0)]
+    chunk_size = meta['chunk_size']
+    done_points = resumed_points = total - sum(min(chunk_size, total - c * chunk_size) for c in pending)
+    started = time.perf_counter()
+
+    def finish(chunk):
+        nonlocal done_points
+        # Чанк отмечается только после того, как воркер записал и сбросил его на диск
+        done[chunk] = 1
+        done.flush()
+        done_points += min(chunk_size, total - chunk * chunk_size)
+        if progress is not None:
+            progress(done_points, total, (done_points - resumed_points) / (time.perf_counter() - started))
+
+    if executor is None:
+        for chunk in pending:
+            finish(sweep_chunk(directory, chunk))
+    else:
+        queue = iter(pending)
+        running = {executor.submit(sweep_chunk, directory, c) for c in _take(queue, max_pending)}
+        try:
+            while running:
+                finished, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    finish(future.result())
+                running |= {executor.submit(sweep_chunk, directory, c) for c in _take(queue, len(finished))}
+        finally:
+            for future in running:
+                future.cancel()
+    return SweepResult(directory)
+
+def _take(iterator, n):
+    return [item for _, item in zip(range(n), iterator)]
+
+def _normalize_axes(axes):
+    names = list(axes)
+    unknown = [k for k in names if k not in EnhancedLTVModel.BATCH_PARAMS]
+    if unknown:
+        raise ValueError(f"Неизвестные параметры сетки: {', '.join(unknown)}")
+    return {k: [float(v) for v in np.atleast_1d(axes[k])] for k in names}
+
+def _normalize_base(base_params, axes):
+    fixed = [k for k in EnhancedLTVModel.BATCH_PARAMS if k not in axes]
+    missing = [k for k in fixed if k not in base_params]
+    if missing:
+        raise ValueError(f"Не заданы фиксированные параметры: {', '.join(missing)}")
+    return {k: float(base_params[k]) for k in fixed}
+
+def _create_sweep(directory, axes, base_params, chunk_size):
+    meta = {'axes': axes, 'base_params': _normalize_base(base_params, axes), 'chunk_size': int(chunk_size),
+            'metrics': list(METRICS), 'created': time.strftime('%Y-%m-%dT%H:%M:%S%z')}
+    total = int(np.prod([len(v) for v in axes.values()]))
+    os.makedirs(directory, exist_ok=True)
+    for metric in METRICS:
+        # Файлы создаются разреженными: место на диске занимают только посчитанные чанки
+        np.lib.format.open_memmap(_metric_path(directory, metric), mode='w+', dtype=np.float32, shape=(total,))
+    np.lib.format.open_memmap(os.path.join(directory, DONE_FILE), mode='w+', dtype=np.uint8,
+                              shape=(-(-total // chunk_size),))
+    # Метаданные пишутся последними: каталог без sweep.json считается пустым
+    with open(os.path.join(directory, META_FILE), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    return meta
+
+class SweepResult:
+    """Результаты прогона в directory; массивы открываются только на чтение через mmap."""
+
+    def __init__(self, directory):
+        with open(os.path.join(directory, META_FILE), encoding='utf-8') as f:
+            meta = json.load(f)
+        self.directory = directory
+        self.axes = {k: np.asarray(v) for k, v in meta['axes'].items()}
+        self.base_params = meta['base_params']
+        self.chunk_size = meta['chunk_size']
+        self.shape = tuple(len(v) for v in self.axes.values())
+        self.size = int(np.prod(self.shape))
+
+    @property
+    def complete(self):
+        """Доля посчитанных чанков."""
+        return float(self._done().mean())
+
+    def _done(self):
+        return np.load(os.path.join(self.directory, DONE_FILE), mmap_mode='r').astype(bool)
+
+    def _check_complete(self, allow_partial):
+        if not allow_partial and not self._done().all():
+            raise ValueError(f"Прогон в {self.directory} посчитан на {self.complete:.1%}: "
+                             "досчитайте его или передайте allow_partial=True")
+
+    def array(self, metric):
+        """Метрика формы shape без чтения с диска (np.memmap); в неготовых чанках — нули, см. complete."""
+        return np.load(_metric_path(self.directory, metric), mmap_mode='r').reshape(self.shape)
+
+    def slice(self, metric, allow_partial=False, **fixed):
+        """Срез метрики при фиксированных параметрах (берется ближайшее значение оси); читается только срез.
+
+        На неполном прогоне — ValueError, с allow_partial=True неготовые точки — NaN.
+        """
+        self._check_complete(allow_partial)
+        index = tuple(int(np.abs(values - fixed[name]).argmin()) if name in fixed else slice(None)
+                      for name, values in self.axes.items())
+        values = np.asarray(self.array(metric)[index], dtype=float)
+        coords = np.ix_(*(np.arange(len(v))[i] if isinstance(i, slice) else np.array([i])
+                          for i, v in zip(index, self.axes.values())))
+        finished = self._done()[np.ravel_multi_index(coords, self.shape) // self.chunk_size]
+        values[~finished.reshape(values.shape)] = np.nan
+        return values
+
+    def aggregate(self, metric, keep=(), how='mean', where=None, chunk_size=None, allow_partial=False):
+        """Свертка metric по всем осям, кроме keep, потоково по чанкам.
+
+        where — {метрика: (min, max)} с None для открытой границы; точки вне
+        условия и NaN (нет окупаемости) не учитываются. how: count, sum,
+        mean, min, max или share — доля точек ячейки, прошедших условие.
+        Возвращает массив формы [len(axes[k]) for k in keep] (для keep=() — 0-мерный).
+        На неполном прогоне — ValueError; с allow_partial=True свертка идет
+        только по готовым чанкам, и share — доля среди посчитанных точек.
+        """
+        if how not in AGGREGATIONS:
+            raise ValueError(f"how должен быть одним из: {', '.join(AGGREGATIONS)}")
+        self._check_complete(allow_partial)
+        done = self._done()
+        names = list(self.axes)
+        keep = list(keep)
+        keep_shape = tuple(self.shape[names.index(k)] for k in keep)
+        strides = {name: int(np.prod(self.shape[i + 1:])) for i, name in enumerate(names)}
+        cells = int(np.prod(keep_shape))
+        flat = {m: np.load(_metric_path(self.directory, m), mmap_mode='r') for m in {metric, *(where or {})}}
+        count_all = np.zeros(cells)
+        count = np.zeros(cells)
+        total = np.zeros(cells)
+        low = np.full(cells, np.inf)
+        high = np.full(cells, -np.inf)
+        step = chunk_size or self.chunk_size
+        for start in range(0, self.size, step):
+            stop = min(start + step, self.size)
+            index = np.arange(start, stop)
+            cell = np.zeros(stop - start, dtype=np.int64)
+            for k, length in zip(keep, keep_shape):
+                cell = cell * length + (index // strides[k]) % length
+            finished = done[index // self.chunk_size]
+            cell = cell[finished]
+            values = np.asarray(flat[metric][start:stop], dtype=float)[finished]
+            mask = ~np.isnan(values)
+            for name, (lo, hi) in (where or {}).items():
+                condition = np.asarray(flat[name][start:stop], dtype=float)[finished]
+                with np.errstate(invalid='ignore'):
+                    if lo is not None:
+                        mask &= condition >= lo
+                    if hi is not None:
+                        mask &= condition <= hi
+            count_all += np.bincount(cell, minlength=cells)
+            count += np.bincount(cell[mask], minlength=cells)
+            total += np.bincount(cell[mask], weights=values[mask], minlength=cells)
+            if how in ('min', 'max'):
+                np.minimum.at(low, cell[mask], values[mask])
+                np.maximum.at(high, cell[mask], values[mask])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result = {
+                'count': count, 'share': count / count_all, 'sum': total, 'mean': total / count,
+                'min': np.where(count > 0, low, np.nan), 'max': np.where(count > 0, high, np.nan)
+            }[how]
+        return result.reshape(keep_shape)
+
+    def feasible_share(self, keep=(), ltv_cac_min=3.0, payback_max=None, allow_partial=False):
+        """Доля точек с LTV/CAC ≥ ltv_cac_min (и payback ≤ payback_max) по ячейкам осей keep."""
+        where = {'ltv_cac': (ltv_cac_min, None)}
+        if payback_max is not None:
+            where['payback_month'] = (None, payback_max)
+        return self.aggregate('ltv_cac', keep, 'share', where, allow_partial=allow_partial)
+
+def parse_axis(text):
+    """'name=start:stop:num' (равномерно) или 'name=v1,v2,...'."""
+    name, _, spec = text.partition('=')
+    if not spec:
+        raise argparse.ArgumentTypeError(f"Ось задается как name=start:stop:num или name=v1,v2: {text}")
+    try:
+        if ':' in spec:
+            start, stop, num = spec.split(':')
+            values = np.linspace(float(start), float(stop), int(num))
+        else:
+            values = [float(v) for v in spec.split(',')]
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(f"Некорректная ось {text}: {e}") from e
+    return name.strip(), values
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+def _print_progress(done, total, rate):
+    eta = (total - done) / rate if rate > 0 else float('inf')
+    print(f"\r{done / total:6.1%}  {done:,}/{total:,} точек  {rate:,.0f} точек/с  осталось ~{eta:,.0f} с",
+          end='', file=sys.stderr, flush=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m ltv.sweep', description="Полнофакторный прогон по сетке параметров")
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help="Посчитать или продолжить прогон")
+    run_parser.add_argument('directory')
+    run_parser.add_argument('--axis', action='append', type=parse_axis, default=[],
+                            help="Ось сетки: name=start:stop:num или name=v1,v2 (повторяется)")
+    run_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    run_parser.add_argument('--chunk-size', type=int, default=2**19)
+    for name in EnhancedLTVModel.BATCH_PARAMS:
+        run_parser.add_argument(f"--{name.replace('_', '-')}", type=float, dest=name,
+                                help="Фиксированное значение, если параметр не задан осью")
+    query_parser = commands.add_parser('query', help="Доля точек с LTV/CAC ≥ порога по осям --keep")
+    query_parser.add_argument('directory')
+    query_parser.add_argument('--keep', nargs='*', default=[])
+    query_parser.add_argument('--ltv-cac-min', type=float, default=3.0)
+    query_parser.add_argument('--payback-max', type=float)
+    args = parser.parse_args(argv)
+    started = time.perf_counter()
+    try:
+        if args.command == 'run':
+            base = dict(DEFAULT_PARAMS)
+            base.update({k: getattr(args, k) for k in EnhancedLTVModel.BATCH_PARAMS if getattr(args, k) is not None})
+            axes = dict(args.axis) or None
+            # SIGTERM завершает прогон так же аккуратно, как Ctrl+C: воркеры останавливаются вместе с ним
+            signal.signal(signal.SIGTERM, _interrupt)
+            pool = ProcessPoolExecutor(args.workers) if args.workers > 1 else None
+            try:
+                result = run_sweep(args.directory, axes, base if axes else None, args.chunk_size, pool,
+                                   _print_progress, max_pending=2 * args.workers)
+            finally:
+                if pool is not None:
+                    pool.shutdown(cancel_futures=True)
+            print(f"\n{result.size:,} точек {dict(zip(result.axes, result.shape))} за "
+                  f"{time.perf_counter() - started:.1f} с -> {args.directory}", file=sys.stderr)
+        else:
+            result = SweepResult(args.directory)
+            if result.complete < 1:
+                print(f"Внимание: прогон посчитан на {result.complete:.1%}, доли — только по готовым точкам",
+                      file=sys.stderr)
+            share = result.feasible_share(args.keep, args.ltv_cac_min, args.payback_max, allow_partial=True)
+            grids = np.meshgrid(*(result.axes[k] for k in args.keep), indexing='ij')
+            print("\t".join(args.keep + ['share']))
+            for row in zip(*(g.ravel() for g in grids), share.ravel()):
+                print("\t".join(f"{v:g}" for v in row))
+    except (ValueError, KeyError, OSError) as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        print(f"\nПрервано; тот же run {args.directory} продолжит с последнего готового чанка", file=sys.stderr)
+        return 130
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
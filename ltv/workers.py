@@ -0,0 +1,136 @@
+"""Пул процессов для тяжелых расчетов (Monte Carlo, чувствительность, портфельные файлы, журналы, выгрузки).
+
+Функции модуля — задачи для ProcessPoolExecutor: они выполняются в
+прогретых воркерах, где модель создается один раз в init_worker, и не
+занимают CPU потоков веб-сервера.
+"""
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .model import EnhancedLTVModel
+
+_model = None
+
+WARMUP_PARAMS = {
+    'avg_check': 20000.0, 'purchases_per_year': 2.5, 'margin_pct': 50.0, 'cac': 15000.0,
+    'monthly_churn_pct': 8.0, 'discount_rate_pct': 12.0, 'horizon_months': 36
+}
+_encode_json = json.JSONEncoder(ensure_ascii=False).encode
+# Длиннее горизонты в API не принимаются: немонотонные потоки считаются помесячно
+MAX_HORIZON_MONTHS = 1200
+
+def init_worker():
+    global _model
+    from . import portfolio, survival  # noqa: F401 — pandas загружается при старте воркера, а не в первом запросе
+    _model = EnhancedLTVModel()
+    _model.compute_enhanced_ltv_analytic(WARMUP_PARAMS)
+
+def _get_model():
+    return _model if _model is not None else EnhancedLTVModel()
+
+def ping(_=None):
+    return os.getpid()
+
+def monte_carlo(base_params, spread_pct, n_draws, seed):
+    model = _get_model()
+    distributions = model.default_distributions(base_params, spread_pct)
+    return model.simulate_monte_carlo(base_params, distributions, n_draws=n_draws, seed=seed)
+
+def sensitivity_grid(base_params, x_param, y_param, x_values, y_values):
+    return _get_model().sensitivity_grid(base_params, x_param, y_param, x_values, y_values)
+
+def tornado(base_params, swing_pct):
+    return _get_model().tornado(base_params, swing_pct)
+
+def benchmark_thresholds(params, industry, solve_for, ltv_cac_min, payback_max):
+    return _get_model().benchmark_thresholds(params, industry, solve_for, ltv_cac_min, payback_max)
+
+def sobol(base_params, spread_pct, n_samples, tol):
+    return _get_model().sobol_indices(base_params, spread_pct=spread_pct, n_samples=n_samples, tol=tol)
+
+def score_segments(path, discount_rate_pct, horizon_months, industry="SaaS"):
+    from .portfolio import score_segments_file
+    return score_segments_file(path, discount_rate_pct, horizon_months, model=_get_model(), industry=industry)
+
+def fit_empirical(path, inactivity_months):
+    """Кривые Kaplan–Meier по журналу без кэша: кэш по SHA-256 файла ведет главный процесс."""
+    from .survival import compute_empirical_curves
+    return compute_empirical_curves(path, inactivity_months)
+
+def export_monte_carlo(base_params, spread_pct, n_draws, seed, path):
+    """Пишет результаты каждого розыгрыша в path потоково; возвращает число строк."""
+    import pandas as pd
+    from .io import write_chunks
+    model = _get_model()
+    distributions = model.default_distributions(base_params, spread_pct)
+    draws = model.iter_monte_carlo_draws(base_params, distributions, n_draws=n_draws, seed=seed)
+    return write_chunks((pd.DataFrame(chunk) for chunk in draws), path)
+
+def export_segments(path, discount_rate_pct, horizon_months, output_path):
+    """Построчные результаты файла сегментов (как python -m ltv) в output_path."""
+    from .cli import score_grid_chunks
+    from .io import write_chunks
+    return write_chunks(score_grid_chunks(path, discount_rate_pct, horizon_months, model=_get_model()), output_path)
+
+def score_rows(columns, ids, industries, offset=0):
+    """Скоринг чанка HTTP API (ltv.api): NDJSON-строки результатов в порядке входа.
+
+    columns — float-колонки BATCH_PARAMS (NaN — поле отсутствует или не число),
+    offset — индекс первой строки чанка в запросе.
+    """
+    model = _get_model()
+    n = len(ids)
+    # Ошибки полей и правил модели — маски по колонкам, сообщения собираются построчно
+    checks = [(f"Поле {key} отсутствует или не является числом", ~np.isfinite(columns[key]))
+              for key in model.BATCH_PARAMS]
+    horizon = columns['horizon_months']
+    checks.append((f"horizon_months должен быть целым числом от 1 до {MAX_HORIZON_MONTHS}",
+                   np.isfinite(horizon) & ((horizon < 1) | (horizon > MAX_HORIZON_MONTHS) | (horizon % 1 != 0))))
+    warnings, rule_errors = model.validate_batch(columns)
+    checks += rule_errors
+    failed = np.zeros(n, dtype=bool)
+    for _, mask in checks:
+        failed |= mask
+    errors = [[] for _ in range(n)]
+    for message, mask in checks:
+        for i in np.flatnonzero(mask):
+            errors[i].append(message)
+    ok = ~failed
+    if ok.any():
+        params = {k: v[ok] for k, v in columns.items()}
+        scored = model.compute_enhanced_ltv_analytic(params)
+        # Правила инсайтов — маски по чанку; построчно только подставляются тексты сработавших
+        flags = model.classify_batch(scored, params, np.asarray(industries, dtype=object)[ok])['flags']
+    lines = []
+    j = 0
+    for i in range(n):
+        if failed[i]:
+            row = {'index': offset + i, 'id': ids[i], 'errors': errors[i]}
+        else:
+            payback = scored['payback_month'][j]
+            ltv_data = {
+                'ltv': float(scored['ltv'][j]), 'ltv_cac': float(scored['ltv_cac'][j]),
+                'roi': float(scored['roi'][j]), 'payback_month': None if np.isnan(payback) else int(payback)
+            }
+            params = {'monthly_churn_pct': float(columns['monthly_churn_pct'][i]),
+                      'margin_pct': float(columns['margin_pct'][i])}
+            row = dict({'index': offset + i, 'id': ids[i]}, **ltv_data,
+                       warnings=[message for message, mask in warnings if mask[i]],
+                       insights=model.render_insights(flags[j], ltv_data, params, industries[i]))
+            j += 1
+        lines.append(_encode_json(row))
+    return ("\n".join(lines) + "\n").encode('utf-8') if lines else b""
+
+def create_pool(max_workers):
+    """Создает пул; на POSIX воркеры форкаются, чтобы не импортировать заново главный модуль."""
+    method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(method),
+                               initializer=init_worker)
+
+def warm_up(pool, max_workers):
+    """Запускает все воркеры заранее; возвращает их PID."""
+    return set(pool.map(ping, range(max_workers * 2)))
@@ -1,21 +1,45 @@
 import gradio as gr
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+import matplotlib.style
+from matplotlib.collections import LineCollection
+from matplotlib.colors import TwoSlopeNorm
+from matplotlib.figure import Figure
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import base64
+import functools
+import inspect
+import io
+import logging
+import os
+import tempfile
+import threading
+import time
 import warnings
+
+from ltv import EnhancedLTVModel, ResultCache, workers
+from ltv.api import create_routes
+from ltv.io import write_chunks
+from ltv.incremental import DependencyGraph, GraphState
+from ltv.metrics import Metrics
+from ltv.store import ScenarioStore
+from ltv.survival import curve_cache, curves_cache_key
+from gradio.components.plot import PlotData
+from fastapi.responses import PlainTextResponse
+from fastapi.routing import APIRoute
 warnings.filterwarnings('ignore')
 
-# Настройка matplotlib для темной темы
-plt.style.use('dark_background')
-plt.rcParams['figure.facecolor'] = '#0E0E0E'
-plt.rcParams['axes.facecolor'] = '#1a1a1a'
-plt.rcParams['axes.edgecolor'] = '#2E2E2E'
-plt.rcParams['grid.color'] = '#333333'
-plt.rcParams['text.color'] = '#e6e6e6'
-plt.rcParams['axes.labelcolor'] = '#e6e6e6'
-plt.rcParams['xtick.color'] = '#e6e6e6'
-plt.rcParams['ytick.color'] = '#e6e6e6'
+# Настройка matplotlib для темной темы (графики строятся через Figure API, без pyplot)
+matplotlib.style.use('dark_background')
+matplotlib.rcParams['figure.facecolor'] = '#0E0E0E'
+matplotlib.rcParams['axes.facecolor'] = '#1a1a1a'
+matplotlib.rcParams['axes.edgecolor'] = '#2E2E2E'
+matplotlib.rcParams['grid.color'] = '#333333'
+matplotlib.rcParams['text.color'] = '#e6e6e6'
+matplotlib.rcParams['axes.labelcolor'] = '#e6e6e6'
+matplotlib.rcParams['xtick.color'] = '#e6e6e6'
+matplotlib.rcParams['ytick.color'] = '#e6e6e6'
 
 # =========================
 # Брендинг Ultima
@@ -28,6 +52,9 @@ ULTIMA_WARNING = "#ffcf3a"
 ULTIMA_ERROR = "#ff5f73"
 ULTIMA_INFO = "#5ab0ff"
 
+SCENARIO_COLORS = {"Пессимистичный": "#ff5f73", "Базовый": "#5ab0ff", "Оптимистичный": "#3bd16f",
+                   "Эмпирический": ULTIMA_GOLD}
+
 ENHANCED_HEADER_HTML = f"""
 <div style="display:flex;align-items:center;gap:20px;margin-bottom:12px;padding:16px;background:linear-gradient(135deg,{ULTIMA_DARK},{ULTIMA_GRAY});border-radius:16px">
   <img src="https://cdn-uploads.huggingface.co/production/uploads/68a5d644d41e00d772823934/bmu2UTnqh39vYO0wRV718.png" style="width:64px;height:64px"/> 
@@ -108,126 +135,108 @@ ENHANCED_KPI_CSS = f"""
 </style>
 """
 
+model = EnhancedLTVModel()
+
 # =========================
-# Улучшенная модель расчетов
+# Кэш результатов
 # =========================
-class EnhancedLTVModel:
-    def __init__(self):
-        self.industry_benchmarks = {
-            "SaaS": {"ltv_cac_min": 3.0, "payback_max": 12, "churn_typical": 5},
-            "E-commerce": {"ltv_cac_min": 2.5, "payback_max": 6, "churn_typical": 15},
-            "Marketplace": {"ltv_cac_min": 2.0, "payback_max": 8, "churn_typical": 12},
-            "Fintech": {"ltv_cac_min": 4.0, "payback_max": 18, "churn_typical": 8},
-            "Услуги (салоны, фитнес, обучение)": {"ltv_cac_min": 2.0, "payback_max": 9, "churn_typical": 20,},
-        }
-    
-    def validate_inputs(self, params):
-        warnings = []
-        errors = []
-        if params['avg_check'] <= 0:
-            errors.append("Средний чек должен быть положительным")
-        if params['cac'] <= 0:
-            errors.append("CAC должен быть положительным")
-        if params['monthly_churn_pct'] >= 50:
-            warnings.append("⚠️ Очень высокий отток - проверьте корректность данных")
-        if params['margin_pct'] < 20:
-            warnings.append("⚠️ Низкая маржинальность может негативно влиять на LTV")
-        if params['avg_check'] < params['cac']:
-            warnings.append("⚠️ Средний чек меньше CAC - окупаемость под вопросом")
-        return warnings, errors
-
-    def calculate_scenarios(self, base_params):
-        scenarios = {}
-        multipliers = {
-            "Пессимистичный": {"churn": 1.5, "margin": 0.8, "check": 0.9},
-            "Базовый": {"churn": 1.0, "margin": 1.0, "check": 1.0},
-            "Оптимистичный": {"churn": 0.7, "margin": 1.2, "check": 1.1}
-        }
-        for scenario_name, mult in multipliers.items():
-            params = base_params.copy()
-            params['monthly_churn_pct'] *= mult['churn']
-            params['margin_pct'] *= mult['margin']
-            params['avg_check'] *= mult['check']
-            ltv_data = self.compute_enhanced_ltv(params)
-            scenarios[scenario_name] = ltv_data
-        return scenarios
-
-    def compute_enhanced_ltv(self, params):
-        monthly_revenue = (params['avg_check'] * params['purchases_per_year']) / 12.0
-        monthly_margin = monthly_revenue * (params['margin_pct'] / 100.0)
-        survival_rate = 1.0 - params['monthly_churn_pct'] / 100.0
-        monthly_discount = 1.0 / ((1.0 + params['discount_rate_pct'] / 100.0) ** (1.0 / 12.0))
-        months = np.arange(1, params['horizon_months'] + 1)
-        survival_curve = survival_rate ** (months - 1)
-        discount_curve = monthly_discount ** months
-        seasonality = 1 + 0.05 * np.sin(2 * np.pi * months / 12)
-        monthly_cf = monthly_margin * seasonality * survival_curve * discount_curve
-        cumulative_cf = np.cumsum(monthly_cf)
-        ltv = float(np.sum(monthly_cf))
-        ltv_cac = (ltv / params['cac']) if params['cac'] > 0 else 0
-        roi = ((ltv - params['cac']) / params['cac']) if params['cac'] > 0 else 0
-        payback_month = None
-        if np.any(cumulative_cf >= params['cac']):
-            payback_month = int(months[cumulative_cf >= params['cac']][0])
-        customer_lifetime = 1 / (params['monthly_churn_pct'] / 100) if params['monthly_churn_pct'] > 0 else np.inf
-        monthly_retention = (1 - params['monthly_churn_pct'] / 100) * 100
-        annual_retention = ((1 - params['monthly_churn_pct'] / 100) ** 12) * 100
-        confidence_score = min(100, max(0, (ltv_cac - 1) * 25)) if ltv_cac > 0 else 0
-        return {
-            'ltv': ltv, 'ltv_cac': ltv_cac, 'roi': roi,
-            'payback_month': payback_month, 'customer_lifetime': customer_lifetime,
-            'monthly_retention': monthly_retention, 'annual_retention': annual_retention,
-            'confidence_score': confidence_score,
-            'monthly_cf': monthly_cf, 'cumulative_cf': cumulative_cf,
-            'months': months, 'survival_curve': survival_curve
-        }
-
-    def generate_insights(self, ltv_data, params, industry="SaaS"):
-        insights = []
-        benchmark = self.industry_benchmarks.get(industry, self.industry_benchmarks["SaaS"])
-        if ltv_data['ltv_cac'] < benchmark['ltv_cac_min']:
-            insights.append({
-                "icon": "⚠️", "type": "warning",
-                "text": f"LTV/CAC ниже отраслевого минимума ({benchmark['ltv_cac_min']}). Необходимо увеличить LTV или снизить CAC."
-            })
-        else:
-            insights.append({
-                "icon": "✅", "type": "success", 
-                "text": f"LTV/CAC соответствует отраслевым стандартам ({ltv_data['ltv_cac']:.1f})."
-            })
-        if ltv_data['payback_month'] and ltv_data['payback_month'] <= benchmark['payback_max']:
-            insights.append({
-                "icon": "🚀", "type": "success",
-                "text": f"Отличный payback период ({ltv_data['payback_month']} мес.) - быстрая окупаемость."
-            })
-        elif ltv_data['payback_month']:
-            insights.append({
-                "icon": "⏳", "type": "warning",
-                "text": f"Payback период ({ltv_data['payback_month']} мес.) выше рекомендуемого ({benchmark['payback_max']} мес.)."
-            })
-        if params['monthly_churn_pct'] > benchmark['churn_typical'] * 1.5:
-            insights.append({
-                "icon": "📉", "type": "error",
-                "text": f"Критически высокий отток ({params['monthly_churn_pct']:.1f}% в месяц). Срочно требуется работа с retention."
-            })
-        if ltv_data['ltv_cac'] < 3:
-            if params['margin_pct'] < 30:
-                insights.append({
-                    "icon": "💡", "type": "info",
-                    "text": "Рекомендация: увеличить маржинальность через апсейл или снижение затрат."
-                })
-            if params['monthly_churn_pct'] > 10:
-                insights.append({
-                    "icon": "💡", "type": "info", 
-                    "text": "Рекомендация: инвестировать в программы лояльности для снижения оттока."
-                })
-        return insights
+result_cache = ResultCache(
+    maxsize=int(os.environ.get('LTV_CACHE_SIZE', 128)),
+    ttl=float(os.environ.get('LTV_CACHE_TTL', 600)) or None
+)
 
-model = EnhancedLTVModel()
+# =========================
+# Метрики и профилирование
+# =========================
+metrics = Metrics.from_env()
+
+def profile_requested(request):
+    """cProfile для запроса включается параметром ?profile=1 или заголовком X-LTV-Profile: 1."""
+    if request is None:
+        return False
+    return request.query_params.get('profile') == '1' or request.headers.get('x-ltv-profile') == '1'
+
+def response_size(value):
+    if isinstance(value, tuple):
+        return sum(response_size(v) for v in value)
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    if isinstance(value, PlotData):
+        return len(value.plot)
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=False, deep=True).sum())
+    return 0
+
+def instrumented(endpoint):
+    """Оборачивает обработчик в metrics.request; request: gr.Request в сигнатуре включает ?profile=1."""
+    def decorate(fn):
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            request = signature.bind_partial(*args, **kwargs).arguments.get('request')
+            with metrics.request(endpoint, profile=profile_requested(request)):
+                result = fn(*args, **kwargs)
+                if metrics.enabled:
+                    metrics.annotate(bytes=response_size(result))
+                return result
+        return wrapper
+    return decorate
+
+def metrics_endpoint():
+    stats = result_cache.stats()
+    return PlainTextResponse(metrics.render_prometheus(extra=[
+        ('ltv_cache_hits_total', 'counter', "Попадания в кэш результатов", stats['hits']),
+        ('ltv_cache_misses_total', 'counter', "Промахи кэша результатов", stats['misses']),
+        ('ltv_cache_entries', 'gauge', "Записей в кэше результатов", stats['size']),
+    ]), media_type='text/plain; version=0.0.4')
+
+# Графики независимы и строятся параллельно; Figure без pyplot не попадает
+# в глобальный реестр фигур и освобождается вместе с результатом
+chart_pool = ThreadPoolExecutor(max_workers=int(os.environ.get('LTV_RENDER_THREADS', 3)),
+                                thread_name_prefix='ltv-chart')
+
+def render_plot(build_chart, *args, fmt='webp'):
+    """Строит и сразу растеризует график; кэшируется готовая картинка, а не Figure."""
+    with metrics.span(f"build:{build_chart.__name__}"):
+        fig = build_chart(*args)
+    with metrics.span(f"render:{build_chart.__name__}"), io.BytesIO() as buffer:
+        fig.savefig(buffer, format=fmt)
+        payload = base64.b64encode(buffer.getvalue()).decode('ascii')
+    return PlotData(type='matplotlib', plot=f"data:image/{fmt};base64,{payload}")
+
+# =========================
+# Вынос тяжелых расчетов в пул процессов
+# =========================
+OFFLOAD_WORKERS = int(os.environ.get('LTV_WORKERS', max(1, min(4, os.cpu_count() or 1))))
+CALCULATE_CONCURRENCY = int(os.environ.get('LTV_CONCURRENCY', 8))
+_offload_pool = None
+_offload_lock = threading.Lock()
+
+def get_offload_pool():
+    global _offload_pool
+    with _offload_lock:
+        if _offload_pool is None:
+            _offload_pool = workers.create_pool(OFFLOAD_WORKERS)
+        return _offload_pool
+
+def offload(fn, *args):
+    """Выполняет fn в пуле процессов; поток запроса только ждет результат."""
+    return get_offload_pool().submit(fn, *args).result()
+
+# HTTP API пакетного скоринга (POST /api/v1/score, NDJSON) — монтируется вместе с интерфейсом
+api_routes = create_routes(
+    get_offload_pool, OFFLOAD_WORKERS,
+    max_items=int(os.environ.get('LTV_API_MAX_ITEMS', 100_000)),
+    max_bytes=int(os.environ.get('LTV_API_MAX_MB', 32)) * 2**20,
+    max_concurrent=int(os.environ.get('LTV_API_CONCURRENCY', 2)),
+    max_pending=int(os.environ.get('LTV_API_QUEUE', 8))
+)
 
 def create_scenarios_chart(scenarios):
-    fig, ax = plt.subplots(figsize=(12, 6))
-    colors = {"Пессимистичный": "#ff5f73", "Базовый": "#5ab0ff", "Оптимистичный": "#3bd16f"}
+    fig = Figure(figsize=(12, 6))
+    ax = fig.subplots()
+    colors = SCENARIO_COLORS
     for scenario_name, data in scenarios.items():
         ax.plot(data['months'], data['cumulative_cf'], 
                label=f"CF {scenario_name}", color=colors[scenario_name], linewidth=3)
@@ -237,12 +246,13 @@ def create_scenarios_chart(scenarios):
     ax.set_title("📊 Кумулятивный Cash Flow по сценариям", fontsize=14, pad=20)
     ax.legend()
     ax.grid(True, alpha=0.3)
-    plt.tight_layout()
+    fig.tight_layout()
     return fig
 
 def create_survival_chart(scenarios):
-    fig, ax = plt.subplots(figsize=(12, 6))
-    colors = {"Пессимистичный": "#ff5f73", "Базовый": "#5ab0ff", "Оптимистичный": "#3bd16f"}
+    fig = Figure(figsize=(12, 6))
+    ax = fig.subplots()
+    colors = SCENARIO_COLORS
     for scenario_name, data in scenarios.items():
         ax.plot(data['months'], data['survival_curve'] * 100, 
                label=f"Выживаемость {scenario_name}", color=colors[scenario_name], linewidth=3)
@@ -253,23 +263,23 @@ def create_survival_chart(scenarios):
     ax.set_ylim(0, 100)
     ax.legend()
     ax.grid(True, alpha=0.3)
-    plt.tight_layout()
+    fig.tight_layout()
     return fig
 
 def create_sensitivity_chart(base_params):
-    fig, ax = plt.subplots(figsize=(12, 6))
+    fig = Figure(figsize=(12, 6))
+    ax = fig.subplots()
     params_to_test = ['avg_check', 'margin_pct', 'monthly_churn_pct', 'purchases_per_year']
     param_names = ['Средний чек', 'Маржа %', 'Отток %', 'Покупок/год']
     variations = np.linspace(0.5, 1.5, 11)
     colors = ['#5ab0ff', '#3bd16f', '#ff5f73', '#ffcf3a']
+    columns = {k: np.full((len(params_to_test), len(variations)), base_params[k], dtype=float)
+               for k in model.BATCH_PARAMS}
+    for i, param in enumerate(params_to_test):
+        columns[param][i] *= variations
+    ltv_cac_values = model.compute_enhanced_ltv_analytic(columns)['ltv_cac'].reshape(len(params_to_test), -1)
     for i, param in enumerate(params_to_test):
-        ltv_cac_values = []
-        for mult in variations:
-            test_params = base_params.copy()
-            test_params[param] *= mult
-            ltv_data = model.compute_enhanced_ltv(test_params)
-            ltv_cac_values.append(ltv_data['ltv_cac'])
-        ax.plot(variations * 100, ltv_cac_values, 
+        ax.plot(variations * 100, ltv_cac_values[i], 
                label=param_names[i], color=colors[i], linewidth=3, marker='o', markersize=4)
     ax.axhline(y=3, color="#ffcf3a", linestyle="--", linewidth=2, alpha=0.8, label="Целевой LTV/CAC = 3.0")
     ax.axhline(y=1, color="#ff5f73", linestyle=":", linewidth=2, alpha=0.8, label="Критический уровень = 1.0")
@@ -278,21 +288,145 @@ def create_sensitivity_chart(base_params):
     ax.set_title("🎯 Анализ чувствительности LTV/CAC", fontsize=14, pad=20)
     ax.legend()
     ax.grid(True, alpha=0.3)
-    plt.tight_layout()
+    fig.tight_layout()
+    return fig
+
+SENSITIVITY_LABELS = {
+    'avg_check': 'Средний чек', 'purchases_per_year': 'Покупок/год', 'margin_pct': 'Маржа %',
+    'cac': 'CAC', 'monthly_churn_pct': 'Отток %', 'discount_rate_pct': 'Ставка дисконтирования %'
+}
+
+def sensitivity_axis(base_params, param, range_pct, resolution):
+    base = base_params[param]
+    low, high = model.MC_BOUNDS.get(param, (0.0, np.inf))
+    values = np.linspace(base * (1 - range_pct / 100), base * (1 + range_pct / 100), resolution)
+    return np.clip(values, low, high)
+
+def create_sensitivity_heatmap(base_params, x_param, y_param, x_values, y_values, grid):
+    resolution = len(x_values)
+    fig = Figure(figsize=(12, 6))
+    ax = fig.subplots()
+    extent = (x_values[0], x_values[-1], y_values[0], y_values[-1])
+    norm = TwoSlopeNorm(vmin=0.0, vcenter=3.0, vmax=max(6.0, float(np.nanmax(grid))))
+    image = ax.imshow(grid, origin='lower', extent=extent, aspect='auto', cmap='RdYlGn', norm=norm)
+    contours = ax.contour(x_values, y_values, grid, levels=[1.0, 3.0], colors=["#ff5f73", "#ffcf3a"],
+                          linestyles=[':', '--'], linewidths=2)
+    ax.clabel(contours, fmt={1.0: "1.0", 3.0: "3.0"})
+    ax.plot(base_params[x_param], base_params[y_param], marker='*', markersize=16,
+            color=ULTIMA_GOLD, markeredgecolor="black", label="Текущие параметры")
+    fig.colorbar(image, ax=ax, label="LTV/CAC")
+    ax.set_xlabel(SENSITIVITY_LABELS[x_param])
+    ax.set_ylabel(SENSITIVITY_LABELS[y_param])
+    ax.set_title(f"🗺️ LTV/CAC: {SENSITIVITY_LABELS[x_param]} × {SENSITIVITY_LABELS[y_param]} "
+                 f"({resolution}×{resolution})", fontsize=14, pad=20)
+    ax.legend(loc='upper right')
+    fig.tight_layout()
+    return fig
+
+def create_tornado_chart(tornado, swing_pct):
+    base, low, high = tornado['base'], tornado['low'], tornado['high']
+    labels = [SENSITIVITY_LABELS[k] for k in tornado['params']]
+    positions = np.arange(len(labels))[::-1]
+    fig = Figure(figsize=(12, 6))
+    ax = fig.subplots()
+    ax.barh(positions, low - base, left=base, height=0.6, color="#ff5f73", alpha=0.85,
+            label=f"Параметр −{swing_pct:g}%")
+    ax.barh(positions, high - base, left=base, height=0.6, color="#3bd16f", alpha=0.85,
+            label=f"Параметр +{swing_pct:g}%")
+    ax.axvline(x=base, color=ULTIMA_GOLD, linewidth=2, label=f"Базовый LTV/CAC = {base:.2f}")
+    ax.set_yticks(positions, labels)
+    ax.set_xlabel("LTV/CAC")
+    ax.set_title("🌪️ Влияние параметров на LTV/CAC", fontsize=14, pad=20)
+    ax.legend()
+    ax.grid(True, axis='x', alpha=0.3)
+    fig.tight_layout()
+    return fig
+
+SOBOL_LABELS = dict(SENSITIVITY_LABELS, horizon_months='Горизонт, мес')
+SOBOL_SAMPLES = [2**12, 2**14, 2**16, 2**18]
+# Полуширина доверительного интервала, при которой адаптивный режим останавливается
+SOBOL_TOL = 0.01
+
+def create_sobol_chart(sobol):
+    order = np.argsort(-sobol['total'], kind='stable')
+    labels = [SOBOL_LABELS[sobol['params'][i]] for i in order]
+    positions = np.arange(len(labels))[::-1]
+    fig = Figure(figsize=(12, 6))
+    ax = fig.subplots()
+    ax.barh(positions + 0.2, sobol['first_order'][order], xerr=sobol['first_order_ci'][order], height=0.4,
+            color="#5ab0ff", alpha=0.85, capsize=3, label="Первый порядок S1 (вклад параметра отдельно)")
+    ax.barh(positions - 0.2, sobol['total'][order], xerr=sobol['total_ci'][order], height=0.4,
+            color=ULTIMA_GOLD, alpha=0.85, capsize=3, label="Полный ST (с учетом взаимодействий)")
+    ax.set_yticks(positions, labels)
+    ax.set_xlabel(f"Доля дисперсии LTV/CAC (интервалы {sobol['confidence']:.0%})")
+    ax.set_title("🌐 Глобальная чувствительность: индексы Соболя", fontsize=14, pad=20)
+    ax.legend()
+    ax.grid(True, axis='x', alpha=0.3)
+    fig.tight_layout()
+    return fig
+
+def create_monte_carlo_chart(mc, cac):
+    fig = Figure(figsize=(12, 6))
+    ax, ax_payback = fig.subplots(1, 2, gridspec_kw={'width_ratios': [2, 1]})
+    months = mc['months']
+    bands = mc['bands']
+    levels = sorted(bands)
+    for low, high in zip(levels, reversed(levels)):
+        if low >= high:
+            break
+        ax.fill_between(months, bands[low], bands[high], color="#5ab0ff", alpha=0.2,
+                        label=f"P{low}–P{high}")
+    if 50 in bands:
+        ax.plot(months, bands[50], color="#5ab0ff", linewidth=3, label="Медиана")
+    ax.axhline(y=cac, color="#ffcf3a", linestyle="--", linewidth=2, label="CAC")
+    ax.set_xlabel("Месяц")
+    ax.set_ylabel("Кумулятивный CF (₽)")
+    ax.set_title("🎲 Веер кумулятивного CF", fontsize=14, pad=20)
+    ax.legend()
+    ax.grid(True, alpha=0.3)
+    share = mc['payback_counts'][1:] / mc['n_draws'] * 100
+    ax_payback.bar(months, share, color="#3bd16f", alpha=0.8)
+    ax_payback.set_xlabel("Месяц окупаемости")
+    ax_payback.set_ylabel("% симуляций")
+    ax_payback.set_title(f"⏱️ Payback (нет окупаемости: {mc['prob_no_payback']:.1%})", fontsize=12, pad=20)
+    ax_payback.grid(True, alpha=0.3)
+    fig.tight_layout()
     return fig
 
-def create_enhanced_kpi_cards(scenarios):
-    data = scenarios["Базовый"]
+def create_monte_carlo_summary(mc):
+    risk = mc['prob_ltv_cac_below_1']
+    risk_class = "kpi-good" if risk < 0.1 else "kpi-warn" if risk < 0.3 else "kpi-bad"
+    payback = mc['payback_percentiles'].get(50)
+    ltv = mc['ltv_percentiles']
+    low, high = min(ltv), max(ltv)
+    return f"""
+    {ENHANCED_KPI_CSS}
+    <div class="kpi-grid">
+        <div class="kpi-card {risk_class}">
+            <div class="kpi-label">⚠️ P(LTV/CAC &lt; 1)</div>
+            <div class="kpi-value">{risk:.1%}</div>
+            <div class="kpi-change">Риск не окупить привлечение</div>
+        </div>
+        <div class="kpi-card kpi-neutral">
+            <div class="kpi-label">💎 LTV медиана</div>
+            <div class="kpi-value">{ltv.get(50, mc['mean_ltv']):,.0f} ₽</div>
+            <div class="kpi-change">P{low}–P{high}: {ltv[low]:,.0f} – {ltv[high]:,.0f} ₽</div>
+        </div>
+        <div class="kpi-card kpi-neutral">
+            <div class="kpi-label">⏱️ Payback медиана</div>
+            <div class="kpi-value">{'Нет' if not payback else f"{payback} мес."}</div>
+            <div class="kpi-change">По {mc['n_draws']:,} симуляциям</div>
+        </div>
+    </div>
+    """
+
+# Уровни EnhancedLTVModel.kpi_levels -> CSS-классы карточек
+KPI_CLASSES = ("kpi-good", "kpi-warn", "kpi-bad")
+
+def create_enhanced_kpi_cards(scenarios, scenario="Базовый"):
+    data = scenarios[scenario]
     def get_kpi_class(metric, value):
-        if metric == "ltv_cac":
-            return "kpi-good" if value >= 3 else "kpi-warn" if value >= 1 else "kpi-bad"
-        elif metric == "roi":
-            return "kpi-good" if value >= 2 else "kpi-warn" if value >= 0 else "kpi-bad"
-        elif metric == "payback":
-            return "kpi-good" if value and value <= 12 else "kpi-warn" if value else "kpi-bad"
-        elif metric == "confidence":
-            return "kpi-good" if value >= 70 else "kpi-warn" if value >= 40 else "kpi-bad"
-        return "kpi-neutral"
+        return KPI_CLASSES[int(model.kpi_levels(metric, value))]
     kpi_html = f"""
     {ENHANCED_KPI_CSS}
     <div class="kpi-grid">
@@ -306,7 +440,7 @@ def create_enhanced_kpi_cards(scenarios):
             <div class="kpi-value">{data['ltv_cac']:.2f}</div>
             <div class="kpi-change">Эффективность привлечения</div>
         </div>
-        <div class="kpi-card {get_kpi_class('payback', data['payback_month'])}">
+        <div class="kpi-card {get_kpi_class('payback_month', data['payback_month'])}">
             <div class="kpi-label">⏱️ Payback</div>
             <div class="kpi-value">{'Нет' if not data['payback_month'] else f"{data['payback_month']} мес."}</div>
             <div class="kpi-change">Срок окупаемости</div>
@@ -326,7 +460,7 @@ def create_enhanced_kpi_cards(scenarios):
             <div class="kpi-value">{data['annual_retention']:.1f}%</div>
             <div class="kpi-change">Годовое удержание</div>
         </div>
-        <div class="kpi-card {get_kpi_class('confidence', data['confidence_score'])}">
+        <div class="kpi-card {get_kpi_class('confidence_score', data['confidence_score'])}">
             <div class="kpi-label">🎯 Confidence</div>
             <div class="kpi-value">{data['confidence_score']:.0f}%</div>
             <div class="kpi-change">Надежность модели</div>
@@ -348,23 +482,19 @@ def create_insights_panel(insights):
     return insights_html
 
 def generate_detailed_table(scenarios):
-    all_data = []
-    for scenario_name, data in scenarios.items():
-        for i, month in enumerate(data['months'][:24]):
-            all_data.append({
-                'Сценарий': scenario_name,
-                'Месяц': month,
-                'Выживаемость (%)': round(data['survival_curve'][i] * 100, 2),
-                'Месячный CF (₽)': round(data['monthly_cf'][i], 0),
-                'Накопленный CF (₽)': round(data['cumulative_cf'][i], 0),
-                'LTV до месяца (₽)': round(np.sum(data['monthly_cf'][:i+1]), 0)
-            })
-    df = pd.DataFrame(all_data)
-    return df
+    frames = [pd.DataFrame({
+        'Сценарий': scenario_name,
+        'Месяц': data['months'],
+        'Выживаемость (%)': np.round(data['survival_curve'] * 100, 2),
+        'Месячный CF (₽)': np.round(data['monthly_cf'], 0),
+        'Накопленный CF (₽)': np.round(data['cumulative_cf'], 0),
+        'LTV до месяца (₽)': np.round(data['cumulative_cf'], 0)
+    }) for scenario_name, data in scenarios.items()]
+    return pd.concat(frames, ignore_index=True)
 
-def calculate_enhanced_ltv(avg_check, purchases_per_year, margin_pct, cac, 
-                          monthly_churn_pct, discount_rate_pct, horizon_months, industry):
-    params = {
+def build_params(avg_check, purchases_per_year, margin_pct, cac,
+                 monthly_churn_pct, discount_rate_pct, horizon_months):
+    return {
         'avg_check': float(avg_check),
         'purchases_per_year': float(purchases_per_year), 
         'margin_pct': float(margin_pct),
@@ -373,17 +503,67 @@ def calculate_enhanced_ltv(avg_check, purchases_per_year, margin_pct, cac,
         'discount_rate_pct': float(discount_rate_pct),
         'horizon_months': int(horizon_months)
     }
-    warnings_list, errors = model.validate_inputs(params)
-    if errors:
-        error_msg = "<div style='color:#ff5f73;padding:16px;background:#2a1a1a;border-radius:8px;margin:8px 0'>"
-        error_msg += "<h4>❌ Ошибки валидации:</h4><ul>"
-        for error in errors:
-            error_msg += f"<li>{error}</li>"
-        error_msg += "</ul></div>"
-        return error_msg, None, None, None, pd.DataFrame()
-    scenarios = model.calculate_scenarios(params)
-    base_data = scenarios["Базовый"]
-    insights = model.generate_insights(base_data, params, industry)
+
+def create_errors_html(errors):
+    metrics.annotate(status='invalid')
+    error_msg = "<div style='color:#ff5f73;padding:16px;background:#2a1a1a;border-radius:8px;margin:8px 0'>"
+    error_msg += "<h4>❌ Ошибки валидации:</h4><ul>"
+    for error in errors:
+        error_msg += f"<li>{error}</li>"
+    error_msg += "</ul></div>"
+    return error_msg
+
+def calculate_enhanced_ltv(avg_check, purchases_per_year, margin_pct, cac, 
+                          monthly_churn_pct, discount_rate_pct, horizon_months, industry):
+    params = build_params(avg_check, purchases_per_year, margin_pct, cac,
+                          monthly_churn_pct, discount_rate_pct, horizon_months)
+    cache_key = tuple(params[k] for k in model.BATCH_PARAMS) + (industry,)
+    cached = result_cache.get(cache_key)
+    metrics.annotate(cache='miss' if cached is None else 'hit')
+    if cached is not None:
+        return cached
+    result = _calculate_enhanced_ltv(params, industry)
+    if result[1] is not None:
+        result_cache.put(cache_key, result)
+    return result
+
+def _calculate_enhanced_ltv(params, industry):
+    values = evaluate_dashboard(GraphState(), params, industry, DASHBOARD_OUTPUTS[:5])
+    return tuple(values[name] for name in DASHBOARD_OUTPUTS[:5])
+
+# =========================
+# Граф зависимостей дашборда (инкрементальный пересчет)
+# =========================
+HORIZON_CAPACITY = 60  # кривые считаются с запасом, смена горизонта берет префикс
+NUMERIC_INPUTS = model.BATCH_PARAMS
+DASHBOARD_OUTPUTS = ('kpi_html', 'scenarios_chart', 'survival_chart', 'sensitivity_chart',
+                     'detailed_table', 'recommendations')
+
+dashboard_graph = DependencyGraph(span=metrics.span)
+
+@dashboard_graph.node('validation', ['avg_check', 'cac', 'monthly_churn_pct', 'margin_pct'])
+def _validation_node(avg_check, cac, monthly_churn_pct, margin_pct):
+    return model.validate_inputs({'avg_check': avg_check, 'cac': cac,
+                                  'monthly_churn_pct': monthly_churn_pct, 'margin_pct': margin_pct})
+
+@dashboard_graph.node('scenario_batch', ['avg_check', 'purchases_per_year', 'margin_pct', 'cac',
+                                         'monthly_churn_pct', 'discount_rate_pct', 'horizon_capacity'])
+def _scenario_batch_node(*values):
+    params = dict(zip(NUMERIC_INPUTS[:-1], values[:-1]), horizon_months=values[-1])
+    return model.scenario_batch(params)
+
+@dashboard_graph.node('scenarios', ['scenario_batch', 'horizon_months'])
+def _scenarios_node(batch, horizon_months):
+    return model.scenarios_from_batch(batch, horizon_months)
+
+@dashboard_graph.node('insights', ['scenarios', 'margin_pct', 'monthly_churn_pct', 'industry'])
+def _insights_node(scenarios, margin_pct, monthly_churn_pct, industry):
+    params = {'margin_pct': margin_pct, 'monthly_churn_pct': monthly_churn_pct}
+    return model.generate_insights(scenarios["Базовый"], params, industry)
+
+@dashboard_graph.node('kpi_html', ['scenarios', 'validation', 'insights'])
+def _kpi_html_node(scenarios, validation, insights):
+    warnings_list, _ = validation
     kpi_html = create_enhanced_kpi_cards(scenarios)
     if warnings_list:
         warning_msg = "<div class='warning-panel'><h5>⚠️ Предупреждения:</h5><ul>"
@@ -391,13 +571,385 @@ def calculate_enhanced_ltv(avg_check, purchases_per_year, margin_pct, cac,
             warning_msg += f"<li>{warning}</li>"
         warning_msg += "</ul></div>"
         kpi_html = warning_msg + kpi_html
-    insights_html = create_insights_panel(insights)
-    kpi_html += insights_html
-    scenarios_chart = create_scenarios_chart(scenarios)
-    survival_chart = create_survival_chart(scenarios)
-    sensitivity_chart = create_sensitivity_chart(params)
-    detailed_table = generate_detailed_table(scenarios)
-    return kpi_html, scenarios_chart, survival_chart, sensitivity_chart, detailed_table
+    return kpi_html + create_insights_panel(insights)
+
+@dashboard_graph.node('scenarios_chart', ['scenarios'], parallel=True)
+def _scenarios_chart_node(scenarios):
+    return render_plot(create_scenarios_chart, scenarios)
+
+@dashboard_graph.node('survival_chart', ['monthly_churn_pct', 'horizon_months'], parallel=True)
+def _survival_chart_node(monthly_churn_pct, horizon_months):
+    # Выживаемость зависит только от оттока и горизонта
+    months = np.arange(1, horizon_months + 1)
+    curves = {name: {'months': months,
+                     'survival_curve': model.survival_curve(monthly_churn_pct * mult['churn'], months)}
+              for name, mult in model.SCENARIO_MULTIPLIERS.items()}
+    return render_plot(create_survival_chart, curves)
+
+@dashboard_graph.node('sensitivity_chart', NUMERIC_INPUTS, parallel=True)
+def _sensitivity_chart_node(*values):
+    return render_plot(create_sensitivity_chart, dict(zip(NUMERIC_INPUTS, values)))
+
+@dashboard_graph.node('detailed_table', ['scenarios'])
+def _detailed_table_node(scenarios):
+    return generate_detailed_table(scenarios)
+
+@dashboard_graph.node('recommendations', ['avg_check', 'cac', 'margin_pct', 'monthly_churn_pct'])
+def _recommendations_node(avg_check, cac, margin_pct, monthly_churn_pct):
+    return generate_recommendations(avg_check, cac, margin_pct, monthly_churn_pct)
+
+def evaluate_dashboard(state, params, industry, outputs=DASHBOARD_OUTPUTS):
+    """Выходы дашборда для params; в state сохраняются промежуточные результаты сессии."""
+    inputs = dict(params, industry=industry,
+                  horizon_capacity=max(HORIZON_CAPACITY, params['horizon_months']))
+    _, errors = dashboard_graph.evaluate(state, inputs, ['validation'])['validation']
+    if errors:
+        fallback = {'kpi_html': create_errors_html(errors), 'detailed_table': pd.DataFrame(), 'recommendations': ""}
+        return {name: fallback.get(name) for name in outputs}
+    return dashboard_graph.evaluate(state, inputs, outputs, executor=chart_pool, reset_stats=False)
+
+LIVE_FAST_OUTPUTS = ('kpi_html', 'detailed_table', 'recommendations')
+LIVE_CHART_OUTPUTS = ('scenarios_chart', 'survival_chart', 'sensitivity_chart')
+
+def _live_update(outputs, live, session, *inputs):
+    if not live:
+        return (gr.update(),) * (len(outputs) + 1) + (session,)
+    session = session or GraphState()
+    params = build_params(*inputs[:-1])
+    values = evaluate_dashboard(session, params, inputs[-1], outputs)
+    recomputed = ', '.join(name for name in session.recomputed if name != 'validation') or 'ничего'
+    status = f"⚡ Обновлено за {session.elapsed * 1000:.0f} мс • пересчитано: {recomputed}"
+    return tuple(values[name] for name in outputs) + (status, session)
+
+@instrumented('live')
+def on_live_change(live, session, *inputs):
+    """Live-режим: сначала KPI, таблица и рекомендации — только зависящие от изменившихся входов."""
+    return _live_update(LIVE_FAST_OUTPUTS, live, session, *inputs)
+
+@instrumented('live_charts')
+def on_live_charts(live, session, *inputs):
+    """Вторая фаза live-режима: перерисовываются только графики с изменившимися зависимостями."""
+    return _live_update(LIVE_CHART_OUTPUTS, live, session, *inputs)
+
+@instrumented('sensitivity_map')
+def run_sensitivity_map(avg_check, purchases_per_year, margin_pct, cac, monthly_churn_pct,
+                        discount_rate_pct, horizon_months, x_param, y_param, range_pct, resolution,
+                        request: gr.Request = None):
+    params = build_params(avg_check, purchases_per_year, margin_pct, cac,
+                          monthly_churn_pct, discount_rate_pct, horizon_months)
+    _, errors = model.validate_inputs(params)
+    if x_param == y_param:
+        errors = errors + ["Выберите два разных параметра для тепловой карты"]
+    if errors:
+        return create_errors_html(errors), None, None
+    base_key = tuple(params[k] for k in model.BATCH_PARAMS)
+    range_pct, resolution = float(range_pct), int(resolution)
+    heatmap_key = ('heatmap',) + base_key + (x_param, y_param, range_pct, resolution)
+    heatmap = result_cache.get(heatmap_key)
+    if heatmap is None:
+        x_values = sensitivity_axis(params, x_param, range_pct, resolution)
+        y_values = sensitivity_axis(params, y_param, range_pct, resolution)
+        grid = offload(workers.sensitivity_grid, params, x_param, y_param, x_values, y_values)
+        heatmap = render_plot(create_sensitivity_heatmap, params, x_param, y_param, x_values, y_values, grid)
+        result_cache.put(heatmap_key, heatmap)
+    tornado_key = ('tornado',) + base_key + (range_pct,)
+    tornado = result_cache.get(tornado_key)
+    if tornado is None:
+        tornado = render_plot(create_tornado_chart, offload(workers.tornado, params, range_pct), range_pct)
+        result_cache.put(tornado_key, tornado)
+    return "", heatmap, tornado
+
+@instrumented('sobol')
+def run_sobol(avg_check, purchases_per_year, margin_pct, cac, monthly_churn_pct,
+              discount_rate_pct, horizon_months, range_pct, n_samples, adaptive, request: gr.Request = None):
+    params = build_params(avg_check, purchases_per_year, margin_pct, cac,
+                          monthly_churn_pct, discount_rate_pct, horizon_months)
+    _, errors = model.validate_inputs(params)
+    if errors:
+        return create_errors_html(errors), None
+    started = time.perf_counter()
+    tol = SOBOL_TOL if adaptive else None
+    if OFFLOAD_WORKERS > 1:
+        # Чанки раунда раздаются воркерам; поток запроса только складывает частичные суммы
+        sobol = model.sobol_indices(params, spread_pct=float(range_pct), n_samples=int(n_samples), tol=tol,
+                                    executor=get_offload_pool(), chunks_per_round=2 * OFFLOAD_WORKERS)
+    else:
+        # С одним воркером раздача чанков только добавила бы пересылку: расчет целиком уходит в воркер
+        sobol = offload(workers.sobol, params, float(range_pct), int(n_samples), tol)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    interactions = 1 - sobol['first_order'].sum()
+    stop = ""
+    if adaptive:
+        stop = (f" • сошлось до ±{SOBOL_TOL:g}" if sobol['converged']
+                else f" • ±{SOBOL_TOL:g} не достигнуто, взят весь бюджет")
+    summary = (f"<div class='insights-panel'><h4>🌐 Индексы Соболя: {sobol['n_samples']:,} точек, "
+               f"{sobol['evaluations']:,} расчетов за {elapsed_ms:.0f} мс{stop}</h4>"
+               f"<p>Параметры равномерно в пределах ±{float(range_pct):g}% • доля дисперсии от взаимодействий "
+               f"≈ {max(interactions, 0.0):.1%} (1 − ΣS1)</p></div>")
+    return summary, render_plot(create_sobol_chart, sobol)
+
+def format_threshold(name, result):
+    if not result['bracketed'][0]:
+        return "выполнено при любом" if result['always_met'][0] else "недостижимо"
+    value = result['value'][0]
+    sign = "≤" if result['is_max'][0] else "≥"
+    if name in ('avg_check', 'cac'):
+        return f"{sign} {value:,.0f} ₽"
+    if name == 'purchases_per_year':
+        return f"{sign} {value:.2f}"
+    return f"{sign} {value:.2f}%"
+
+@instrumented('goal_seek')
+def run_goal_seek(avg_check, purchases_per_year, margin_pct, cac, monthly_churn_pct,
+                  discount_rate_pct, horizon_months, industry, solve_for, ltv_cac_min, payback_max,
+                  request: gr.Request = None):
+    params = build_params(avg_check, purchases_per_year, margin_pct, cac,
+                          monthly_churn_pct, discount_rate_pct, horizon_months)
+    _, errors = model.validate_inputs(params)
+    if errors:
+        return create_errors_html(errors), pd.DataFrame()
+    benchmark = model.industry_benchmarks.get(industry, model.industry_benchmarks["SaaS"])
+    ltv_cac_min = benchmark['ltv_cac_min'] if ltv_cac_min is None else float(ltv_cac_min)
+    payback_max = benchmark['payback_max'] if payback_max is None else int(payback_max)
+    names = model.SENSITIVITY_PARAMS if solve_for == 'all' else (solve_for,)
+    started = time.perf_counter()
+    thresholds = offload(workers.benchmark_thresholds, params, industry, names, ltv_cac_min, payback_max)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    rows = []
+    for name, results in thresholds.items():
+        rows.append({
+            'Параметр': SENSITIVITY_LABELS[name],
+            'Текущее значение': f"{params[name]:,.2f}",
+            f'LTV/CAC ≥ {ltv_cac_min:g}': format_threshold(name, results['ltv_cac']),
+            f'Payback ≤ {payback_max} мес': format_threshold(name, results['payback_month']),
+            'Итераций': max(int(r['iterations'][0]) for r in results.values())
+        })
+    solved = [r for results in thresholds.values() for r in results.values()]
+    bracketed = sum(int(r['bracketed'][0]) for r in solved)
+    converged = sum(int(r['converged'][0]) for r in solved)
+    residuals = [abs(r['residual'][0]) for r in solved if r['bracketed'][0]]
+    max_residual = f"{max(residuals):.1e}" if residuals else "—"
+    summary = (f"<div class='insights-panel'><h4>🎯 Решено задач: {len(solved)} за {elapsed_ms:.0f} мс</h4>"
+               f"<p>Корень найден: {bracketed}/{len(solved)} • сошлось: {converged}/{bracketed} • "
+               f"макс. итераций: {max(int(r['iterations'][0]) for r in solved)} • "
+               f"макс. |невязка LTV/CAC|: {max_residual}</p></div>")
+    return summary, pd.DataFrame(rows)
+
+@instrumented('monte_carlo')
+def run_monte_carlo(avg_check, purchases_per_year, margin_pct, cac, monthly_churn_pct,
+                    discount_rate_pct, horizon_months, spread_pct, n_draws, seed, request: gr.Request = None):
+    params = build_params(avg_check, purchases_per_year, margin_pct, cac,
+                          monthly_churn_pct, discount_rate_pct, horizon_months)
+    _, errors = model.validate_inputs(params)
+    if errors:
+        return create_errors_html(errors), None
+    mc = offload(workers.monte_carlo, params, float(spread_pct), int(n_draws),
+                 None if seed is None else int(seed))
+    return create_monte_carlo_summary(mc), render_plot(create_monte_carlo_chart, mc, params['cac'])
+
+@instrumented('portfolio')
+def run_portfolio(segment_file, discount_rate_pct, horizon_months, industry="SaaS", request: gr.Request = None):
+    if not segment_file:
+        return create_errors_html(["Загрузите CSV или Parquet файл с сегментами"]), pd.DataFrame()
+    path = getattr(segment_file, 'name', segment_file)
+    try:
+        table = offload(workers.score_segments, path, float(discount_rate_pct), int(horizon_months), industry)
+    except (ValueError, KeyError, ImportError) as e:
+        return create_errors_html([str(e)]), pd.DataFrame()
+    rejected = int(table['Отклонено строк'].sum())
+    summary = (f"<div class='insights-panel'><h4>🗂️ Портфель: {int(table['Строк'].sum()):,} строк, "
+               f"{len(table)} сегментов</h4>"
+               + (f"<p>⚠️ Отклонено невалидных строк: {rejected:,}</p>" if rejected else "") + "</div>")
+    return summary, table
+
+# =========================
+# Потоковые выгрузки
+# =========================
+EXPORT_FORMATS = [("CSV", 'csv'), ("Parquet", 'parquet')]
+
+def export_path(name, fmt):
+    fd, path = tempfile.mkstemp(prefix=f"ltv_{name}_", suffix=f".{fmt}")
+    os.close(fd)
+    return path
+
+@instrumented('export_table')
+def export_detailed_table(avg_check, purchases_per_year, margin_pct, cac, monthly_churn_pct,
+                          discount_rate_pct, horizon_months, fmt, request: gr.Request = None):
+    params = build_params(avg_check, purchases_per_year, margin_pct, cac,
+                          monthly_churn_pct, discount_rate_pct, horizon_months)
+    _, errors = model.validate_inputs(params)
+    if errors:
+        raise gr.Error("; ".join(errors))
+    path = export_path('scenarios', fmt)
+    write_chunks([generate_detailed_table(model.calculate_scenarios(params))], path, fmt)
+    return path
+
+@instrumented('export_monte_carlo')
+def export_monte_carlo(avg_check, purchases_per_year, margin_pct, cac, monthly_churn_pct,
+                       discount_rate_pct, horizon_months, spread_pct, n_draws, seed, fmt,
+                       request: gr.Request = None):
+    params = build_params(avg_check, purchases_per_year, margin_pct, cac,
+                          monthly_churn_pct, discount_rate_pct, horizon_months)
+    _, errors = model.validate_inputs(params)
+    if errors:
+        raise gr.Error("; ".join(errors))
+    path = export_path('monte_carlo', fmt)
+    offload(workers.export_monte_carlo, params, float(spread_pct), int(n_draws),
+            None if seed is None else int(seed), path)
+    return path
+
+@instrumented('export_portfolio')
+def export_portfolio(segment_file, discount_rate_pct, horizon_months, fmt, request: gr.Request = None):
+    if not segment_file:
+        raise gr.Error("Загрузите CSV или Parquet файл с сегментами")
+    path = export_path('segments', fmt)
+    try:
+        offload(workers.export_segments, getattr(segment_file, 'name', segment_file),
+                float(discount_rate_pct), int(horizon_months), path)
+    except (ValueError, KeyError, ImportError) as e:
+        raise gr.Error(str(e))
+    return path
+
+# =========================
+# Хранилище сохраненных расчетов (SQLite)
+# =========================
+STORE_PATH = os.environ.get('LTV_STORE_PATH', 'ltv_runs.sqlite3')
+# Больше кривых на одном графике уже не читается
+MAX_COMPARED_RUNS = 500
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ScenarioStore(STORE_PATH)
+        return _store
+
+def create_runs_overlay_chart(runs, curves):
+    fig = Figure(figsize=(12, 6))
+    ax = fig.subplots()
+    months = curves['months']
+    by_id = {run['id']: run for run in runs}
+    compared = [by_id[run_id] for run_id in curves['ids']]
+    # Все кривые — одна коллекция линий, поэтому и 500 расчетов рисуются быстро
+    segments = [np.column_stack([months[:run['horizon_months']], row[:run['horizon_months']]])
+                for run, row in zip(compared, curves['cumulative_cf'])]
+    lines = LineCollection(segments, cmap='viridis', linewidths=2 if len(segments) <= 20 else 0.8,
+                           alpha=0.9 if len(segments) <= 20 else 0.5)
+    lines.set_array(np.array([run['ltv_cac'] for run in compared]))
+    ax.add_collection(lines)
+    ax.autoscale_view()
+    fig.colorbar(lines, ax=ax, label="LTV/CAC")
+    if len(segments) <= 12:
+        for run, segment in zip(compared, segments):
+            ax.annotate(f"#{run['id']} {run['name'] or ''}".strip(), segment[-1], fontsize=9,
+                        xytext=(4, 0), textcoords='offset points', va='center')
+    ax.axhline(y=0, color="#666666", linewidth=1)
+    ax.set_xlabel("Месяц")
+    ax.set_ylabel("Кумулятивный CF (₽)")
+    ax.set_title(f"🗂️ Кумулятивный CF сохраненных расчетов ({len(segments)})", fontsize=14, pad=20)
+    ax.grid(True, alpha=0.3)
+    fig.tight_layout()
+    return fig
+
+def parse_run_ids(text):
+    return [int(part) for part in text.replace(',', ' ').split()] if text else []
+
+@instrumented('save_run')
+def save_run(avg_check, purchases_per_year, margin_pct, cac, monthly_churn_pct,
+             discount_rate_pct, horizon_months, industry, name, request: gr.Request = None):
+    params = build_params(avg_check, purchases_per_year, margin_pct, cac,
+                          monthly_churn_pct, discount_rate_pct, horizon_months)
+    _, errors = model.validate_inputs(params)
+    if errors:
+        return create_errors_html(errors)
+    result = model.compute_enhanced_ltv(params)
+    run_id = get_store().save(params, industry, result, name=(name or "").strip() or None)
+    return (f"<div class='insights-panel'><h4>💾 Расчет #{run_id} сохранен</h4>"
+            f"<p>LTV {result['ltv']:,.0f} ₽ • LTV/CAC {result['ltv_cac']:.2f} • {industry}</p></div>")
+
+@instrumented('search_runs')
+def search_runs(industry_filter, since, ltv_cac_min, ltv_cac_max, compare_ids, limit, request: gr.Request = None):
+    errors = []
+    try:
+        since = datetime.strptime(since.strip(), '%Y-%m-%d') if since and since.strip() else None
+    except ValueError:
+        errors.append("Дата должна быть в формате ГГГГ-ММ-ДД")
+    try:
+        ids = parse_run_ids(compare_ids)
+    except ValueError:
+        errors.append("ID расчетов — целые числа через запятую или пробел")
+    if errors:
+        return create_errors_html(errors), pd.DataFrame(), None
+    started = time.perf_counter()
+    store = get_store()
+    runs = store.query(industry=None if industry_filter == 'all' else industry_filter, ids=ids or None,
+                       limit=min(int(limit), MAX_COMPARED_RUNS), since=since,
+                       ltv_cac_min=ltv_cac_min, ltv_cac_max=ltv_cac_max)
+    if not runs:
+        return "<div class='insights-panel'><h4>🔍 Подходящих расчетов нет</h4></div>", pd.DataFrame(), None
+    curves = store.load_curves([run['id'] for run in runs])
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    table = pd.DataFrame({
+        'ID': [run['id'] for run in runs],
+        'Дата': [datetime.fromtimestamp(run['created_at']).strftime('%Y-%m-%d %H:%M') for run in runs],
+        'Название': [run['name'] or "" for run in runs],
+        'Отрасль': [run['industry'] for run in runs],
+        'LTV (₽)': [round(run['ltv']) for run in runs],
+        'LTV/CAC': [round(run['ltv_cac'], 2) for run in runs],
+        'ROI (%)': [round(run['roi'] * 100, 1) for run in runs],
+        'Payback (мес)': [run['payback_month'] if run['payback_month'] is not None else "—" for run in runs],
+        'Средний чек (₽)': [run['params']['avg_check'] for run in runs],
+        'Отток (%)': [run['params']['monthly_churn_pct'] for run in runs],
+        'CAC (₽)': [run['params']['cac'] for run in runs],
+        'Горизонт (мес)': [run['horizon_months'] for run in runs]
+    })
+    summary = (f"<div class='insights-panel'><h4>🗂️ Найдено расчетов: {len(runs)} из {len(store)}</h4>"
+               f"<p>Выборка и загрузка кривых: {elapsed_ms:.0f} мс</p></div>")
+    return summary, table, render_plot(create_runs_overlay_chart, runs, curves)
+
+@instrumented('empirical')
+def run_empirical_ltv(log_file, margin_pct, cac, discount_rate_pct, horizon_months, industry,
+                      inactivity_months, avg_check, purchases_per_year, monthly_churn_pct,
+                      request: gr.Request = None):
+    if not log_file:
+        return create_errors_html(["Загрузите журнал транзакций (customer_id, timestamp, amount)"]), None, None
+    params = build_params(avg_check, purchases_per_year, margin_pct, cac,
+                          monthly_churn_pct, discount_rate_pct, horizon_months)
+    _, errors = model.validate_inputs(params)
+    if errors:
+        return create_errors_html(errors), None, None
+    try:
+        path = getattr(log_file, 'name', log_file)
+        # Кэш кривых общий для всех воркеров: ключ (SHA-256 файла) считается здесь, разбор — в пуле
+        cache_key = curves_cache_key(path, int(inactivity_months))
+        curves = curve_cache.get(cache_key)
+        if curves is None:
+            curves = offload(workers.fit_empirical, path, int(inactivity_months))
+            curve_cache.put(cache_key, curves)
+    except (ValueError, KeyError, ImportError) as e:
+        return create_errors_html([str(e)]), None, None
+    scenarios = {
+        "Эмпирический": model.compute_empirical_ltv(params, curves),
+        "Базовый": model.compute_enhanced_ltv(params)
+    }
+    empirical_params = dict(params, monthly_churn_pct=100 - scenarios["Эмпирический"]['monthly_retention'])
+    insights = model.generate_insights(scenarios["Эмпирический"], empirical_params, industry)
+    summary = (f"<div class='insights-panel'><h4>📜 Журнал: {curves['customers']:,} клиентов, "
+               f"{curves['churned_customers']:,} ушедших, {curves['observed_months']} мес. наблюдений</h4></div>")
+    kpi_html = summary + create_enhanced_kpi_cards(scenarios, "Эмпирический") + create_insights_panel(insights)
+    charts = [chart_pool.submit(render_plot, create_chart, scenarios)
+              for create_chart in (create_scenarios_chart, create_survival_chart)]
+    return (kpi_html,) + tuple(chart.result() for chart in charts)
+
+@instrumented('calculate')
+def on_calculate(avg_check, purchases_per_year, margin_pct, cac,
+                 monthly_churn_pct, discount_rate_pct, horizon_months, industry, request: gr.Request = None):
+    """Единый обработчик кнопки: расчет и рекомендации занимают одно место в очереди."""
+    result = calculate_enhanced_ltv(avg_check, purchases_per_year, margin_pct, cac,
+                                    monthly_churn_pct, discount_rate_pct, horizon_months, industry)
+    return result + (generate_recommendations(avg_check, cac, margin_pct, monthly_churn_pct),)
 
 def generate_recommendations(avg_check, cac, margin_pct, monthly_churn_pct):
     recs = []
@@ -467,6 +1019,12 @@ with gr.Blocks(
                     info="Отрасль для сравнения с типичными показателями"
                 )
             calculate_btn = gr.Button("🚀 Рассчитать LTV", variant="primary", size="lg")
+            live_mode = gr.Checkbox(
+                label="⚡ Live-обновление", value=False,
+                info="Пересчитывать при изменении параметров, без нажатия кнопки"
+            )
+            live_status = gr.Markdown()
+            live_session = gr.State()
         with gr.Column(scale=2):
             gr.Markdown("## 📊 **Аналитика и результаты**")
             kpi_output = gr.HTML()
@@ -477,11 +1035,129 @@ with gr.Blocks(
                     survival_plot = gr.Plot()
                 with gr.TabItem("🎯 Sensitivity Analysis"):
                     sensitivity_plot = gr.Plot()
+                    with gr.Row():
+                        sensitivity_x = gr.Dropdown(
+                            label="↔️ Параметр по оси X", value='monthly_churn_pct',
+                            choices=[(label, key) for key, label in SENSITIVITY_LABELS.items()]
+                        )
+                        sensitivity_y = gr.Dropdown(
+                            label="↕️ Параметр по оси Y", value='margin_pct',
+                            choices=[(label, key) for key, label in SENSITIVITY_LABELS.items()]
+                        )
+                        sensitivity_range = gr.Slider(
+                            label="📐 Диапазон изменения (±%)", value=50, minimum=5, maximum=90, step=5,
+                            info="Для тепловой карты и торнадо-диаграммы"
+                        )
+                        sensitivity_resolution = gr.Slider(
+                            label="🔬 Разрешение сетки", value=200, minimum=10, maximum=500, step=10
+                        )
+                    sensitivity_btn = gr.Button("🗺️ Построить карту и торнадо", variant="secondary")
+                    sensitivity_errors = gr.HTML()
+                    heatmap_plot = gr.Plot()
+                    tornado_plot = gr.Plot()
+                    with gr.Row():
+                        sobol_samples = gr.Dropdown(
+                            label="🎲 Точек Соболя (бюджет)", choices=SOBOL_SAMPLES, value=2**16,
+                            info="Каждая точка — число параметров + 2 расчета"
+                        )
+                        sobol_adaptive = gr.Checkbox(
+                            label=f"⏱️ Остановить при сходимости (±{SOBOL_TOL:g})", value=True
+                        )
+                    sobol_btn = gr.Button("🌐 Индексы Соболя", variant="secondary")
+                    sobol_summary = gr.HTML()
+                    sobol_plot = gr.Plot()
+                with gr.TabItem("🎯 Goal Seek"):
+                    with gr.Row():
+                        goal_param = gr.Dropdown(
+                            label="🔧 Искомый параметр", value='all',
+                            choices=[("Все параметры", 'all')] + [(label, key) for key, label in SENSITIVITY_LABELS.items()]
+                        )
+                        goal_ltv_cac = gr.Number(
+                            label="🎯 Целевой LTV/CAC", value=None,
+                            info="Пусто — бенчмарк выбранной отрасли"
+                        )
+                        goal_payback = gr.Number(
+                            label="⏱️ Макс. payback (мес)", value=None, precision=0,
+                            info="Пусто — бенчмарк выбранной отрасли"
+                        )
+                    goal_btn = gr.Button("🎯 Найти пороги", variant="secondary")
+                    goal_summary = gr.HTML()
+                    goal_table = gr.Dataframe(label="Пороговые значения при прочих равных", wrap=True)
+                with gr.TabItem("🎲 Monte Carlo"):
+                    with gr.Row():
+                        mc_spread_pct = gr.Slider(
+                            label="📐 Неопределенность параметров (%)", value=20, minimum=1, maximum=50, step=1,
+                            info="Стандартное отклонение чека, маржи, оттока, частоты и CAC"
+                        )
+                        mc_draws = gr.Dropdown(
+                            label="🎲 Число симуляций",
+                            choices=[10_000, 100_000, 1_000_000], value=100_000
+                        )
+                        mc_seed = gr.Number(label="🌱 Seed", value=42, precision=0)
+                    mc_btn = gr.Button("🎲 Запустить Monte Carlo", variant="secondary")
+                    mc_summary = gr.HTML()
+                    mc_plot = gr.Plot()
+                    with gr.Row():
+                        mc_export_format = gr.Radio(label="📥 Формат выгрузки", choices=EXPORT_FORMATS, value='csv')
+                        mc_export_btn = gr.Button("📥 Выгрузить все розыгрыши", variant="secondary")
+                    mc_export_file = gr.File(label="Результаты розыгрышей")
+                with gr.TabItem("🗂️ Portfolio"):
+                    segment_file = gr.File(
+                        label="Файл сегментов/когорт (CSV или Parquet): avg_check, purchases, margin, churn, cac, "
+                              "discount, segment, customers",
+                        file_types=[".csv", ".parquet"], type="filepath"
+                    )
+                    portfolio_btn = gr.Button("🗂️ Рассчитать портфель", variant="secondary")
+                    portfolio_summary = gr.HTML()
+                    portfolio_table = gr.Dataframe(label="LTV по сегментам", wrap=True)
+                    with gr.Row():
+                        portfolio_export_format = gr.Radio(label="📥 Формат выгрузки", choices=EXPORT_FORMATS, value='csv')
+                        portfolio_export_btn = gr.Button("📥 Выгрузить построчные результаты", variant="secondary")
+                    portfolio_export_file = gr.File(label="LTV по каждой строке файла")
+                with gr.TabItem("📜 Transaction Log"):
+                    transaction_file = gr.File(
+                        label="Журнал транзакций (CSV или Parquet): customer_id, timestamp, amount",
+                        file_types=[".csv", ".parquet"], type="filepath"
+                    )
+                    inactivity_months = gr.Slider(
+                        label="💤 Месяцев без покупок до оттока", value=3, minimum=1, maximum=12, step=1,
+                        info="Клиент считается ушедшим после такого периода неактивности"
+                    )
+                    empirical_btn = gr.Button("📜 Построить эмпирические кривые", variant="secondary")
+                    empirical_kpi = gr.HTML()
+                    empirical_cf_plot = gr.Plot()
+                    empirical_survival_plot = gr.Plot()
+                with gr.TabItem("💾 Saved Runs"):
+                    with gr.Row():
+                        run_name = gr.Textbox(label="🏷️ Название расчета", placeholder="например: Q3, базовый план")
+                        save_run_btn = gr.Button("💾 Сохранить текущий расчет", variant="secondary")
+                    save_run_status = gr.HTML()
+                    with gr.Row():
+                        runs_industry = gr.Dropdown(
+                            label="🏢 Отрасль", value='all',
+                            choices=[("Все отрасли", 'all')] + list(model.industry_benchmarks.keys())
+                        )
+                        runs_since = gr.Textbox(label="📅 С даты", placeholder="ГГГГ-ММ-ДД")
+                        runs_ltv_cac_min = gr.Number(label="LTV/CAC от", value=None)
+                        runs_ltv_cac_max = gr.Number(label="LTV/CAC до", value=None)
+                    with gr.Row():
+                        runs_ids = gr.Textbox(label="🔢 ID для сравнения",
+                                              placeholder="например: 3, 7, 12 — пусто: все найденные")
+                        runs_limit = gr.Slider(label="📊 Сколько расчетов сравнить", value=100,
+                                               minimum=10, maximum=MAX_COMPARED_RUNS, step=10)
+                    runs_btn = gr.Button("🔍 Найти и сравнить", variant="secondary")
+                    runs_summary = gr.HTML()
+                    runs_plot = gr.Plot()
+                    runs_table = gr.Dataframe(label="Сохраненные расчеты, новые первыми", wrap=True)
                 with gr.TabItem("📋 Detailed Data"):
                     detailed_table = gr.Dataframe(
                         label="Детализированные данные по месяцам и сценариям",
                         wrap=True
                     )
+                    with gr.Row():
+                        table_export_format = gr.Radio(label="📥 Формат выгрузки", choices=EXPORT_FORMATS, value='csv')
+                        table_export_btn = gr.Button("📥 Выгрузить таблицу", variant="secondary")
+                    table_export_file = gr.File(label="Детализированные данные")
 
     with gr.Row():
         with gr.Column():
@@ -526,28 +1202,160 @@ with gr.Blocks(
     """)
 
     calculate_btn.click(
-        fn=calculate_enhanced_ltv,
+        fn=on_calculate,
         inputs=[
             avg_check, purchases_per_year, margin_pct, cac, 
             monthly_churn_pct, discount_rate_pct, horizon_months, industry
         ],
         outputs=[
             kpi_output, scenarios_plot, survival_plot, 
-            sensitivity_plot, detailed_table
-        ]
+            sensitivity_plot, detailed_table, recommendations_html
+        ],
+        api_name="calculate",
+        concurrency_limit=CALCULATE_CONCURRENCY
     )
 
-    calculate_btn.click(
-        fn=generate_recommendations,
-        inputs=[avg_check, cac, margin_pct, monthly_churn_pct],
-        outputs=[recommendations_html]
+    model_inputs = [
+        avg_check, purchases_per_year, margin_pct, cac,
+        monthly_churn_pct, discount_rate_pct, horizon_months, industry
+    ]
+    # always_last: пока идет пересчет, промежуточные значения слайдера отбрасываются
+    gr.on(
+        triggers=[live_mode.change] + [component.change for component in model_inputs],
+        fn=on_live_change,
+        inputs=[live_mode, live_session] + model_inputs,
+        outputs=[kpi_output, detailed_table, recommendations_html, live_status, live_session],
+        trigger_mode="always_last",
+        show_progress="hidden"
+    ).then(
+        fn=on_live_charts,
+        inputs=[live_mode, live_session] + model_inputs,
+        outputs=[scenarios_plot, survival_plot, sensitivity_plot, live_status, live_session],
+        show_progress="hidden"
+    )
+
+    sensitivity_btn.click(
+        fn=run_sensitivity_map,
+        inputs=[
+            avg_check, purchases_per_year, margin_pct, cac, monthly_churn_pct,
+            discount_rate_pct, horizon_months, sensitivity_x, sensitivity_y,
+            sensitivity_range, sensitivity_resolution
+        ],
+        outputs=[sensitivity_errors, heatmap_plot, tornado_plot],
+        api_name="sensitivity_map",
+        concurrency_limit=CALCULATE_CONCURRENCY
     )
 
+    sobol_btn.click(
+        fn=run_sobol,
+        inputs=[
+            avg_check, purchases_per_year, margin_pct, cac, monthly_churn_pct,
+            discount_rate_pct, horizon_months, sensitivity_range, sobol_samples, sobol_adaptive
+        ],
+        outputs=[sobol_summary, sobol_plot],
+        api_name="sobol",
+        concurrency_limit=CALCULATE_CONCURRENCY
+    )
+
+    goal_btn.click(
+        fn=run_goal_seek,
+        inputs=model_inputs + [goal_param, goal_ltv_cac, goal_payback],
+        outputs=[goal_summary, goal_table],
+        api_name="goal_seek",
+        concurrency_limit=CALCULATE_CONCURRENCY
+    )
+
+    mc_btn.click(
+        fn=run_monte_carlo,
+        inputs=[
+            avg_check, purchases_per_year, margin_pct, cac, monthly_churn_pct,
+            discount_rate_pct, horizon_months, mc_spread_pct, mc_draws, mc_seed
+        ],
+        outputs=[mc_summary, mc_plot],
+        api_name="monte_carlo",
+        concurrency_limit=OFFLOAD_WORKERS
+    )
+
+    portfolio_btn.click(
+        fn=run_portfolio,
+        inputs=[segment_file, discount_rate_pct, horizon_months, industry],
+        outputs=[portfolio_summary, portfolio_table],
+        api_name="portfolio",
+        concurrency_limit=OFFLOAD_WORKERS
+    )
+
+    table_export_btn.click(
+        fn=export_detailed_table,
+        inputs=model_inputs[:-1] + [table_export_format],
+        outputs=table_export_file,
+        api_name="export_table",
+        concurrency_limit=CALCULATE_CONCURRENCY
+    )
+
+    mc_export_btn.click(
+        fn=export_monte_carlo,
+        inputs=model_inputs[:-1] + [mc_spread_pct, mc_draws, mc_seed, mc_export_format],
+        outputs=mc_export_file,
+        api_name="export_monte_carlo",
+        concurrency_limit=OFFLOAD_WORKERS
+    )
+
+    portfolio_export_btn.click(
+        fn=export_portfolio,
+        inputs=[segment_file, discount_rate_pct, horizon_months, portfolio_export_format],
+        outputs=portfolio_export_file,
+        api_name="export_portfolio",
+        concurrency_limit=OFFLOAD_WORKERS
+    )
+
+    save_run_btn.click(
+        fn=save_run,
+        inputs=model_inputs + [run_name],
+        outputs=save_run_status,
+        api_name="save_run"
+    )
+
+    runs_btn.click(
+        fn=search_runs,
+        inputs=[runs_industry, runs_since, runs_ltv_cac_min, runs_ltv_cac_max, runs_ids, runs_limit],
+        outputs=[runs_summary, runs_table, runs_plot],
+        api_name="search_runs",
+        concurrency_limit=CALCULATE_CONCURRENCY
+    )
+
+    empirical_btn.click(
+        fn=run_empirical_ltv,
+        inputs=[
+            transaction_file, margin_pct, cac, discount_rate_pct, horizon_months, industry,
+            inactivity_months, avg_check, purchases_per_year, monthly_churn_pct
+        ],
+        outputs=[empirical_kpi, empirical_cf_plot, empirical_survival_plot],
+        api_name="empirical",
+        concurrency_limit=OFFLOAD_WORKERS
+    )
+
+# Очередь: события обслуживаются не более чем concurrency_limit потоками каждое,
+# остальные запросы ждут в очереди ограниченного размера
+demo.queue(
+    default_concurrency_limit=CALCULATE_CONCURRENCY,
+    max_size=int(os.environ.get('LTV_QUEUE_SIZE', 256))
+)
+
 if __name__ == "__main__":
+    # Форкаем воркеры до старта серверных потоков
+    workers.warm_up(get_offload_pool(), OFFLOAD_WORKERS)
+    routes = list(api_routes)
+    if metrics.enabled:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logging.getLogger('ltv.metrics').addHandler(handler)
+        logging.getLogger('ltv.metrics').setLevel(logging.INFO)
+        routes.append(APIRoute('/metrics', metrics_endpoint, methods=['GET']))
     demo.launch(
         share=True,
         server_name="0.0.0.0",
         show_error=True,
         favicon_path=None,
-        ssl_verify=False
+        ssl_verify=False,
+        app_kwargs={'routes': routes}
     )
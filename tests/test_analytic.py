@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from ltv.model import EnhancedLTVModel
+
+model = EnhancedLTVModel()
+
+def random_params(n, seed):
+    rng = np.random.default_rng(seed)
+    return {
+        'avg_check': rng.uniform(100, 50000, n), 'purchases_per_year': rng.uniform(0.5, 12, n),
+        'margin_pct': rng.uniform(-20, 90, n), 'cac': rng.uniform(-10, 60000, n),
+        'monthly_churn_pct': rng.uniform(0, 120, n), 'discount_rate_pct': rng.uniform(0, 30, n),
+        'horizon_months': rng.integers(0, 601, n)
+    }
+
+def edge_params():
+    # Каждый горизонт 0..600 в сочетании с краевыми оттоком, ставкой и маржой. CAC не кратен
+    # годовой марже: при нулевых оттоке и ставке накопленный поток за целые годы равен ей точно,
+    # и месяц окупаемости на таком равенстве решает последний бит округления
+    horizon = np.arange(0, 601)
+    n = len(horizon)
+    cycle = lambda *values: np.resize(np.array(values, dtype=float), n)
+    return {
+        'avg_check': cycle(5000, 20000, 1000), 'purchases_per_year': cycle(1, 2.5, 12),
+        'margin_pct': cycle(50, -30, 0, 80), 'cac': cycle(15500, 0, 500, 100000),
+        'monthly_churn_pct': cycle(0, 100, 5, 0, 100, 50),
+        'discount_rate_pct': cycle(0, 12, 0, 30),
+        'horizon_months': horizon
+    }
+
+@pytest.mark.parametrize('params', [random_params(20000, 0), random_params(20000, 1), edge_params()],
+                         ids=['random-0', 'random-1', 'edge'])
+def test_analytic_matches_array_engine(params):
+    expected = model.compute_enhanced_ltv_batch(params)
+    actual = model.compute_enhanced_ltv_analytic(params)
+    for key in ('ltv', 'ltv_cac', 'roi'):
+        np.testing.assert_allclose(actual[key], expected[key], rtol=1e-9, atol=1e-9, err_msg=key)
+    np.testing.assert_array_equal(actual['payback_month'], expected['payback_month'])
+
+def test_zero_horizon():
+    params = dict(random_params(1, 2), horizon_months=0)
+    result = model.compute_enhanced_ltv(params)
+    assert result['ltv'] == 0.0
+    assert result['payback_month'] is None
+    assert len(result['monthly_cf']) == 0
+    batch = model.compute_enhanced_ltv_batch(dict(params, horizon_months=np.array([0, 0])))
+    np.testing.assert_array_equal(batch['ltv'], [0.0, 0.0])
+    assert np.isnan(batch['payback_month']).all()
+
+def test_zero_horizon_non_positive_cac():
+    params = dict(random_params(3, 3), cac=np.array([0.0, -10.0, 500.0]), horizon_months=np.array([0, 0, 0]))
+    for engine in (model.compute_enhanced_ltv_batch, model.compute_enhanced_ltv_analytic):
+        assert np.isnan(engine(params)['payback_month']).all(), engine.__name__
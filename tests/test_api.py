@@ -0,0 +1,29 @@
+import json
+
+import numpy as np
+import pytest
+
+pytest.importorskip('starlette')
+
+from ltv import workers
+from ltv.api import items_to_columns
+
+VALID = {'avg_check': 20000, 'purchases_per_year': 2.5, 'margin_pct': 50, 'cac': 15000, 'monthly_churn_pct': 8}
+
+def score(items):
+    columns, ids, industries = items_to_columns(items)
+    return [json.loads(line) for line in workers.score_rows(columns, ids, industries).splitlines()]
+
+@pytest.mark.parametrize('others', [[], [VALID], [dict(VALID, cac='15000')]], ids=['alone', 'valid', 'malformed'])
+def test_bool_is_rejected_on_every_path(others):
+    rows = score([dict(VALID, avg_check=True)] + others)
+    assert rows[0]['errors'] == ["Поле avg_check отсутствует или не является числом"]
+
+def test_numeric_strings_are_rejected():
+    columns, _, _ = items_to_columns([dict(VALID, cac='15000'), VALID])
+    assert np.isnan(columns['cac'][0]) and columns['cac'][1] == 15000
+
+def test_fractional_horizon_is_rejected():
+    rows = score([dict(VALID, horizon_months=24.5), dict(VALID, horizon_months=24.0)])
+    assert rows[0]['errors'] == ["horizon_months должен быть целым числом от 1 до 1200"]
+    assert 'errors' not in rows[1] and rows[1]['ltv'] > 0
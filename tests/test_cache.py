@@ -0,0 +1,41 @@
+from ltv.cache import ResultCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_lru_evicts_least_recently_used():
+    cache = ResultCache(maxsize=2, ttl=None)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats() == {'hits': 3, 'misses': 1, 'size': 2, 'maxsize': 2, 'hit_rate': 0.75}
+
+def test_ttl_expiry(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr('ltv.cache.time.monotonic', clock)
+    cache = ResultCache(maxsize=8, ttl=10.0)
+    cache.put('a', 1)
+    clock.now += 10.0
+    assert cache.get('a') == 1
+    clock.now += 0.5
+    assert cache.get('a') is None
+    # Устаревшая запись удаляется, повторный put начинает отсчет заново
+    assert cache.stats()['size'] == 0
+    cache.put('a', 2)
+    clock.now += 5.0
+    assert cache.get('a') == 2
+
+def test_zero_maxsize_disables_caching():
+    cache = ResultCache(maxsize=0)
+    cache.put('a', 1)
+    assert cache.get('a') is None
+    cache.clear()
+    assert cache.stats()['misses'] == 0
@@ -0,0 +1,19 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip('gradio')
+pytest.importorskip('matplotlib')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_chart_rendering_does_not_grow_rss():
+    # Отдельный процесс: RSS не смешивается с другими тестами, кэш результатов отключается до импорта приложения.
+    # Полный прогон из требования (1000 запросов после прогрева 50) — на одном ядре это около 12 минут
+    completed = subprocess.run(
+        [sys.executable, os.path.join(ROOT, 'benchmarks', 'bench_chart_memory.py'),
+         '--requests', '1000', '--warmup', '50', '--max-growth-mb', '30'],
+        cwd=ROOT, capture_output=True, text=True, timeout=3600)
+    assert completed.returncode == 0, completed.stdout + completed.stderr
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from ltv.curves import Schedule, expand_curve
+from ltv.model import EnhancedLTVModel
+
+model = EnhancedLTVModel()
+MONTHS = np.arange(1, 13)
+BASE = {'avg_check': 5000, 'purchases_per_year': 2.5, 'margin_pct': 50, 'cac': 8000,
+        'monthly_churn_pct': 5, 'discount_rate_pct': 12, 'horizon_months': 36}
+
+def test_steps():
+    curve = Schedule.steps({4: 10, 1: 5, 9: 2}).expand(MONTHS)
+    np.testing.assert_array_equal(curve, [5, 5, 5, 10, 10, 10, 10, 10, 2, 2, 2, 2])
+    # До первой точки действует ее значение
+    np.testing.assert_array_equal(Schedule.steps({3: 7}).expand([1, 2, 3]), [7, 7, 7])
+
+def test_linear():
+    curve = Schedule.linear({2: 0, 6: 8}).expand(MONTHS)
+    np.testing.assert_allclose(curve, [0, 0, 2, 4, 6, 8, 8, 8, 8, 8, 8, 8])
+    np.testing.assert_array_equal(Schedule.linear({5: 3}).expand([1, 10]), [3, 3])
+
+def test_periodic_and_growth():
+    np.testing.assert_array_equal(Schedule.periodic([1, 2, 3]).expand(np.arange(1, 8)), [1, 2, 3, 1, 2, 3, 1])
+    np.testing.assert_allclose(Schedule.growth(10, every=6).expand(MONTHS), [1.0] * 6 + [1.1] * 6)
+    np.testing.assert_allclose(Schedule.growth(10, every=12, start=3).expand([1, 3, 14, 15]), [1, 1, 1, 1.1])
+
+def test_per_row_values():
+    curve = Schedule.steps({1: [5, 1], 3: [10, 2]}).expand(np.arange(1, 5))
+    np.testing.assert_array_equal(curve, [[5, 5, 10, 10], [1, 1, 2, 2]])
+    curve = Schedule.linear({1: [0, 0], 3: [2, 4]}).expand([1, 2, 3])
+    np.testing.assert_allclose(curve, [[0, 1, 2], [0, 2, 4]])
+
+def test_schedule_rejects_unordered_points():
+    with pytest.raises(ValueError):
+        Schedule('step', [3, 2], [1, 2])
+    with pytest.raises(ValueError):
+        Schedule.steps({0: 1})
+
+def test_expand_curve_pads_and_trims():
+    np.testing.assert_array_equal(expand_curve(2.0, MONTHS[:3]), [2, 2, 2])
+    np.testing.assert_array_equal(expand_curve([1, 2], MONTHS[:4]), [1, 2, 2, 2])
+    np.testing.assert_array_equal(expand_curve([1, 2, 3, 4], MONTHS[:2]), [1, 2])
+    np.testing.assert_array_equal(expand_curve([[1, 2], [3, 4]], MONTHS[:3]), [[1, 2, 2], [3, 4, 4]])
+    assert expand_curve([1, 2], MONTHS[:0]).shape == (0,)
+
+def test_constant_churn_curve_matches_scalar_churn():
+    expected = model.compute_enhanced_ltv_batch(BASE)
+    actual = model.compute_enhanced_ltv_batch(dict(BASE, churn_curve=Schedule.steps({1: 5})))
+    for key in ('ltv', 'ltv_cac', 'monthly_churn_pct'):
+        np.testing.assert_allclose(actual[key], expected[key], rtol=1e-9, err_msg=key)
+
+def test_churn_curve_with_zero_horizon():
+    for curve in (Schedule.steps({1: 5, 6: 10}), [4.0, 8.0]):
+        result = model.compute_enhanced_ltv_batch(dict(BASE, horizon_months=0, churn_curve=curve))
+        assert result['ltv'][0] == 0.0 and np.isnan(result['payback_month'][0])
+    mixed = model.compute_enhanced_ltv_batch(dict(BASE, horizon_months=np.array([0, 12]), churn_curve=[4.0, 8.0]))
+    assert mixed['ltv'][0] == 0.0 and mixed['ltv'][1] > 0
+
+def test_scenarios_use_curves():
+    curve = Schedule.steps({1: 5})
+    # Постоянная кривая оттока дает те же сценарии, что и скалярный отток, с множителями сценариев
+    plain = model.scenario_batch(BASE)
+    with_curve = model.scenario_batch(dict(BASE, churn_curve=curve))
+    np.testing.assert_allclose(with_curve['ltv'], plain['ltv'], rtol=1e-9)
+    raised = model.calculate_scenarios(dict(BASE, price_curve=Schedule.growth(10, every=12)))
+    base = model.calculate_scenarios(BASE)
+    for name in base:
+        assert raised[name]['ltv'] > base[name]['ltv']
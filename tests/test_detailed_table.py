@@ -0,0 +1,50 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('gradio')
+pytest.importorskip('matplotlib')
+
+import streamlit_app as app
+from ltv.io import write_chunks
+
+INPUTS = (20000, 2.5, 50, 15000, 8, 12)
+
+def rowwise_table(scenarios):
+    # Построчная сборка, как до векторизации, но на полном горизонте
+    rows = []
+    for name, data in scenarios.items():
+        for i, month in enumerate(data['months']):
+            rows.append({
+                'Сценарий': name, 'Месяц': month,
+                'Выживаемость (%)': round(data['survival_curve'][i] * 100, 2),
+                'Месячный CF (₽)': round(data['monthly_cf'][i], 0),
+                'Накопленный CF (₽)': round(data['cumulative_cf'][i], 0),
+                'LTV до месяца (₽)': round(np.sum(data['monthly_cf'][:i + 1]), 0)
+            })
+    return pd.DataFrame(rows)
+
+@pytest.mark.parametrize('horizon', [1, 36, 600])
+def test_table_covers_full_horizon(horizon):
+    scenarios = app.model.calculate_scenarios(app.build_params(*INPUTS, horizon))
+    table = app.generate_detailed_table(scenarios)
+    assert len(table) == 3 * horizon
+    pd.testing.assert_frame_equal(table, rowwise_table(scenarios), check_dtype=False, atol=1)
+
+@pytest.mark.parametrize('fmt', ['csv', 'ndjson'])
+def test_write_chunks_round_trip(tmp_path, fmt):
+    table = app.generate_detailed_table(app.model.calculate_scenarios(app.build_params(*INPUTS, 120)))
+    path = tmp_path / f'table.{fmt}'
+    chunks = (table.iloc[i:i + 50] for i in range(0, len(table), 50))
+    assert write_chunks(chunks, str(path)) == len(table)
+    written = pd.read_csv(path) if fmt == 'csv' else pd.read_json(path, lines=True)
+    pd.testing.assert_frame_equal(written, table, check_dtype=False)
+
+def test_export_detailed_table():
+    path = app.export_detailed_table(*INPUTS, 240, 'csv')
+    try:
+        assert len(pd.read_csv(path)) == 3 * 240
+    finally:
+        os.remove(path)
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from ltv.model import EnhancedLTVModel
+
+model = EnhancedLTVModel()
+BASE = {'avg_check': 20000, 'purchases_per_year': 2.5, 'margin_pct': 50, 'cac': 15000,
+        'monthly_churn_pct': 8, 'discount_rate_pct': 12, 'horizon_months': 36}
+
+def ltv_cac(**changes):
+    return model.compute_enhanced_ltv(dict(BASE, **changes))['ltv_cac']
+
+def test_max_cac_matches_closed_form():
+    # LTV не зависит от CAC: порог — LTV / target
+    result = model.goal_seek(BASE, 'cac', target=3.0)
+    ltv = model.compute_enhanced_ltv(BASE)['ltv']
+    assert result['is_max'][0] and result['converged'][0]
+    assert result['value'][0] == pytest.approx(ltv / 3.0, rel=1e-8)
+
+@pytest.mark.parametrize('solve_for,is_max', [('monthly_churn_pct', True), ('avg_check', False),
+                                              ('margin_pct', False), ('discount_rate_pct', True)])
+def test_threshold_is_the_boundary(solve_for, is_max):
+    target = np.array([1.0, 1.4, 1.6])
+    result = model.goal_seek(BASE, solve_for, target=target)
+    assert result['converged'].all()
+    np.testing.assert_array_equal(result['is_max'], is_max)
+    for value, goal in zip(result['value'], target):
+        assert ltv_cac(**{solve_for: value}) >= goal - 1e-9
+        # Чуть дальше порога цель уже не выполняется
+        beyond = value * (1 + 1e-6) if is_max else value * (1 - 1e-6)
+        assert ltv_cac(**{solve_for: beyond}) < goal
+
+def test_unreachable_and_always_met():
+    result = model.goal_seek(BASE, 'margin_pct', target=[1e6, 0.0])
+    assert np.isnan(result['value'][0]) and not result['bracketed'][0] and not result['always_met'][0]
+    assert result['always_met'][1]
+
+def test_payback_threshold():
+    result = model.goal_seek(BASE, 'cac', metric='payback_month', target=12)
+    cac = result['value'][0]
+    assert model.compute_enhanced_ltv(dict(BASE, cac=cac))['payback_month'] <= 12
+    assert model.compute_enhanced_ltv(dict(BASE, cac=cac * 1.001))['payback_month'] > 12
+
+def test_benchmark_thresholds_use_industry_targets():
+    thresholds = model.benchmark_thresholds(BASE, 'SaaS', solve_for=('cac',))
+    benchmark = model.industry_benchmarks['SaaS']
+    assert ltv_cac(cac=thresholds['cac']['ltv_cac']['value'][0]) == pytest.approx(benchmark['ltv_cac_min'])
+    payback = model.compute_enhanced_ltv(dict(BASE, cac=thresholds['cac']['payback_month']['value'][0]))
+    assert payback['payback_month'] <= benchmark['payback_max']
@@ -0,0 +1,61 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from ltv.incremental import DependencyGraph, GraphState
+
+
+def make_graph(calls):
+    graph = DependencyGraph()
+
+    @graph.node('revenue', ['check', 'purchases'])
+    def revenue(check, purchases):
+        calls.append('revenue')
+        return [check * purchases]
+
+    @graph.node('margin', ['revenue', 'margin_pct'])
+    def margin(revenue, margin_pct):
+        calls.append('margin')
+        return [revenue[0] * margin_pct / 100]
+
+    @graph.node('label', ['industry'], parallel=True)
+    def label(industry):
+        calls.append('label')
+        return industry.upper()
+
+    return graph
+
+INPUTS = {'check': 100, 'purchases': 3, 'margin_pct': 50, 'industry': 'saas'}
+OUTPUTS = ['margin', 'label']
+
+def test_only_dirty_nodes_recompute():
+    calls = []
+    graph = make_graph(calls)
+    state = GraphState()
+    first = graph.evaluate(state, INPUTS, OUTPUTS)
+    assert first == {'margin': [150.0], 'label': 'SAAS'}
+    assert sorted(state.recomputed) == ['label', 'margin', 'revenue']
+    # Те же значения входов — ничего не пересчитывается, возвращаются те же объекты
+    again = graph.evaluate(state, dict(INPUTS), OUTPUTS)
+    assert state.recomputed == [] and again['margin'] is first['margin']
+    # Меняется только вход margin: revenue переиспользуется
+    graph.evaluate(state, dict(INPUTS, margin_pct=60), OUTPUTS)
+    assert state.recomputed == ['margin']
+    # Меняется вход revenue: пересчитываются revenue и зависящий от него margin
+    graph.evaluate(state, dict(INPUTS, margin_pct=60, check=200), OUTPUTS)
+    assert state.recomputed == ['revenue', 'margin']
+    assert calls.count('label') == 1
+
+def test_sessions_are_independent():
+    calls = []
+    graph = make_graph(calls)
+    graph.evaluate(GraphState(), INPUTS, OUTPUTS)
+    graph.evaluate(GraphState(), INPUTS, OUTPUTS)
+    assert calls.count('revenue') == 2
+
+def test_parallel_nodes_in_executor():
+    calls = []
+    graph = make_graph(calls)
+    state = GraphState()
+    with ThreadPoolExecutor(2) as executor:
+        assert graph.evaluate(state, INPUTS, OUTPUTS, executor)['label'] == 'SAAS'
+        graph.evaluate(state, dict(INPUTS, industry='fintech'), OUTPUTS, executor)
+    assert state.recomputed == ['label']
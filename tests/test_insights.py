@@ -0,0 +1,71 @@
+import numpy as np
+
+from ltv.model import EnhancedLTVModel
+
+model = EnhancedLTVModel()
+INDUSTRIES = list(model.industry_benchmarks) + ['Неизвестная']
+
+def batch(n, seed=0):
+    rng = np.random.default_rng(seed)
+    params = {
+        'avg_check': rng.uniform(500, 50000, n), 'purchases_per_year': rng.uniform(0.5, 12, n),
+        'margin_pct': rng.uniform(5, 90, n), 'cac': rng.uniform(100, 60000, n),
+        'monthly_churn_pct': rng.uniform(0, 40, n), 'discount_rate_pct': rng.uniform(0, 30, n),
+        'horizon_months': rng.integers(1, 61, n)
+    }
+    return params, model.compute_enhanced_ltv_analytic(params), rng.choice(INDUSTRIES, n)
+
+def reference_codes(ltv_cac, payback, churn, margin, industry):
+    # Построчные условия исходного generate_insights
+    benchmark = model.industry_benchmarks.get(industry, model.industry_benchmarks["SaaS"])
+    codes = ['ltv_cac_below_min' if ltv_cac < benchmark['ltv_cac_min'] else 'ltv_cac_ok']
+    if payback:
+        codes.append('payback_fast' if payback <= benchmark['payback_max'] else 'payback_slow')
+    if churn > benchmark['churn_typical'] * 1.5:
+        codes.append('churn_critical')
+    if ltv_cac < 3 and margin < 30:
+        codes.append('raise_margin')
+    if ltv_cac < 3 and churn > 10:
+        codes.append('loyalty_program')
+    return codes
+
+def test_classify_batch_matches_rowwise_rules():
+    params, scored, industries = batch(3000)
+    result = model.classify_batch(scored, params, industries)
+    flags = result['flags']
+    assert flags.shape == (3000, len(model.INSIGHT_RULES))
+    for i in range(3000):
+        payback = scored['payback_month'][i]
+        expected = reference_codes(scored['ltv_cac'][i], None if np.isnan(payback) else int(payback),
+                                   params['monthly_churn_pct'][i], params['margin_pct'][i], industries[i])
+        assert [code for code, flag in zip(model.INSIGHT_CODES, flags[i]) if flag] == expected, i
+    assert result['counts'] == dict(zip(model.INSIGHT_CODES, flags.sum(axis=0).tolist()))
+    assert len(set(result['counts'])) == len(model.INSIGHT_CODES) and all(result['counts'].values())
+
+def test_render_matches_generate_insights():
+    params, scored, industries = batch(200, seed=1)
+    flags = model.classify_batch(scored, params, industries)['flags']
+    for i in range(200):
+        payback = scored['payback_month'][i]
+        ltv_data = {'ltv_cac': float(scored['ltv_cac'][i]), 'payback_month': None if np.isnan(payback) else int(payback)}
+        row = {'monthly_churn_pct': float(params['monthly_churn_pct'][i]), 'margin_pct': float(params['margin_pct'][i])}
+        assert model.render_insights(flags[i], ltv_data, row, industries[i]) == \
+            model.generate_insights(ltv_data, row, industries[i])
+
+def test_ranked_by_severity():
+    params, scored, industries = batch(500, seed=2)
+    result = model.classify_batch(scored, params, industries)
+    severity = [model.INSIGHT_SEVERITY[rule[1]] for rule in model.INSIGHT_RULES]
+    for flags, ranked in zip(result['flags'], result['ranked']):
+        fired = [int(r) for r in ranked if r >= 0]
+        assert sorted(fired) == list(np.flatnonzero(flags))
+        assert fired == sorted(fired, key=lambda r: (severity[r], r))
+        assert all(r == -1 for r in ranked[len(fired):])
+
+def test_kpi_levels_and_industry_codes():
+    np.testing.assert_array_equal(model.kpi_levels('ltv_cac', [3.0, 2.9, 1.0, 0.5]), [0, 1, 1, 2])
+    np.testing.assert_array_equal(model.kpi_levels('payback_month', [1, 12, 13, 0, np.nan]), [0, 0, 1, 2, 2])
+    table = model.benchmark_table()
+    codes = model.industry_codes(['Fintech', 'Неизвестная', 'SaaS'], table)
+    assert [table['industries'][c] for c in codes] == ['Fintech', 'SaaS', 'SaaS']
+    assert table['industries'][model.industry_codes('E-commerce', table)] == 'E-commerce'
@@ -0,0 +1,53 @@
+import json
+import logging
+import os
+
+import pytest
+
+from ltv.metrics import Metrics
+
+
+def test_disabled_metrics_record_nothing():
+    metrics = Metrics(enabled=False)
+    with metrics.request('calculate'):
+        with metrics.span('scenarios'):
+            pass
+    metrics.inc('ltv_requests_total', endpoint='calculate')
+    assert metrics.current() is None
+    assert metrics.render_prometheus() == "\n"
+
+def test_prometheus_output(caplog):
+    metrics = Metrics(enabled=True)
+    with caplog.at_level(logging.INFO, logger='ltv.metrics'):
+        with metrics.request('calculate'):
+            with metrics.span('scenarios'):
+                pass
+            metrics.annotate(bytes=2048)
+        with pytest.raises(RuntimeError):
+            with metrics.request('calculate'):
+                raise RuntimeError('boom')
+    lines = metrics.render_prometheus(extra=[('ltv_cache_size', 'gauge', "Записей в кэше", 3)]).splitlines()
+    assert '# TYPE ltv_requests_total counter' in lines
+    assert 'ltv_requests_total{endpoint="calculate",status="ok"} 1' in lines
+    assert 'ltv_requests_total{endpoint="calculate",status="error"} 1' in lines
+    assert 'ltv_response_bytes_total{endpoint="calculate"} 2048' in lines
+    assert '# TYPE ltv_stage_seconds summary' in lines
+    assert 'ltv_stage_seconds_count{stage="scenarios"} 1' in lines
+    assert 'ltv_request_seconds_count{endpoint="calculate"} 2' in lines
+    assert any(line.startswith('ltv_request_seconds_sum{endpoint="calculate"} ') for line in lines)
+    assert lines[-3:] == ['# HELP ltv_cache_size Записей в кэше', '# TYPE ltv_cache_size gauge', 'ltv_cache_size 3']
+    records = [json.loads(r.getMessage()) for r in caplog.records]
+    assert [r['status'] for r in records] == ['ok', 'error']
+    assert set(records[0]['stages']) == {'scenarios'} and records[1]['error'] == 'RuntimeError: boom'
+
+def test_label_values_are_escaped():
+    metrics = Metrics(enabled=True)
+    metrics.inc('ltv_requests_total', endpoint='a"b\\c\nd', status='ok')
+    assert 'ltv_requests_total{endpoint="a\\"b\\\\c\\nd",status="ok"} 1' in metrics.render_prometheus()
+
+def test_profile_dump(tmp_path):
+    metrics = Metrics(enabled=True, profile_dir=str(tmp_path))
+    with metrics.request('calculate', profile=True) as record:
+        sum(range(1000))
+    assert os.path.dirname(record['profile']) == str(tmp_path) and os.path.exists(record['profile'])
+    assert 'ltv_profiles_total{endpoint="calculate"} 1' in metrics.render_prometheus()
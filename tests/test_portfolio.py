@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+from ltv.portfolio import score_segments_file
+
+COLUMNS = ['segment', 'avg_check', 'purchases', 'margin', 'churn', 'cac', 'customers']
+GOOD = [
+    ('A', 2000, 12, 60, 5, 5000, 100),
+    ('A', 3000, 12, 50, 8, 4000, 50),
+    ('B', 1500, 6, 40, 10, 3000, 200),
+]
+BAD = [
+    ('A', np.nan, 12, 60, 5, 5000, 100),
+    ('A', 2000, 12, 60, 150, 5000, 100),
+    ('A', 2000, 12, 60, 5, -10, 100),
+    ('B', 1500, 6, 40, 10, 3000, -1),
+    ('C', 0, 6, 40, 10, 3000, 10),
+]
+
+def score(tmp_path, rows, chunksize=200_000):
+    path = tmp_path / 'segments.csv'
+    pd.DataFrame(rows, columns=COLUMNS).to_csv(path, index=False)
+    return score_segments_file(str(path), chunksize=chunksize).set_index('Сегмент')
+
+def test_invalid_rows_are_rejected_not_averaged(tmp_path):
+    clean = score(tmp_path, GOOD)
+    # Вперемешку и мелкими чанками: отклонение не зависит от границ чанков
+    mixed = score(tmp_path, [row for pair in zip(GOOD + [None] * 2, BAD) for row in pair if row], chunksize=2)
+    assert clean['Отклонено строк'].sum() == 0
+    assert mixed.loc['A', 'Отклонено строк'] == 3
+    assert mixed.loc['B', 'Отклонено строк'] == 1
+    assert mixed.loc['C', 'Отклонено строк'] == 1
+    assert mixed.loc['C', 'Строк'] == 0 and np.isnan(mixed.loc['C', 'Средний LTV (₽)'])
+    pd.testing.assert_frame_equal(mixed.loc[['A', 'B']].drop(columns='Отклонено строк'),
+                                  clean.loc[['A', 'B']].drop(columns='Отклонено строк'))
@@ -0,0 +1,55 @@
+import pickle
+
+import numpy as np
+
+from ltv import EnhancedLTVModel, LTVResult
+
+model = EnhancedLTVModel()
+PARAMS = {'avg_check': 20000.0, 'purchases_per_year': 2.5, 'margin_pct': 50.0, 'cac': 15000.0,
+          'monthly_churn_pct': 8.0, 'discount_rate_pct': 12.0, 'horizon_months': 36}
+KEYS = LTVResult.SCALAR_KEYS + LTVResult.CURVE_KEYS
+
+def test_mapping_compatible_with_dict():
+    result = model.compute_enhanced_ltv(PARAMS)
+    as_dict = dict(result)
+    assert list(result) == list(KEYS) and len(result) == len(KEYS)
+    assert set(as_dict) == set(KEYS)
+    assert result['ltv'] == result.ltv == as_dict['ltv']
+    assert result.get('payback_month') == result['payback_month']
+    assert result.get('missing', 'default') == 'default'
+    assert 'monthly_cf' in result and 'missing' not in result
+    np.testing.assert_array_equal(result.cumulative_cf, np.cumsum(result['monthly_cf']))
+    assert len(result['months']) == PARAMS['horizon_months']
+
+def test_pickle_round_trip():
+    result = model.compute_enhanced_ltv(PARAMS)
+    restored = pickle.loads(pickle.dumps(result))
+    assert isinstance(restored, LTVResult)
+    assert restored.scalars() == result.scalars()
+    for key in LTVResult.CURVE_KEYS:
+        np.testing.assert_array_equal(restored[key], result[key])
+
+def test_row_holds_only_its_curves():
+    batch = model.compute_enhanced_ltv_batch(dict(PARAMS, horizon_months=np.array([12, 36])))
+    row = model.batch_row(batch, 0)
+    assert len(row.monthly_cf) == 12
+    assert np.shares_memory(row.monthly_cf, batch['monthly_cf'])
+
+def test_float32_matches_float64():
+    rng = np.random.default_rng(0)
+    n = 2000
+    params = {
+        'avg_check': rng.uniform(1000, 50000, n), 'purchases_per_year': rng.uniform(1, 12, n),
+        'margin_pct': rng.uniform(10, 80, n), 'cac': rng.uniform(1000, 30000, n),
+        'monthly_churn_pct': rng.uniform(1, 30, n), 'discount_rate_pct': rng.uniform(0, 25, n),
+        'horizon_months': rng.integers(1, 601, n)
+    }
+    full = model.compute_enhanced_ltv_batch(params)
+    half = model.compute_enhanced_ltv_batch(params, dtype=np.float32)
+    assert half['monthly_cf'].dtype == np.float32 and half['cumulative_cf'].dtype == np.float32
+    np.testing.assert_allclose(half['ltv'], full['ltv'], rtol=1e-5)
+    np.testing.assert_allclose(half['cumulative_cf'], full['cumulative_cf'], rtol=1e-5, atol=1e-2)
+    # Месяц окупаемости может сдвинуться, только если накопленный поток почти точно равен CAC
+    differs = half['payback_month'] != full['payback_month']
+    differs &= ~(np.isnan(half['payback_month']) & np.isnan(full['payback_month']))
+    assert np.count_nonzero(differs) <= n // 1000
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from ltv.model import EnhancedLTVModel
+
+model = EnhancedLTVModel()
+BASE = {'avg_check': 20000, 'purchases_per_year': 2.5, 'margin_pct': 50, 'cac': 15000,
+        'monthly_churn_pct': 8, 'discount_rate_pct': 12, 'horizon_months': 36}
+
+def pointwise(metric, **changes):
+    value = model.compute_enhanced_ltv(dict(BASE, **changes))[metric]
+    return np.nan if value is None else value
+
+@pytest.mark.parametrize('metric', ['ltv_cac', 'ltv', 'payback_month'])
+def test_grid_matches_pointwise(metric):
+    x_values = np.linspace(10000, 30000, 7)
+    y_values = np.linspace(2, 20, 5)
+    grid = model.sensitivity_grid(BASE, 'avg_check', 'monthly_churn_pct', x_values, y_values, metric)
+    assert grid.shape == (5, 7)
+    expected = [[pointwise(metric, avg_check=x, monthly_churn_pct=y) for x in x_values] for y in y_values]
+    np.testing.assert_allclose(grid, expected, rtol=1e-9)
+
+def test_grid_needs_two_params():
+    with pytest.raises(ValueError):
+        model.sensitivity_grid(BASE, 'cac', 'cac', [1], [1])
+
+def test_tornado_matches_pointwise():
+    tornado = model.tornado(BASE, swing_pct=20)
+    assert tornado['base'] == pytest.approx(pointwise('ltv_cac'))
+    assert sorted(tornado['params']) == sorted(model.SENSITIVITY_PARAMS)
+    for name, low, high in zip(tornado['params'], tornado['low'], tornado['high']):
+        assert low == pytest.approx(pointwise('ltv_cac', **{name: BASE[name] * 0.8}), rel=1e-9)
+        assert high == pytest.approx(pointwise('ltv_cac', **{name: BASE[name] * 1.2}), rel=1e-9)
+    swings = np.abs(tornado['high'] - tornado['low'])
+    assert np.all(np.diff(swings) <= 0)
+
+def test_tornado_clips_bounded_params():
+    tornado = model.tornado(dict(BASE, margin_pct=95), swing_pct=20, params=('margin_pct',))
+    assert tornado['high'][0] == pytest.approx(pointwise('ltv_cac', margin_pct=100), rel=1e-9)
@@ -0,0 +1,58 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from ltv.model import EnhancedLTVModel
+from ltv.sobol import MAX_DIM, sobol_points
+
+model = EnhancedLTVModel()
+BASE = {'avg_check': 20000, 'purchases_per_year': 2.5, 'margin_pct': 50, 'cac': 15000,
+        'monthly_churn_pct': 8, 'discount_rate_pct': 12, 'horizon_months': 36}
+# LTV линеен по чеку и марже и не зависит от CAC: f = k · check · margin
+BOUNDS = {'avg_check': (10000.0, 30000.0), 'margin_pct': (20.0, 80.0), 'cac': (5000.0, 25000.0)}
+
+def test_points_are_stratified():
+    points = sobol_points(0, 256, MAX_DIM)
+    assert points.min() >= 0 and points.max() < 1
+    # Первые 2^k точек — по одной в каждом из 2^k равных отрезков по любому измерению
+    for column in points.T:
+        np.testing.assert_array_equal(np.sort(np.floor(column * 256)), np.arange(256))
+
+def test_chunks_match_whole_sequence():
+    whole = sobol_points(1, 1000, 5)
+    parts = np.vstack([sobol_points(start, n, 5) for start, n in ((1, 300), (301, 1), (302, 699))])
+    np.testing.assert_array_equal(parts, whole)
+
+def test_matches_scipy():
+    qmc = pytest.importorskip('scipy.stats.qmc')
+    np.testing.assert_array_equal(sobol_points(0, 512, MAX_DIM), qmc.Sobol(MAX_DIM, scramble=False).random(512))
+
+def test_too_many_dimensions():
+    with pytest.raises(ValueError):
+        sobol_points(0, 1, MAX_DIM + 1)
+
+def test_indices_of_a_product():
+    (a1, b1), (a2, b2) = BOUNDS['avg_check'], BOUNDS['margin_pct']
+    mean = lambda a, b: (a + b) / 2
+    second = lambda a, b: (a * a + a * b + b * b) / 3
+    var1, var2 = second(a1, b1) - mean(a1, b1) ** 2, second(a2, b2) - mean(a2, b2) ** 2
+    variance = second(a1, b1) * second(a2, b2) - (mean(a1, b1) * mean(a2, b2)) ** 2
+    s1, s2 = mean(a2, b2) ** 2 * var1 / variance, mean(a1, b1) ** 2 * var2 / variance
+    result = model.sobol_indices(BASE, bounds=BOUNDS, metric='ltv', n_samples=2**13)
+    np.testing.assert_allclose(result['first_order'], [s1, s2, 0.0], atol=0.01)
+    np.testing.assert_allclose(result['total'], [1 - s2, 1 - s1, 0.0], atol=0.01)
+    assert np.all(result['first_order_ci'] < 0.1)
+    assert result['evaluations'] == 2**13 * 5 and not result['converged']
+
+def test_chunking_and_executor_do_not_change_result():
+    serial = model.sobol_indices(BASE, spread_pct=30, n_samples=3000, chunk_size=1024)
+    with ThreadPoolExecutor(2) as executor:
+        parallel = model.sobol_indices(BASE, spread_pct=30, n_samples=3000, chunk_size=500, executor=executor)
+    for key in ('first_order', 'total', 'first_order_ci', 'total_ci'):
+        np.testing.assert_allclose(parallel[key], serial[key], rtol=1e-9, err_msg=key)
+
+def test_tolerance_stops_early():
+    result = model.sobol_indices(BASE, spread_pct=20, n_samples=2**16, chunk_size=2**11, tol=0.05)
+    assert result['converged'] and 2**11 <= result['n_samples'] < 2**16
+    assert max(result['first_order_ci'].max(), result['total_ci'].max()) <= 0.05
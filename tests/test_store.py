@@ -0,0 +1,72 @@
+from datetime import date, datetime
+
+import numpy as np
+import pytest
+
+from ltv.model import EnhancedLTVModel
+from ltv.store import MAX_SQL_VARIABLES, ScenarioStore, pack_curves, unpack_curves
+
+model = EnhancedLTVModel()
+BASE = {'avg_check': 20000, 'purchases_per_year': 2.5, 'margin_pct': 50, 'cac': 15000,
+        'monthly_churn_pct': 8, 'discount_rate_pct': 12, 'horizon_months': 36}
+
+@pytest.fixture
+def store(tmp_path):
+    store = ScenarioStore(str(tmp_path / 'runs.db'))
+    yield store
+    store.close()
+
+def run(**changes):
+    params = dict(BASE, **changes)
+    return params, model.compute_enhanced_ltv(params)
+
+def test_pack_round_trip():
+    rng = np.random.default_rng(0)
+    monthly_cf, survival = rng.normal(1000, 300, 600), rng.uniform(0, 1, 600)
+    unpacked = unpack_curves(pack_curves(monthly_cf, survival), 600)
+    np.testing.assert_array_equal(unpacked, np.stack([monthly_cf, survival]).astype(np.float32))
+
+def test_save_query_round_trip(store):
+    params, result = run()
+    run_id = store.save(params, 'SaaS', result, name='base')
+    saved, = store.query()
+    assert saved['id'] == run_id and saved['name'] == 'base' and saved['industry'] == 'SaaS'
+    assert saved['params'] == {k: float(v) for k, v in params.items()}
+    for key in ('ltv', 'ltv_cac', 'roi', 'payback_month', 'confidence_score'):
+        assert saved[key] == pytest.approx(result[key])
+    curves = store.load_curves([run_id])
+    np.testing.assert_allclose(curves['monthly_cf'][0], result['monthly_cf'], rtol=1e-6)
+    np.testing.assert_allclose(curves['cumulative_cf'][0], result['cumulative_cf'], rtol=1e-5)
+    np.testing.assert_allclose(curves['survival_curve'][0], result['survival_curve'], rtol=1e-6)
+
+def test_query_filters(store):
+    runs = [run(cac=cac) + (name,) for cac, name in ((5000, 'cheap'), (15000, 'base'), (60000, 'expensive'))]
+    store.save_many([(p, 'SaaS', r, name) for p, r, name in runs], created_at=date(2024, 1, 1))
+    params, result = run()
+    store.save(params, 'Fintech', result, created_at=datetime(2024, 6, 1))
+    names = lambda rows: sorted(row['name'] or 'fintech' for row in rows)
+    assert names(store.query(industry='SaaS')) == ['base', 'cheap', 'expensive']
+    assert names(store.query(since=date(2024, 3, 1))) == ['fintech']
+    assert names(store.query(until=date(2024, 3, 1))) == ['base', 'cheap', 'expensive']
+    assert names(store.query(ltv_cac_min=1.0, ltv_cac_max=2.0)) == ['base', 'fintech']
+    assert names(store.query(payback_max=6)) == ['cheap']
+    assert len(store.query(limit=2)) == 2
+    assert store.query()[0]['industry'] == 'Fintech'
+    with pytest.raises(TypeError):
+        store.query(unknown=1)
+
+def test_load_curves_pads_and_keeps_order(store):
+    short_id, long_id = store.save_many([(p, 'SaaS', r, None) for p, r in (run(horizon_months=12), run(horizon_months=24))])
+    curves = store.load_curves([long_id, 999, short_id])
+    assert curves['ids'] == [long_id, short_id]
+    assert curves['monthly_cf'].shape == (2, 24)
+    assert np.isnan(curves['monthly_cf'][1, 12:]).all() and not np.isnan(curves['monthly_cf'][1, :12]).any()
+
+def test_many_ids_and_delete(store):
+    params, result = run(horizon_months=3)
+    ids = store.save_many([(params, 'SaaS', result, None)] * (MAX_SQL_VARIABLES + 50))
+    assert len(store.load_curves(ids)['ids']) == len(ids)
+    store.delete(ids[:MAX_SQL_VARIABLES + 10])
+    assert len(store) == 40
+    # Кривые удаляются каскадом
+    assert store.load_curves(ids)['ids'] == ids[MAX_SQL_VARIABLES + 10:]
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from ltv.survival import curve_cache, fit_empirical_curves
+
+
+def write_log(path, rows):
+    pd.DataFrame(rows, columns=['customer_id', 'timestamp', 'amount']).to_csv(path, index=False)
+    return str(path)
+
+def test_recent_first_purchase_is_not_at_risk(tmp_path):
+    rows = [('a', f'2024-{m:02d}-05', 100.0) for m in range(1, 5)] + [('b', '2024-04-20', 50.0)]
+    curves = fit_empirical_curves(write_log(tmp_path / 'log.csv', rows), inactivity_months=3, max_months=12)
+    assert curves['customers'] == 2
+    assert curves['churned_customers'] == 0
+    assert np.all(curves['survival_curve'] == 1.0)
+
+def test_survival_matches_geometric_churn(tmp_path):
+    rng = np.random.default_rng(0)
+    months = pd.period_range('2020-01', periods=36, freq='M')
+    rows = []
+    for customer in range(4000):
+        start = rng.integers(0, 36)
+        # Живет geometric(0.1) месяцев, но не дольше конца наблюдения
+        for m in range(start, min(36, start + rng.geometric(0.1))):
+            rows.append((customer, months[m].to_timestamp().strftime('%Y-%m-%d'), 10.0))
+    curve_cache.clear()
+    curves = fit_empirical_curves(write_log(tmp_path / 'log.csv', rows), inactivity_months=3, max_months=24)
+    # survival_curve[t] — доля доживших до месяца t + 1
+    expected = 0.9 ** np.arange(12)
+    assert np.max(np.abs(curves['survival_curve'][:12] - expected)) < 0.03
+
+def test_curves_are_cached_by_file_content(tmp_path, monkeypatch):
+    import ltv.survival as survival
+    rows = [('a', f'2024-{m:02d}-05', 100.0) for m in range(1, 7)]
+    first = write_log(tmp_path / 'first.csv', rows)
+    second = write_log(tmp_path / 'second.csv', rows)
+    curve_cache.clear()
+    calls = []
+    compute = survival.compute_empirical_curves
+    monkeypatch.setattr(survival, 'compute_empirical_curves', lambda *args: calls.append(args) or compute(*args))
+    curves = fit_empirical_curves(first, inactivity_months=3, max_months=12)
+    assert fit_empirical_curves(second, inactivity_months=3, max_months=12) is curves
+    assert len(calls) == 1
+    fit_empirical_curves(first, inactivity_months=2, max_months=12)
+    assert len(calls) == 2
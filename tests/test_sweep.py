@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from ltv.model import EnhancedLTVModel
+from ltv.sweep import DEFAULT_PARAMS, SweepResult, run_sweep
+
+AXES = {'avg_check': np.linspace(5000, 50000, 7), 'monthly_churn_pct': np.linspace(1, 30, 5),
+        'cac': np.linspace(5000, 30000, 4)}
+
+class Stop(Exception):
+    pass
+
+def expected_grid(metric):
+    grids = np.meshgrid(*AXES.values(), indexing='ij')
+    columns = dict(DEFAULT_PARAMS, **{name: g.ravel() for name, g in zip(AXES, grids)})
+    values = EnhancedLTVModel().compute_enhanced_ltv_analytic(columns)[metric]
+    return values.astype(np.float32).astype(float).reshape(grids[0].shape)
+
+def interrupted_sweep(directory, after):
+    def progress(done, total, rate):
+        if done >= after:
+            raise Stop
+    with pytest.raises(Stop):
+        run_sweep(directory, AXES, DEFAULT_PARAMS, chunk_size=16, progress=progress)
+    return SweepResult(directory)
+
+def test_resume_finishes_only_missing_chunks(tmp_path):
+    partial = interrupted_sweep(tmp_path, after=48)
+    assert 0 < partial.complete < 1
+    seen = []
+    result = run_sweep(tmp_path, progress=lambda done, total, rate: seen.append(done))
+    assert result.complete == 1.0
+    assert seen[0] == 64 and seen[-1] == result.size == 140
+    np.testing.assert_array_equal(result.array('ltv'), expected_grid('ltv'))
+
+def test_resume_rejects_another_grid(tmp_path):
+    interrupted_sweep(tmp_path, after=16)
+    with pytest.raises(ValueError):
+        run_sweep(tmp_path, dict(AXES, cac=[1000.0, 2000.0]), DEFAULT_PARAMS)
+
+def test_aggregate_matches_numpy(tmp_path):
+    result = run_sweep(tmp_path, AXES, DEFAULT_PARAMS, chunk_size=16)
+    ltv_cac = expected_grid('ltv_cac')
+    np.testing.assert_allclose(result.aggregate('ltv_cac', ['cac'], 'mean', chunk_size=7),
+                               ltv_cac.mean(axis=(0, 1)))
+    np.testing.assert_allclose(result.aggregate('ltv_cac', ['monthly_churn_pct', 'avg_check'], 'max'),
+                               ltv_cac.max(axis=2).T)
+    np.testing.assert_allclose(result.feasible_share(['avg_check']), (ltv_cac >= 3).mean(axis=(1, 2)))
+    assert result.aggregate('ltv', how='count') == result.size
+
+def test_slice_reads_nearest_axis_value(tmp_path):
+    result = run_sweep(tmp_path, AXES, DEFAULT_PARAMS, chunk_size=16)
+    np.testing.assert_array_equal(result.slice('ltv', cac=16000, monthly_churn_pct=8.5),
+                                  expected_grid('ltv')[:, 1, 2])
+
+def test_partial_results_are_masked(tmp_path):
+    result = interrupted_sweep(tmp_path, after=48)
+    with pytest.raises(ValueError):
+        result.aggregate('ltv')
+    with pytest.raises(ValueError):
+        result.slice('ltv', cac=5000)
+    # Готовы первые 48 точек порядка C: avg_check[0..1] целиком и часть avg_check[2]
+    assert result.aggregate('ltv', how='count', allow_partial=True) == 48
+    ltv = expected_grid('ltv')
+    np.testing.assert_allclose(result.aggregate('ltv', how='mean', allow_partial=True), ltv.ravel()[:48].mean())
+    sliced = result.slice('ltv', allow_partial=True, monthly_churn_pct=1, cac=5000)
+    np.testing.assert_array_equal(sliced[:3], ltv[:3, 0, 0])
+    assert np.isnan(sliced[3:]).all()